@@ -0,0 +1,133 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from evidence_analyst_agent import EvidenceAnalystAgent
+from prompt_format import estimate_tokens, serialize_event
+
+# Accounts per evidence prompt; events with more accounts are analyzed chunk by chunk.
+DEFAULT_ACCOUNTS_PER_CHUNK = 25
+# Chunk analyses of one event running at the same time (sync pipeline; the async one
+# runs all chunks of an event together and leaves the pacing to the scheduler).
+MAX_PARALLEL_CHUNKS = 8
+
+def needs_attention(account_values: dict) -> bool:
+    """A side is missing, or a comparable field differs."""
+    return not account_values.get("NBIM") or not account_values.get("Custody") or bool(account_values.get("mismatches"))
+
+def _account_signature(account_values: dict) -> tuple:
+    if not account_values.get("NBIM"):
+        return ("missing in NBIM",)
+    if not account_values.get("Custody"):
+        return ("missing in Custody",)
+    return tuple(sorted(mismatch["field"] for mismatch in account_values.get("mismatches") or []))
+
+# ---------------------------
+# Account chunking
+# ---------------------------
+class AccountChunking:
+    """Map-reduce evidence analysis for events with many accounts.
+
+    An event with more than `accounts_per_chunk` accounts is not put into one analyst
+    prompt. Its accounts that need attention (a mismatch or a missing side) are grouped by
+    mismatch signature and split into chunks of at most `accounts_per_chunk`; accounts that
+    match on every comparable field are only counted. Each chunk is analyzed by its own
+    EvidenceAnalystAgent call, the chunks of an event in parallel, and EvidenceReduceAgent
+    merges their findings into one event-level analysis (an event whose accounts fit in one
+    chunk is analyzed from that chunk directly). The critic and ConclusionAgent see
+    review_event(): the accounts that need attention, without the matching ones.
+    """
+
+    def __init__(self, accounts_per_chunk: int = DEFAULT_ACCOUNTS_PER_CHUNK, max_parallel_chunks: int = MAX_PARALLEL_CHUNKS):
+        if accounts_per_chunk < 1:
+            raise ValueError("accounts_per_chunk must be at least 1")
+        self.accounts_per_chunk = accounts_per_chunk
+        self.max_parallel_chunks = max_parallel_chunks
+        # event key -> {"accounts", "detailed_accounts", "chunks", "failed_chunks", "full_prompt_tokens",
+        #               "largest_chunk_tokens"}
+        self.report = {}
+
+    def applies_to(self, event: dict) -> bool:
+        return len(event.get("accounts") or {}) > self.accounts_per_chunk
+
+    def _attention_accounts(self, event: dict) -> list:
+        """(account key, values) needing attention, grouped by mismatch signature. If no account
+        needs attention, the first accounts_per_chunk accounts stand in for the event."""
+        accounts = list((event.get("accounts") or {}).items())
+        attention = [(key, values) for key, values in accounts if needs_attention(values)]
+        if not attention:
+            return accounts[:self.accounts_per_chunk]
+        return sorted(attention, key=lambda item: (_account_signature(item[1]), str(item[0])))
+
+    def review_event(self, event: dict) -> dict:
+        """The event as the critic and conclusion see it: unchanged unless it is chunked, then
+        only the accounts that need attention."""
+        if not self.applies_to(event):
+            return event
+        return {**event, "accounts": dict(self._attention_accounts(event))}
+
+    def split(self, event: dict) -> list:
+        """[(chunk event, note for the analyst)] for a chunked event, [] otherwise."""
+        if not self.applies_to(event):
+            return []
+        attention = self._attention_accounts(event)
+        total = len(event["accounts"])
+        matching = total - len(attention)
+        size = self.accounts_per_chunk
+        groups = [attention[start:start + size] for start in range(0, len(attention), size)]
+        chunks = []
+        for index, group in enumerate(groups):
+            if len(groups) == 1:
+                note = f"Only {len(group)} of the event's {total} accounts are shown."
+            else:
+                note = (f"This is part {index + 1} of {len(groups)} of the event: {len(group)} of its {total} accounts. "
+                        f"The other parts are analyzed separately and merged afterwards; analyze only the accounts shown.")
+            if matching:
+                note += f" {matching} accounts match on all comparable fields and are not shown."
+            chunks.append(({**event, "accounts": dict(group)}, note))
+        self.report[str(event.get("coac_event_key"))] = {
+            "accounts": total,
+            "detailed_accounts": len(attention),
+            "chunks": len(chunks),
+            "failed_chunks": 0,
+            "full_prompt_tokens": estimate_tokens(serialize_event(event, EvidenceAnalystAgent.event_detail)),
+            "largest_chunk_tokens": max(estimate_tokens(serialize_event(chunk, EvidenceAnalystAgent.event_detail))
+                                        for chunk, _ in chunks),
+        }
+        return chunks
+
+    def _findings(self, event: dict, analyses: list) -> list:
+        findings = [analysis for analysis in analyses if analysis and analysis.get("status") != "failed"]
+        self.report[str(event.get("coac_event_key"))]["failed_chunks"] = len(analyses) - len(findings)
+        return findings
+
+    def analyze_chunks(self, event: dict, chunks: list) -> list:
+        """Map step: analyst findings of every chunk that succeeded, in chunk order."""
+        agents = [EvidenceAnalystAgent(chunk, chunk_note=note) for chunk, note in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_chunks, len(agents))) as executor:
+            return self._findings(event, list(executor.map(lambda agent: agent.run(), agents)))
+
+    async def analyze_chunks_async(self, event: dict, chunks: list) -> list:
+        """Async version of analyze_chunks."""
+        agents = [EvidenceAnalystAgent(chunk, chunk_note=note) for chunk, note in chunks]
+        return self._findings(event, await asyncio.gather(*(agent.run_async() for agent in agents)))
+
+    def summary(self) -> dict:
+        entries = list(self.report.values())
+        return {
+            "events_chunked": len(entries),
+            "chunks": sum(entry["chunks"] for entry in entries),
+            "failed_chunks": sum(entry["failed_chunks"] for entry in entries),
+            "accounts": sum(entry["accounts"] for entry in entries),
+            "detailed_accounts": sum(entry["detailed_accounts"] for entry in entries),
+            "largest_full_prompt_tokens": max((entry["full_prompt_tokens"] for entry in entries), default=0),
+            "largest_chunk_tokens": max((entry["largest_chunk_tokens"] for entry in entries), default=0),
+        }
+
+def print_chunking_stats(chunking: AccountChunking):
+    summary = chunking.summary()
+    if not summary["events_chunked"]:
+        return
+    print(f"---Account chunking: {summary['events_chunked']} events split into {summary['chunks']} chunks "
+          f"({summary['failed_chunks']} failed), {summary['detailed_accounts']} of {summary['accounts']} accounts "
+          f"sent in detail; largest analyst prompt ~{summary['largest_chunk_tokens']:,} tokens instead of "
+          f"~{summary['largest_full_prompt_tokens']:,}---")
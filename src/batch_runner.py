@@ -0,0 +1,150 @@
+import re
+import time
+
+from llm_gateway import get_gateway, message_from_payload
+from response_cache import ResponseCache
+
+# ---------------------------
+# Batch backends
+# ---------------------------
+class AnthropicBatchBackend:
+    """Message Batches API: one bulk submission, processed asynchronously by the API."""
+
+    def __init__(self, client=None):
+        self.client = client or get_gateway().client
+
+    def submit(self, requests: list) -> str:
+        batch = self.client.messages.batches.create(requests=requests)
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str):
+        """Yield (custom_id, message or None, error string or None)."""
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, entry.result.message, None
+            else:
+                error = getattr(entry.result, "error", None)
+                yield entry.custom_id, None, f"{entry.result.type}: {error}" if error else entry.result.type
+
+class LocalBatchBackend:
+    """Stand-in for the Message Batches API that runs requests locally.
+
+    Requests are answered one by one through `client.messages.create` (a fake client in
+    tests), and the batch reports as processing for `polls_until_done` status checks so
+    the polling path is exercised without network access.
+    """
+
+    def __init__(self, client, polls_until_done: int = 1):
+        self.client = client
+        self.polls_until_done = polls_until_done
+        self._batches = {}
+
+    def submit(self, requests: list) -> str:
+        batch_id = f"local_batch_{len(self._batches) + 1}"
+        results = []
+        for request in requests:
+            try:
+                results.append((request["custom_id"], self.client.messages.create(**request["params"]), None))
+            except Exception as e:
+                results.append((request["custom_id"], None, f"errored: {e}"))
+        self._batches[batch_id] = {"results": results, "polls": 0}
+        return batch_id
+
+    def is_done(self, batch_id: str) -> bool:
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        return batch["polls"] > self.polls_until_done
+
+    def results(self, batch_id: str):
+        yield from self._batches[batch_id]["results"]
+
+# ---------------------------
+# Batch execution
+# ---------------------------
+def _custom_id(stage: str, key) -> str:
+    # The Batches API only allows [a-zA-Z0-9_-]{1,64} in custom ids.
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", f"{stage}-{key}")[:64]
+
+def run_agents_in_batch(agents_by_key: dict, backend, stage: str, poll_interval: float = 30.0,
+                        timeout: float = 24 * 3600) -> dict:
+    """Run one stage's agents as a single bulk submission.
+
+    Args:
+        agents_by_key: {coac_event_key: agent} for agents with request_params()/parse_response()
+        backend: AnthropicBatchBackend or LocalBatchBackend
+        stage: Stage name, used in the request custom ids
+        poll_interval: Seconds between status checks
+        timeout: Give up waiting after this many seconds
+
+    Replies that are cut off or miss required fields get their missing fields from
+    regular (non-batch) continuation calls, see structured_output.complete_structured.
+
+    Returns:
+        dict: {coac_event_key: parsed response dict, or {"status": "failed", ...}}
+    """
+    gateway = get_gateway()
+    cache = gateway.cache if gateway.cache is not None and gateway.cache.enabled else None
+
+    responses = {}
+    requests = []
+    key_by_custom_id = {}
+    cache_key_by_custom_id = {}
+    for key, agent in agents_by_key.items():
+        params = agent.request_params()
+        custom_id = _custom_id(stage, key)
+        if cache is not None:
+            cache_key = ResponseCache.make_key(params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                gateway.record_call(params["model"], agent.call_tags(), 0.0, cached=True, batch=True)
+                responses[key] = _parse(agent, message_from_payload(cached))
+                continue
+            cache_key_by_custom_id[custom_id] = cache_key
+        key_by_custom_id[custom_id] = key
+        requests.append({"custom_id": custom_id, "params": params})
+
+    if not requests:
+        return responses
+
+    batch_id = backend.submit(requests)
+    print(f"---Submitted {stage} batch {batch_id} with {len(requests)} requests "
+          f"({len(responses)} served from cache)---")
+
+    deadline = time.monotonic() + timeout
+    finished = True
+    while not backend.is_done(batch_id):
+        if time.monotonic() > deadline:
+            print(f"Batch {batch_id} did not finish within {timeout}s")
+            finished = False
+            break
+        time.sleep(poll_interval)
+
+    for custom_id, message, error in (backend.results(batch_id) if finished else []):
+        key = key_by_custom_id.get(custom_id)
+        if key is None:
+            continue
+        agent = agents_by_key[key]
+        gateway.record_call(agent.model, agent.call_tags(), None, usage=getattr(message, "usage", None), batch=True)
+        if message is None:
+            print(f"Batch request {custom_id} failed: {error}")
+            responses[key] = {"status": "failed", "error": error}
+            continue
+        if custom_id in cache_key_by_custom_id:
+            cache.put(cache_key_by_custom_id[custom_id], message.model_dump(mode="json"))
+        responses[key] = _parse(agent, message)
+
+    for key in agents_by_key:
+        if key not in responses:
+            responses[key] = {"status": "failed", "error": "no result returned from batch"}
+    print(f"---Finished {stage} batch {batch_id}---")
+    return responses
+
+def _parse(agent, message) -> dict:
+    try:
+        return agent.parse_response(message)
+    except Exception as e:
+        print(f"Error parsing batch response: {e}")
+        return {"status": "failed", "error": str(e)}
@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from parse_data import (
+    COMPARABLE_FIELDS, build_events, combine_facts, normalize_custody, normalize_nbim,
+    parse_data, parse_date, parse_date_series, to_decimal, to_decimal_series,
+)
+from ingest import ingest_bookings
+from materiality import compute_materiality
+from prompt_format import count_prompt_tokens, estimate_tokens, serialize_event
+
+# ---------------------------
+# Sample scaling
+# ---------------------------
+def load_sample_data():
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    custody_df = pd.read_csv(os.path.join(data_dir, "CUSTODY_Dividend_Bookings 1.csv"), sep=";")
+    nbim_df = pd.read_csv(os.path.join(data_dir, "NBIM_Dividend_Bookings 1.csv"), sep=";")
+    return custody_df, nbim_df
+
+def scale_sample(df: pd.DataFrame, copies: int) -> pd.DataFrame:
+    """Repeat the sample rows `copies` times, giving every copy its own event keys."""
+    frames = []
+    for copy in range(copies):
+        frame = df.copy()
+        frame["COAC_EVENT_KEY"] = frame["COAC_EVENT_KEY"] + copy * 1_000_000_000
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def build_facts(custody_df: pd.DataFrame, nbim_df: pd.DataFrame) -> pd.DataFrame:
+    return combine_facts(normalize_nbim(nbim_df), normalize_custody(custody_df))
+
+# ---------------------------
+# Row-by-row reference (previous parse_data assembly and mismatch loop)
+# ---------------------------
+def legacy_add_mismatch_analysis(events):
+    for event in events.values():
+        for account_data in event["accounts"].values():
+            nbim_entry, custody_entry = account_data["NBIM"], account_data["Custody"]
+            if nbim_entry and custody_entry:
+                account_data["mismatches"] = [
+                    {"field": field, "nbim_value": nbim_entry.get(field), "custody_value": custody_entry.get(field)}
+                    for field in COMPARABLE_FIELDS
+                    if (nbim_entry.get(field) is None) != (custody_entry.get(field) is None)
+                    or str(nbim_entry.get(field)).strip() != str(custody_entry.get(field)).strip()
+                ]
+            elif nbim_entry:
+                account_data["mismatches"] = [{"field": "missing_custody", "nbim_value": "present", "custody_value": "missing"}]
+            else:
+                account_data["mismatches"] = [{"field": "missing_nbim", "nbim_value": "missing", "custody_value": "present"}]
+
+def legacy_assemble_events(facts: pd.DataFrame) -> list:
+    events = {}
+    for _, event_row in facts.iterrows():
+        event_key = event_row["coac_event_key"]
+        if pd.isna(event_key):
+            continue
+        account_id = event_row["account_id"]
+        account_key = "_NO_ACCOUNT_" if account_id is None else str(account_id)
+        event = events.setdefault(event_key, {"coac_event_key": event_key, "accounts": {}})
+        account = event["accounts"].setdefault(account_key, {"NBIM": None, "Custody": None})
+        entry = {"row_id": int(event_row["source_row"]) if pd.notna(event_row["source_row"]) else None}
+        for field in ("isin", "sedol", "ticker", "ex_date", "pay_date", "currency", "settlement_currency",
+                      "custodian", "company_name", "instrument_description", "organisation_name",
+                      "dividend_rate", "gross_amount", "net_amount", "settlement_net_amount",
+                      "withholding_tax", "withholding_rate", "total_tax_rate", "quantity",
+                      "holding_quantity", "loan_quantity", "lending_percentage", "fx_rate",
+                      "fx_rate_to_portfolio", "is_cross_currency_reversal", "local_tax",
+                      "local_tax_settlement", "restitution_payment", "restitution_amount",
+                      "restitution_rate", "portfolio_gross_amount", "portfolio_net_amount",
+                      "portfolio_withholding_tax"):
+            entry[field] = event_row.get(field)
+        account[event_row["source"]] = entry
+    legacy_add_mismatch_analysis(events)
+    return list(events.values())
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def time_call(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+def benchmark_assembly(copies: int):
+    custody_df, nbim_df = load_sample_data()
+    facts = build_facts(scale_sample(custody_df, copies), scale_sample(nbim_df, copies))
+    rows = len(facts)
+
+    _, legacy_seconds = time_call(legacy_assemble_events, facts)
+    events, columnar_seconds = time_call(build_events, facts)
+    # Touch every event once so the lazy dict building is part of the measurement.
+    _, materialize_seconds = time_call(lambda: [event for event in events])
+
+    print(f"Event assembly, {rows} rows / {len(events)} events:")
+    print(f"  row-by-row (iterrows):      {rows / legacy_seconds:12,.0f} rows/sec ({legacy_seconds:.3f}s)")
+    print(f"  columnar (build only):      {rows / columnar_seconds:12,.0f} rows/sec ({columnar_seconds:.3f}s)")
+    total = columnar_seconds + materialize_seconds
+    print(f"  columnar (+ all event dicts): {rows / total:10,.0f} rows/sec ({total:.3f}s)")
+
+def benchmark_materiality(copies: int):
+    custody_df, nbim_df = load_sample_data()
+    facts = build_facts(scale_sample(custody_df, copies), scale_sample(nbim_df, copies))
+    events, _ = time_call(build_events, facts)
+    materiality, seconds = time_call(compute_materiality, events)
+    print(f"Materiality scoring, {len(events)} events / {len(events.accounts)} accounts:")
+    print(f"  vectorized:                 {len(events) / seconds:12,.0f} events/sec ({seconds:.3f}s)")
+
+def benchmark_coercion(copies: int):
+    custody_df, nbim_df = load_sample_data()
+    raw = scale_sample(nbim_df, copies)
+    # Read everything as text, like the full files with thousands separators and mixed formats.
+    raw = raw.astype(str)
+    number_columns = ["DIVIDENDS_PER_SHARE", "GROSS_AMOUNT_QUOTATION", "NET_AMOUNT_QUOTATION",
+                      "WTHTAX_COST_QUOTATION", "WTHTAX_RATE", "NOMINAL_BASIS", "GROSS_AMOUNT_PORTFOLIO"]
+    date_columns = ["EXDATE", "PAYMENT_DATE"]
+    cells = len(raw) * (len(number_columns) + len(date_columns))
+
+    def per_cell():
+        for column in number_columns:
+            raw[column].apply(to_decimal)
+        for column in date_columns:
+            raw[column].apply(parse_date)
+
+    def vectorized():
+        for column in number_columns:
+            to_decimal_series(raw[column])
+        for column in date_columns:
+            parse_date_series(raw[column])
+
+    _, per_cell_seconds = time_call(per_cell)
+    _, vectorized_seconds = time_call(vectorized)
+
+    print(f"Numeric/date coercion, {cells} cells:")
+    print(f"  per-cell apply():           {cells / per_cell_seconds:12,.0f} cells/sec ({per_cell_seconds:.3f}s)")
+    print(f"  vectorized:                 {cells / vectorized_seconds:12,.0f} cells/sec ({vectorized_seconds:.3f}s)")
+
+def benchmark_prompt_size(exact: bool = False):
+    """Event prompt size before (raw dict repr) and after compact serialization.
+
+    Uses the ~4 chars/token estimate, or the token counting endpoint with `exact`."""
+    custody_df, nbim_df = load_sample_data()
+    events, _ = time_call(parse_data, custody_df, nbim_df)
+    count = count_prompt_tokens if exact else estimate_tokens
+
+    print(f"Event prompt tokens ({'counted' if exact else 'estimated'}): raw repr -> full -> mismatched")
+    totals = [0, 0, 0]
+    for event in events:
+        sizes = [count(str(event)), count(serialize_event(event, "full")), count(serialize_event(event, "mismatched"))]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print(f"  event {event['coac_event_key']}: {sizes[0]:6} -> {sizes[1]:6} -> {sizes[2]:6}")
+    print(f"  total:           {totals[0]:6} -> {totals[1]:6} ({1 - totals[1] / totals[0]:.0%} smaller) "
+          f"-> {totals[2]:6} ({1 - totals[2] / totals[0]:.0%} smaller)")
+
+def peak_memory_call(func, *args):
+    """Run func and return (result, seconds, peak traced memory in bytes)."""
+    tracemalloc.start()
+    try:
+        result, seconds = time_call(func, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+def benchmark_ingestion(copies: int, chunksize: int):
+    """Whole-file read_csv + parse_data against chunked ingestion, on the scaled sample written to disk."""
+    custody_df, nbim_df = load_sample_data()
+    with tempfile.TemporaryDirectory() as directory:
+        custody_path = os.path.join(directory, "custody.csv")
+        nbim_path = os.path.join(directory, "nbim.csv")
+        scale_sample(custody_df, copies).to_csv(custody_path, sep=";", index=False)
+        scale_sample(nbim_df, copies).to_csv(nbim_path, sep=";", index=False)
+
+        def whole_file():
+            return parse_data(pd.read_csv(custody_path, sep=";"), pd.read_csv(nbim_path, sep=";"))
+
+        events, whole_seconds, whole_peak = peak_memory_call(whole_file)
+        _, chunked_seconds, chunked_peak = peak_memory_call(ingest_bookings, custody_path, nbim_path, chunksize)
+
+    rows = 2 * len(custody_df) * copies
+    print(f"Ingestion, {rows} rows / {len(events)} events (chunks of {chunksize}):")
+    print(f"  read_csv + parse_data:      {rows / whole_seconds:12,.0f} rows/sec, peak {whole_peak / 2**20:8.1f} MiB")
+    print(f"  chunked, partitioned:       {rows / chunked_seconds:12,.0f} rows/sec, peak {chunked_peak / 2**20:8.1f} MiB")
+
+def benchmark_sharding(copies: int, chunksize: int, workers: int):
+    """Ingestion with the partitions parsed in this process against a pool of `workers` processes."""
+    custody_df, nbim_df = load_sample_data()
+    with tempfile.TemporaryDirectory() as directory:
+        custody_path = os.path.join(directory, "custody.csv")
+        nbim_path = os.path.join(directory, "nbim.csv")
+        scale_sample(custody_df, copies).to_csv(custody_path, sep=";", index=False)
+        scale_sample(nbim_df, copies).to_csv(nbim_path, sep=";", index=False)
+        rows = 2 * len(custody_df) * copies
+
+        print(f"Sharded ingestion, {rows} rows ({os.cpu_count()} cores):")
+        _, single_seconds = time_call(ingest_bookings, custody_path, nbim_path, chunksize)
+        print(f"  1 process:                  {rows / single_seconds:12,.0f} rows/sec ({single_seconds:.3f}s)")
+        _, pool_seconds = time_call(lambda: ingest_bookings(custody_path, nbim_path, chunksize, workers=workers))
+        label = f"{workers} worker processes:"
+        print(f"  {label:<28}{rows / pool_seconds:12,.0f} rows/sec ({pool_seconds:.3f}s, "
+              f"{single_seconds / pool_seconds:.1f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reconciliation data preparation.")
+    parser.add_argument("--copies", type=int, default=1000, help="How many times to repeat the sample files")
+    parser.add_argument("--count-tokens", action="store_true",
+                        help="Count prompt tokens with the API instead of estimating them")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows per chunk for the ingestion benchmark")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for the sharding benchmark")
+    args = parser.parse_args()
+    benchmark_prompt_size(exact=args.count_tokens)
+    benchmark_coercion(args.copies)
+    benchmark_assembly(args.copies)
+    benchmark_materiality(args.copies)
+    benchmark_ingestion(args.copies, args.chunk_size)
+    benchmark_sharding(args.copies, args.chunk_size, args.workers)
+
+if __name__ == "__main__":
+    main()
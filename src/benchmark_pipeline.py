@@ -0,0 +1,166 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows: peak memory is not reported there
+    resource = None
+
+from batch_runner import LocalBatchBackend
+from critic_budget import CriticLoopBudget
+from ingest import ingest_bookings
+from llm_gateway import set_gateway
+from main import run_reconciliation_pipeline
+from simulated_llm import simulated_gateway
+from synthetic_data import BREAK_TYPES, write_bookings
+from tiered_routing import TieredRouter
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# ---------------------------
+# One scale point
+# ---------------------------
+def _peak_rss_mib():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+def stage_latency_percentiles(call_log: list) -> dict:
+    """{stage: {"calls", "p50_seconds", "p95_seconds"}} over the API calls of a run."""
+    latencies = {}
+    for record in call_log:
+        if not record["cached"] and record["latency_seconds"] is not None:
+            latencies.setdefault(record["stage"], []).append(record["latency_seconds"])
+    return {
+        stage: {"calls": len(values), "p50_seconds": float(np.percentile(values, 50)),
+                "p95_seconds": float(np.percentile(values, 95))}
+        for stage, values in latencies.items()
+    }
+
+def run_scale_point(events: int, latency_scale: float, concurrency: int, workers: int, parser_only: bool,
+                    break_rate: float, seed: int, tiered: bool = False, triage_audit_rate: float = 0.0,
+                    truncation_rate: float = 0.0, batch: bool = False) -> dict:
+    """Generate `events` synthetic events, then time ingestion and the full pipeline on them.
+    Meant to run in its own process, so the peak RSS belongs to this scale point alone.
+    With `tiered` the pipeline runs with a TieredRouter and its summary is included.
+    `truncation_rate` is the share of simulated replies cut off at max_tokens; their
+    continuation calls show up as "<stage>_continuation" in the stage latencies. With `batch`
+    conclusions and consequences go through run_batch_stages, answered by a LocalBatchBackend."""
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        custody_path, nbim_path, injected = write_bookings(directory, events=events, break_rate=break_rate,
+                                                           break_types=BREAK_TYPES, seed=seed)
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            event_data = ingest_bookings(custody_path, nbim_path, workers=workers)
+            parse_seconds = time.perf_counter() - start
+        rows = len(event_data.accounts)
+        result = {
+            "events": events,
+            "rows": rows,
+            "injected_breaks": len(injected),
+            "parse_seconds": parse_seconds,
+            "parse_events_per_second": events / parse_seconds,
+        }
+        if not parser_only:
+            gateway = simulated_gateway(latency_scale=latency_scale, seed=seed, truncation_rate=truncation_rate)
+            set_gateway(gateway)
+            router = TieredRouter(audit_rate=triage_audit_rate) if tiered else None
+            batch_backend = LocalBatchBackend(gateway.client, polls_until_done=0) if batch else None
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                breaks = run_reconciliation_pipeline(None, None, max_concurrency=concurrency,
+                                                     critic_budget=CriticLoopBudget(gateway=gateway), event_data=event_data,
+                                                     router=router, batch_backend=batch_backend)
+                pipeline_seconds = time.perf_counter() - start
+            result.update({
+                "breaks": len(breaks),
+                "llm_calls": len(gateway.call_log),
+                "pipeline_seconds": pipeline_seconds,
+                "pipeline_events_per_second": events / pipeline_seconds,
+                "stage_latency": stage_latency_percentiles(gateway.call_log),
+            })
+            if router is not None:
+                result["tiered_routing"] = router.summary()
+    result["peak_rss_mib"] = _peak_rss_mib()
+    return result
+
+def run_isolated(**kwargs) -> dict:
+    # A fresh interpreter per scale point: peak memory is not inflated by earlier points.
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_scale_point, **kwargs).result()
+
+# ---------------------------
+# Report
+# ---------------------------
+def _milliseconds(seconds) -> str:
+    return f"{seconds * 1000:.1f} ms" if seconds is not None else "n/a"
+
+def print_scale_point(result: dict):
+    peak = f"{result['peak_rss_mib']:.0f} MiB" if result["peak_rss_mib"] is not None else "n/a"
+    print(f"{result['events']:>9,} events / {result['rows']:,} accounts, peak RSS {peak}")
+    print(f"  parse:    {result['parse_events_per_second']:12,.0f} events/sec ({result['parse_seconds']:.2f}s)")
+    if "pipeline_seconds" in result:
+        print(f"  pipeline: {result['pipeline_events_per_second']:12,.0f} events/sec ({result['pipeline_seconds']:.2f}s), "
+              f"{result['llm_calls']:,} LLM calls, {result['breaks']:,} breaks ({result['injected_breaks']:,} injected)")
+        for stage, latency in result["stage_latency"].items():
+            print(f"    {stage:<23} {latency['calls']:8,} calls  p50 {latency['p50_seconds'] * 1000:8.1f} ms  "
+                  f"p95 {latency['p95_seconds'] * 1000:8.1f} ms")
+    if "tiered_routing" in result:
+        routing = result["tiered_routing"]
+        agreement = routing["agreement"]
+        print(f"  tiered:   {routing['accepted']:,} concluded by triage, {routing['escalated']:,} escalated "
+              f"{routing['escalation_reasons']}, median event {_milliseconds(routing['median_event_seconds'])} "
+              f"(full chain {_milliseconds(routing['median_full_chain_seconds'])})")
+        if agreement["compared"]:
+            print(f"            agreement with the full chain over {agreement['compared']:,} events: "
+                  f"is_break {agreement['is_break_agreement']:.0%}, "
+                  f"classification {agreement['classification_agreement']:.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing and the full pipeline on synthetic data "
+                                                 "with a simulated LLM (no API key needed).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Event counts to run")
+    parser.add_argument("--latency-scale", type=float, default=0.01,
+                        help="Simulated LLM latency as a fraction of typical API latency")
+    parser.add_argument("--concurrency", type=int, default=64, help="Events processed concurrently by the pipeline")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for parsing the event partitions")
+    parser.add_argument("--break-rate", type=float, default=0.3, help="Share of events with an injected break")
+    parser.add_argument("--parser-only", action="store_true", help="Skip the agent pipeline")
+    parser.add_argument("--tiered", action="store_true",
+                        help="Triage events with the small model first (see tiered_routing.py)")
+    parser.add_argument("--triage-audit-rate", type=float, default=0.0,
+                        help="With --tiered, share of accepted events also run through the full chain")
+    parser.add_argument("--truncation-rate", type=float, default=0.0,
+                        help="Share of simulated replies cut off at max_tokens (exercises continuation calls)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run conclusions and consequences in batch mode, answered locally by the simulated LLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+    if args.tiered and args.batch:
+        parser.error("--tiered and --batch cannot be combined")
+
+    results = []
+    for events in args.sizes:
+        result = run_isolated(events=events, latency_scale=args.latency_scale, concurrency=args.concurrency,
+                              workers=args.workers, parser_only=args.parser_only, break_rate=args.break_rate,
+                              seed=args.seed, tiered=args.tiered, triage_audit_rate=args.triage_audit_rate,
+                              truncation_rate=args.truncation_rate, batch=args.batch)
+        print_scale_point(result)
+        results.append(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
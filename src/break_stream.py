@@ -0,0 +1,81 @@
+import bisect
+import json
+import time
+
+from materiality import PRIORITY_ORDER
+
+# ---------------------------
+# Streaming outputs
+# ---------------------------
+class JsonlBreakSink:
+    """Writes each break as one JSON line as soon as it is produced.
+
+    The file is flushed after every break, so it can be tailed while the run is going
+    and already holds every finished break if the process dies. Fields filled in after a
+    break was written follow as a patch line, {"coac_event_key": ..., "patch": {field: value}},
+    which updates the break written earlier with that key.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, break_event: dict):
+        self._file.write(json.dumps(break_event, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def patch(self, coac_event_key, fields: dict):
+        self._file.write(json.dumps({"coac_event_key": coac_event_key, "patch": fields}, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _rank(break_event: dict) -> tuple:
+    return (PRIORITY_ORDER.get(break_event.get("priority", "Medium"), 2), -break_event.get("materiality_portfolio_amount", 0.0))
+
+class PriorityView:
+    """Running priority-ordered view of the breaks streamed so far.
+
+    Breaks are kept in the same order rank_breaks would give for the breaks seen so far,
+    with ties in arrival order. Also records when the first break arrived.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_break_seconds = None
+        self.breaks = []
+        self._keys = []
+
+    def add(self, break_event: dict) -> int:
+        """Insert a break and return its current position (0 = most urgent)."""
+        if self.first_break_seconds is None:
+            self.first_break_seconds = time.perf_counter() - self.started_at
+        key = (*_rank(break_event), len(self._keys))
+        position = bisect.bisect(self._keys, key)
+        self._keys.insert(position, key)
+        self.breaks.insert(position, break_event)
+        return position
+
+    def top(self, count: int = 3) -> list:
+        return self.breaks[:count]
+
+    def summary(self) -> dict:
+        return {
+            "breaks": len(self.breaks),
+            "time_to_first_break_seconds": self.first_break_seconds,
+            "total_seconds": time.perf_counter() - self.started_at,
+        }
+
+def print_view_update(view: PriorityView, break_event: dict, position: int):
+    top = ", ".join(f"{entry['coac_event_key']} ({entry.get('priority')})" for entry in view.top())
+    print(f"---Break {break_event['coac_event_key']} ({break_event.get('priority')}) is #{position + 1} "
+          f"of {len(view.breaks)} so far; top: {top}---")
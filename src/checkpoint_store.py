@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "checkpoint.sqlite")
+
+# ---------------------------
+# Per-event stage checkpoints
+# ---------------------------
+class CheckpointStore:
+    """SQLite store of stage results per coac_event_key, for resuming an interrupted run.
+
+    Stages: "evidence" (final analysis after the critic loop), "critic" (rounds and stop
+    reason), "conclusion" and "consequence". Failed results are never stored, so a resumed
+    run retries them. Writes are buffered and committed in one transaction every
+    `flush_every` results or `flush_interval` seconds, and on close.
+
+    The store also keeps the previous run's content fingerprint per (event, account, side).
+    sync_fingerprints() drops the stored results of new or changed events, so unchanged
+    events carry their classification forward and only changes go back to the agents.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, flush_every: int = 50, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        # Agents may run on a background event loop thread, so share one connection under a lock.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS stage_results ("
+                "coac_event_key TEXT NOT NULL, stage TEXT NOT NULL, result TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (coac_event_key, stage))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "coac_event_key TEXT NOT NULL, account_key TEXT NOT NULL, side TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "PRIMARY KEY (coac_event_key, account_key, side))"
+            )
+
+    def get(self, event_key, stage: str):
+        """Stored result dict, or None if the stage has not completed for this event."""
+        key = (str(event_key), stage)
+        with self._lock:
+            if key in self._pending:
+                return json.loads(self._pending[key][0])
+            row = self._connection.execute(
+                "SELECT result FROM stage_results WHERE coac_event_key = ? AND stage = ?", key
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, event_key, stage: str, result: dict):
+        if not result or result.get("status") == "failed":
+            return
+        with self._lock:
+            # Serialized now, so later changes to the dict do not leak into the checkpoint.
+            self._pending[(str(event_key), stage)] = (json.dumps(result, ensure_ascii=False, default=str), time.time())
+            due = len(self._pending) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO stage_results (coac_event_key, stage, result, updated_at) VALUES (?, ?, ?, ?)",
+                        [(event_key, stage, result, updated_at) for (event_key, stage), (result, updated_at) in self._pending.items()],
+                    )
+                self._pending.clear()
+            self._last_flush = time.monotonic()
+
+    def completed_count(self, stage: str) -> int:
+        self.flush()
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM stage_results WHERE stage = ?", (stage,)).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            with self._connection:
+                self._connection.execute("DELETE FROM stage_results")
+                self._connection.execute("DELETE FROM fingerprints")
+
+    def sync_fingerprints(self, event_data) -> dict:
+        """Compare the run's fingerprints with the stored ones and invalidate what changed.
+
+        An event counts as changed when any of its (account, side) fingerprints differs, or an
+        account or side appeared or disappeared. Stage results of changed, new and removed
+        events are deleted; the stored fingerprints are replaced with the current ones.
+
+        Args:
+            event_data: EventCollection from parse_data
+
+        Returns:
+            dict: Counts of unchanged, changed, new and removed events
+        """
+        self.flush()
+        current = event_data.fingerprints().astype({"coac_event_key": str, "account_key": str})
+        with self._lock:
+            previous = pd.read_sql_query("SELECT coac_event_key, account_key, side, fingerprint FROM fingerprints",
+                                         self._connection)
+
+        compared = current.merge(previous, on=["coac_event_key", "account_key", "side"], how="outer",
+                                 suffixes=("", "_previous"), indicator=True)
+        differs = (compared["_merge"] != "both") | (compared["fingerprint"] != compared["fingerprint_previous"])
+        current_keys = set(current["coac_event_key"])
+        previous_keys = set(previous["coac_event_key"])
+        new_keys = current_keys - previous_keys
+        removed_keys = previous_keys - current_keys
+        changed_keys = set(compared.loc[differs, "coac_event_key"]) - new_keys - removed_keys
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany("DELETE FROM stage_results WHERE coac_event_key = ?",
+                                             [(key,) for key in changed_keys | new_keys | removed_keys])
+                self._connection.execute("DELETE FROM fingerprints")
+                self._connection.executemany(
+                    "INSERT INTO fingerprints (coac_event_key, account_key, side, fingerprint) VALUES (?, ?, ?, ?)",
+                    current.itertuples(index=False, name=None),
+                )
+        return {
+            "unchanged_events": len(current_keys - changed_keys - new_keys),
+            "changed_events": len(changed_keys),
+            "new_events": len(new_keys),
+            "removed_events": len(removed_keys),
+        }
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
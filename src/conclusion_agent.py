@@ -1,9 +1,23 @@
 import pandas as pd
-import anthropic
-import os
-import json
+from structured_output import complete_structured, output_tool, request_structured, request_structured_async
+from prompt_format import serialize_event
 
 class ConclusionAgent:
+    model = "claude-sonnet-4-20250514"
+    max_tokens = 2000
+    event_detail = "mismatched"
+    stage = "conclusion"
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "evidence": {"type": "array", "items": {"type": "string"}},
+            "is_break": {"type": "boolean"},
+            "classification": {"type": "string"},
+            "brief_summary_of_root_cause": {"type": "string"},
+        },
+        "required": ["evidence", "is_break", "classification", "brief_summary_of_root_cause"],
+    }
+
     def __init__(self, event: dict, evidence_analysis: dict):
         self.event = event
         self.evidence_analysis = evidence_analysis
@@ -45,24 +59,45 @@ class ConclusionAgent:
         Hypothesis: {evidence_analysis.get('hypothesis', 'No hypothesis provided')}
 
         Original coac event for reference:
-        {event}
+        {serialize_event(event, self.event_detail)}
         """
         return prompt
 
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create, also used for batch submission."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        print(f"Conclusion for event {self.event['coac_event_key']}: {response_dict.get('is_break', 'Unknown')} - {response_dict.get('classification', 'Unknown')}")
+        return response_dict
+
     def run(self):
         try:
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
-                messages=[
-                    {"role": "user", "content": self.system_prompt},
-                    {"role": "assistant", "content": "{"}
-                ],
-            )
-            response_text = "{"+response.content[0].text
-            response_dict = json.loads(response_text)
-            print(f"Conclusion for event {self.event['coac_event_key']}: {response_dict.get('is_break', 'Unknown')} - {response_dict.get('classification', 'Unknown')}")
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error making conclusion for event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+        
+        return response_dict
+
+    async def run_async(self):
+        """Same as run(), using the async client so many events can be processed concurrently."""
+        try:
+            response_dict = self.handle_output(await request_structured_async(self))
 
         except Exception as e:
             print(f"Error making conclusion for event {self.event['coac_event_key']}: {e}")
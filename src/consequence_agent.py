@@ -0,0 +1,103 @@
+from structured_output import complete_structured, output_tool, request_structured
+
+# Breaks per ConsequenceAgent call.
+CONSEQUENCE_CHUNK_SIZE = 20
+# When streaming, breaks are emitted before their consequence is written. The consequences are
+# then written per this many breaks, or for the breaks waiting this long, whichever comes first.
+STREAM_CONSEQUENCE_BATCH = 5
+STREAM_CONSEQUENCE_WAIT_SECONDS = 30.0
+
+class ConsequenceAgent:
+    """Writes the consequence text for many prioritized breaks in one call.
+
+    Materiality and priority are computed deterministically (see materiality.py); the model
+    only explains what each break means in practice.
+    """
+    model = "claude-sonnet-4-20250514"
+    max_tokens = 4000
+    stage = "consequence"
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "consequences": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"coac_event_key": {"type": "string"}, "consequence": {"type": "string"}},
+                    "required": ["coac_event_key", "consequence"],
+                },
+            },
+        },
+        "required": ["consequences"],
+    }
+
+    def __init__(self, breaks: list):
+        self.breaks = breaks
+        self.return_format = """
+        {
+            "consequences": [{"coac_event_key": "string", "consequence": "string"}]
+        }
+        """
+        self.system_prompt = self._get_system_prompt(self.breaks, self.return_format)
+
+    def _get_system_prompt(self, breaks: list, return_format: str):
+        break_lines = "\n".join(
+            f"- Event Key: {break_event.get('coac_event_key')} | Priority: {break_event.get('priority')} | "
+            f"Materiality: {break_event.get('materiality')} | Classification: {break_event.get('classification', 'Unknown')} | "
+            f"Root Cause: {break_event.get('brief_summary_of_root_cause', 'Unknown')}"
+            for break_event in breaks
+        )
+        prompt = f"""
+        You are a reconciliation analyst for dividend events, comparing Custody data to internal data from NBIM.
+        Materiality and priority of the breaks below have already been calculated. For each break, write a short consequence (one or two sentences).
+
+        For consequence, consider:
+        - Financial impact. Is the materiality going to be a costly problem? Is the issue a data issue, or systematic faliure with tangible consequences?
+        - Regulatory/compliance implications
+        - Operational impact on downstream processes
+        - Risk of issue spreading or recurring
+
+        Return exactly one entry per break, using the event keys as given.
+        Output strictly valid JSON matching the provided schema. Do not restate inputs.
+
+        The return format of your output should be JSON matching this pattern:
+        {return_format}
+
+        The breaks:
+        {break_lines}
+        """
+        return prompt
+
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records. One call covers several events."""
+        return {"stage": self.stage, "event_key": "multiple"}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create, also used for batch submission."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        """Returns {str(coac_event_key): consequence}."""
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        consequences = {str(entry.get("coac_event_key")): entry.get("consequence")
+                        for entry in response_dict.get("consequences", [])}
+        print(f"Consequences written for {len(consequences)} of {len(self.breaks)} breaks")
+        return consequences
+
+    def run(self):
+        try:
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error writing consequences: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        return response_dict
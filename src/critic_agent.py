@@ -1,11 +1,25 @@
 import pandas as pd
-import anthropic
-import os
-import json
+from structured_output import complete_structured, output_tool, request_structured, request_structured_async
+from prompt_format import serialize_event
 
 class CriticAgent:
-    def __init__(self, event: dict, evaluated_output: dict):
+    model = "claude-opus-4-1-20250805"  # Strong reasoning model.
+    max_tokens = 3000
+    event_detail = "full"
+    stage = "critic"
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "feedback_string_to_evidence_analyst_agent": {"type": "string"},
+            "approved": {"type": "boolean"},
+        },
+        "required": ["feedback_string_to_evidence_analyst_agent", "approved"],
+    }
+
+    def __init__(self, event: dict, evaluated_output: dict, event_detail: str = None):
         self.event = event
+        if event_detail:
+            self.event_detail = event_detail
         self.evaluated_output = evaluated_output
         self.return_format = """
         {
@@ -41,25 +55,46 @@ class CriticAgent:
         {evaluated_output}
 
         The data you are cross checking it against is:
-        {event}
+        {serialize_event(event, self.event_detail)}
         """
         return prompt
 
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create, also used for batch submission."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        approved = response_dict.get("approved", False)
+        print(f"Critic evaluation: {'APPROVED' if approved else 'REJECTED'} - Feedback to analyst agent: {len(response_dict.get('feedback_string_to_evidence_analyst_agent', ''))} chars")
+        return response_dict
+
     def run(self):
         try:
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            response = client.messages.create(
-                model="claude-opus-4-1-20250805",  # Strong reasoning model.
-                max_tokens=3000,
-                messages=[
-                    {"role": "user", "content": self.system_prompt},
-                    {"role": "assistant", "content": "{"}
-                ],
-            )
-            response_text = "{"+response.content[0].text
-            response_dict = json.loads(response_text)
-            approved = response_dict.get("approved", False)
-            print(f"Critic evaluation: {'APPROVED' if approved else 'REJECTED'} - Feedback to analyst agent: {len(response_dict.get('feedback_string_to_evidence_analyst_agent', ''))} chars")
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error in critic evaluation: {e}")
+            return {"status": "failed", "error": str(e)}
+        
+        return response_dict
+
+    async def run_async(self):
+        """Same as run(), using the async client so many events can be processed concurrently."""
+        try:
+            response_dict = self.handle_output(await request_structured_async(self))
 
         except Exception as e:
             print(f"Error in critic evaluation: {e}")
@@ -0,0 +1,103 @@
+import difflib
+import math
+
+from llm_gateway import get_gateway
+from pre_classifier import event_mismatch_count
+
+CRITIC_LOOP_STAGES = ("evidence", "evidence_chunk", "evidence_reduce", "critic")
+# Critic feedback at least this similar to the previous round's counts as repeated.
+FEEDBACK_REPEAT_SIMILARITY = 0.9
+
+# ---------------------------
+# Convergence checks
+# ---------------------------
+def evidence_signature(evidence_analysis: dict) -> frozenset:
+    """Order- and whitespace-insensitive form of the analyst's evidence list."""
+    return frozenset(" ".join(str(point).lower().split()) for point in evidence_analysis.get("evidence") or [])
+
+def feedback_repeats(previous_feedback: str, feedback: str) -> bool:
+    if not previous_feedback or not feedback:
+        return False
+    previous_text = " ".join(previous_feedback.lower().split())
+    text = " ".join(feedback.lower().split())
+    return difflib.SequenceMatcher(None, previous_text, text).ratio() >= FEEDBACK_REPEAT_SIMILARITY
+
+# ---------------------------
+# Iteration budget
+# ---------------------------
+class CriticLoopBudget:
+    """Round allowance for the analyst/critic loop, per event and per run.
+
+    Each event is allowed 1 + ceil(log2(1 + mismatches)) rounds, clamped to
+    [min_rounds, max_rounds]: one mismatch gets 2 rounds, 3 get 3, 8 or more get 5.
+    The first round of every event always runs. Revision rounds also draw on the run-wide
+    `run_round_budget` and `run_token_budget` (analyst + critic tokens from the gateway's
+    call log), so a run cannot overshoot when many events keep iterating.
+
+    `report` collects {coac_event_key: {"mismatches", "allowed_rounds", "rounds", "stop_reason"}}.
+    """
+
+    def __init__(self, max_rounds: int = 5, min_rounds: int = 1, run_round_budget: int = None,
+                 run_token_budget: int = None, gateway=None):
+        self.max_rounds = max_rounds
+        self.min_rounds = min_rounds
+        self.run_round_budget = run_round_budget
+        self.run_token_budget = run_token_budget
+        self.gateway = gateway
+        self.revision_rounds_used = 0
+        self._call_log_start = len(self._gateway().call_log)
+        self.report = {}
+
+    def _gateway(self):
+        return self.gateway or get_gateway()
+
+    def rounds_for(self, event: dict) -> int:
+        mismatches = event_mismatch_count(event)
+        rounds = 1 + math.ceil(math.log2(1 + mismatches))
+        return max(self.min_rounds, min(self.max_rounds, rounds))
+
+    def tokens_used(self) -> int:
+        return sum(record["input_tokens"] + record["output_tokens"]
+                   for record in self._gateway().call_log[self._call_log_start:]
+                   if record["stage"] in CRITIC_LOOP_STAGES)
+
+    def run_budget_left(self) -> bool:
+        if self.run_round_budget is not None and self.revision_rounds_used >= self.run_round_budget:
+            return False
+        if self.run_token_budget is not None and self.tokens_used() >= self.run_token_budget:
+            return False
+        return True
+
+    def start_revision(self):
+        self.revision_rounds_used += 1
+
+    def record(self, event: dict, rounds: int, stop_reason: str):
+        self.report[event.get("coac_event_key")] = {
+            "mismatches": event_mismatch_count(event),
+            "allowed_rounds": self.rounds_for(event),
+            "rounds": rounds,
+            "stop_reason": stop_reason,
+        }
+
+    def summary(self) -> dict:
+        rounds = [entry["rounds"] for entry in self.report.values()]
+        stop_reasons = {}
+        for entry in self.report.values():
+            stop_reasons[entry["stop_reason"]] = stop_reasons.get(entry["stop_reason"], 0) + 1
+        return {
+            "events": len(rounds),
+            "total_rounds": sum(rounds),
+            "revision_rounds": self.revision_rounds_used,
+            "max_rounds": max(rounds, default=0),
+            "tokens_used": self.tokens_used(),
+            "stop_reasons": stop_reasons,
+            "per_event": {str(key): entry for key, entry in self.report.items()},
+        }
+
+def print_critic_loop_report(budget: CriticLoopBudget):
+    summary = budget.summary()
+    for event_key, entry in summary["per_event"].items():
+        print(f"---Critic loop {event_key}: {entry['rounds']}/{entry['allowed_rounds']} rounds "
+              f"({entry['mismatches']} mismatches), stopped: {entry['stop_reason']}---")
+    print(f"---Critic loop total: {summary['total_rounds']} rounds over {summary['events']} events, "
+          f"{summary['tokens_used']} tokens---")
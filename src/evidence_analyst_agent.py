@@ -1,12 +1,28 @@
 import pandas as pd
-import anthropic
-import os
-import json
+from structured_output import complete_structured, output_tool, request_structured, request_structured_async
+from prompt_format import serialize_event
 
 class EvidenceAnalystAgent:
-    def __init__(self, event: dict, previous_response: dict = {}, critic_feedback: str = ""):
+    model = "claude-sonnet-4-20250514"
+    max_tokens = 3000
+    event_detail = "full"  # Fields shown in the prompt: "full" or "mismatched"
+    stage = "evidence"
+    # Input schema of the output tool (see structured_output.py); mirrors return_format.
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "evidence": {"type": "array", "items": {"type": "string"}},
+            "hypothesis": {"type": "string"},
+        },
+        "required": ["evidence", "hypothesis"],
+    }
+
+    def __init__(self, event: dict, previous_response: dict = {}, critic_feedback: str = "", chunk_note: str = ""):
         self.event = event
         self.critic_feedback = critic_feedback
+        self.chunk_note = chunk_note  # Set when `event` holds one chunk of a larger event's accounts
+        if chunk_note:
+            self.stage = "evidence_chunk"
         self.return_format = """
         {
             "evidence": ["string"],
@@ -27,6 +43,12 @@ class EvidenceAnalystAgent:
 
         Please revise your analysis to address the critic's feedback above."""
 
+        chunk_section = ""
+        if self.chunk_note:
+            chunk_section = f"""{self.chunk_note}
+
+        """
+
         prompt = f"""
         You are a reconciliation analyst for dividend events, in the evidence-gathering phase. Your task is to thoroughly analyze a coac event and identify all potential discrepancies between NBIM and Custody data sources.
 
@@ -46,26 +68,47 @@ class EvidenceAnalystAgent:
         The return format of your output should be JSON matching this pattern:
         {return_format}
 
-        The coac event you are analyzing is:
-        {event}
+        {chunk_section}The coac event you are analyzing is:
+        {serialize_event(event, self.event_detail)}
         """
         return prompt
 
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create, also used for batch submission."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        feedback_note = " (revision)" if self.critic_feedback else ""
+        print(f"Evidence analysis for event {self.event['coac_event_key']}{feedback_note}: {len(response_dict.get('evidence', []))} evidence points gathered")
+        return response_dict
+
     def run(self)->dict:
         try:
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=3000,
-                messages=[
-                    {"role": "user", "content": self.system_prompt},
-                    {"role": "assistant", "content": "{"}
-                ],
-            )
-            response_text = "{"+response.content[0].text
-            response_dict = json.loads(response_text)
-            feedback_note = " (revision)" if self.critic_feedback else ""
-            print(f"Evidence analysis for event {self.event['coac_event_key']}{feedback_note}: {len(response_dict.get('evidence', []))} evidence points gathered")
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error analyzing evidence for event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+        
+        return response_dict
+
+    async def run_async(self)->dict:
+        """Same as run(), using the async client so many events can be processed concurrently."""
+        try:
+            response_dict = self.handle_output(await request_structured_async(self))
 
         except Exception as e:
             print(f"Error analyzing evidence for event {self.event['coac_event_key']}: {e}")
@@ -0,0 +1,120 @@
+import json
+from structured_output import complete_structured, output_tool, request_structured, request_structured_async
+
+class EvidenceReduceAgent:
+    """Merges the evidence analyses of an event's account chunks (see account_chunking.py)
+    into one event-level analysis, in the EvidenceAnalystAgent output format.
+
+    On critic feedback only this merge is revised; the chunk findings are facts about the
+    accounts and are not gathered again.
+    """
+    model = "claude-sonnet-4-20250514"
+    max_tokens = 3000
+    stage = "evidence_reduce"
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "evidence": {"type": "array", "items": {"type": "string"}},
+            "hypothesis": {"type": "string"},
+        },
+        "required": ["evidence", "hypothesis"],
+    }
+
+    def __init__(self, event: dict, chunk_findings: list, detailed_accounts: int, previous_response: dict = {},
+                 critic_feedback: str = ""):
+        self.event = event
+        self.chunk_findings = chunk_findings
+        self.critic_feedback = critic_feedback
+        self.return_format = """
+        {
+            "evidence": ["string"],
+            "hypothesis": "string"
+        }
+        """
+        self.system_prompt = self._get_system_prompt(self.event, self.chunk_findings, detailed_accounts,
+                                                     previous_response, self.critic_feedback, self.return_format)
+
+    def _get_system_prompt(self, event: dict, chunk_findings: list, detailed_accounts: int, previous_response: dict,
+                           critic_feedback: str, return_format: str):
+        feedback_section = ""
+        if critic_feedback:
+            feedback_section = f"""
+        You have been evaluated by a critic agent. Your previous merged analysis was:
+        {previous_response}
+
+        The critic's feedback to address is:
+        {critic_feedback}
+
+        Please revise your merged analysis to address the critic's feedback above."""
+
+        findings = "\n".join(
+            f"        Part {index + 1}:\n        Evidence: {json.dumps(finding.get('evidence', []), ensure_ascii=False)}\n"
+            f"        Hypothesis: {finding.get('hypothesis', 'No hypothesis provided')}"
+            for index, finding in enumerate(chunk_findings)
+        )
+        accounts = len(event.get("accounts") or {})
+        prompt = f"""
+        You are a reconciliation analyst for dividend events, merging the findings of an evidence analysis done in parts.
+        Coac event {event.get('coac_event_key')} has {accounts} accounts. {detailed_accounts} of them have a mismatch or a missing side; the others match on all comparable fields.
+        The accounts were analyzed in {len(chunk_findings)} parts, grouped by the fields that differ. Merge the findings of all parts into one analysis of the whole event.
+
+        Focus on:
+        1. EVIDENCE: One list of field mismatches for the event. Combine points that describe the same mismatch across parts, and state on how many accounts it occurs and the values involved. Keep points that only occur in one part.
+        2. HYPOTHESIS: One event-level discussion of what might be wrong. Say whether the mismatches point to one systematic cause or to separate, account-specific issues.
+
+        Do not make final conclusions about whether this is a break. Do not add evidence that none of the parts reported.
+
+        Output strictly valid JSON matching the provided schema. Do not restate inputs.
+        {feedback_section}
+
+        The return format of your output should be JSON matching this pattern:
+        {return_format}
+
+        The findings per part:
+{findings}
+        """
+        return prompt
+
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create, also used for batch submission."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        feedback_note = " (revision)" if self.critic_feedback else ""
+        print(f"Merged evidence for event {self.event['coac_event_key']} from {len(self.chunk_findings)} parts{feedback_note}: "
+              f"{len(response_dict.get('evidence', []))} evidence points")
+        return response_dict
+
+    def run(self) -> dict:
+        try:
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error merging evidence for event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        return response_dict
+
+    async def run_async(self) -> dict:
+        """Same as run(), using the async client so many events can be processed concurrently."""
+        try:
+            response_dict = self.handle_output(await request_structured_async(self))
+
+        except Exception as e:
+            print(f"Error merging evidence for event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        return response_dict
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # optional: without pyarrow every run parses the CSVs
+    feather = None
+
+DEFAULT_FACTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".facts_cache")
+# Bump when the normalizers or schemas change, so facts normalized by older code are not reused.
+FACTS_CACHE_VERSION = 1
+
+# ---------------------------
+# Arrow IPC files
+# ---------------------------
+def write_arrow(frame: pd.DataFrame, path: str) -> bool:
+    """Write frame as an uncompressed Feather file (so it can be memory-mapped).
+    False when pyarrow is missing or a column cannot be represented in Arrow (e.g. mixed types)."""
+    if feather is None:
+        return False
+    try:
+        feather.write_feather(frame.reset_index(drop=True), path, compression="uncompressed")
+    except (TypeError, ValueError) as e:
+        print(f"---Could not write {path} as Arrow: {e}---")
+        return False
+    return True
+
+def read_arrow(path: str, memory_map: bool = True) -> pd.DataFrame:
+    """With memory_map, the frame may keep the file mapped; only use it for files that outlive the frame."""
+    return feather.read_table(path, memory_map=memory_map).to_pandas()
+
+# ---------------------------
+# Normalized facts cache
+# ---------------------------
+def source_signature(*paths: str) -> list:
+    """(path, size, mtime) of each source file; a cache entry is valid while these are unchanged."""
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+class FactsCache:
+    """On-disk Feather (Arrow IPC) copy of the normalized facts, one file per event partition.
+
+    An entry is keyed by the size and modification time of both bookings files and the
+    partition count. Files are memory-mapped when read back, so an unchanged day skips CSV
+    parsing and normalization entirely. The manifest is written last: an entry without one
+    (an interrupted run) is never read. Only the newest `max_entries` entries are kept.
+    Needs pyarrow; without it the cache is disabled.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_FACTS_CACHE_DIR, enabled: bool = True, max_entries: int = 3):
+        self.cache_dir = cache_dir
+        self.enabled = enabled and feather is not None
+        self.max_entries = max_entries
+        if enabled and feather is None:
+            print("---pyarrow is not installed, normalized facts are not cached---")
+
+    def _entry_dir(self, signature: list, partitions: int) -> str:
+        payload = json.dumps({"version": FACTS_CACHE_VERSION, "sources": signature, "partitions": partitions})
+        return os.path.join(self.cache_dir, hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16])
+
+    def _partition_path(self, entry_dir: str, partition: int) -> str:
+        return os.path.join(entry_dir, f"partition-{partition:04d}.feather")
+
+    def _manifest(self, custody_path: str, nbim_path: str, partitions: int):
+        """(entry directory, manifest dict) of a valid entry, or None."""
+        if not self.enabled:
+            return None
+        entry_dir = self._entry_dir(source_signature(custody_path, nbim_path), partitions)
+        try:
+            with open(os.path.join(entry_dir, "manifest.json"), encoding="utf-8") as file:
+                return entry_dir, json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def partition_paths(self, custody_path: str, nbim_path: str, partitions: int):
+        """{partition: file} of each non-empty partition's facts, or None when there is no valid entry."""
+        entry = self._manifest(custody_path, nbim_path, partitions)
+        if entry is None:
+            return None
+        entry_dir, manifest = entry
+        print(f"---Normalized facts found in {entry_dir} ({manifest['rows']} rows)---")
+        return {partition: self._partition_path(entry_dir, partition) for partition in manifest["partitions"]}
+
+    def rows(self, custody_path: str, nbim_path: str, partitions: int):
+        """Facts rows of a valid entry, or None."""
+        entry = self._manifest(custody_path, nbim_path, partitions)
+        return entry[1]["rows"] if entry is not None else None
+
+    def load(self, custody_path: str, nbim_path: str, partitions: int):
+        """Generator of each non-empty partition's facts frame, or None when there is no valid entry."""
+        paths = self.partition_paths(custody_path, nbim_path, partitions)
+        if paths is None:
+            return None
+        return (read_arrow(path) for path in paths.values())
+
+    def writer(self, custody_path: str, nbim_path: str, partitions: int):
+        return FactsCacheWriter(self, self._entry_dir(source_signature(custody_path, nbim_path), partitions))
+
+    def _evict(self, keep: str):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if path != keep and os.path.isdir(path):
+                manifest = os.path.join(path, "manifest.json")
+                entries.append((os.path.getmtime(manifest) if os.path.exists(manifest) else 0.0, path))
+        for _, path in sorted(entries, reverse=True)[self.max_entries - 1:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+class FactsCacheWriter:
+    """Writes one cache entry partition by partition; commit() makes it visible."""
+
+    def __init__(self, cache: FactsCache, entry_dir: str):
+        self.cache = cache
+        self.entry_dir = entry_dir
+        self.partitions = []
+        self.rows = 0
+        self.failed = False
+        if cache.enabled:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(entry_dir)
+
+    def path(self, partition: int):
+        """File for one partition's facts, or None when nothing should be written."""
+        if not self.cache.enabled or self.failed:
+            return None
+        return self.cache._partition_path(self.entry_dir, partition)
+
+    def record(self, partition: int, rows: int, written: bool):
+        """Note a partition file written elsewhere (e.g. by a worker process)."""
+        if not written:
+            # A partition that could not be stored: run without the cache.
+            self.failed = True
+            return
+        self.partitions.append(partition)
+        self.rows += rows
+
+    def write(self, partition: int, facts: pd.DataFrame):
+        path = self.path(partition)
+        if path is not None:
+            self.record(partition, len(facts), write_arrow(facts, path))
+
+    def commit(self):
+        if not self.cache.enabled or self.failed:
+            return
+        with open(os.path.join(self.entry_dir, "manifest.json"), "w", encoding="utf-8") as file:
+            json.dump({"version": FACTS_CACHE_VERSION, "partitions": self.partitions, "rows": self.rows}, file)
+        self.cache._evict(keep=self.entry_dir)
@@ -0,0 +1,334 @@
+import contextlib
+import io
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from facts_cache import DEFAULT_FACTS_CACHE_DIR, FactsCache, read_arrow, write_arrow
+from parse_data import EventCollection, combine_facts, normalize_custody, normalize_nbim, parse_facts
+
+# ---------------------------
+# Declared input schemas
+# ---------------------------
+# Only the columns the normalizers read. Identifiers stay text so leading zeros survive and
+# every chunk gets the same dtype whatever values it happens to contain. Amounts, rates and
+# quantities are read as text too: the normalizers coerce them with to_decimal_series, which
+# also takes thousands-separated values such as "1 500 000" that read_csv cannot parse.
+NBIM_SCHEMA = {
+    "COAC_EVENT_KEY": "Int64",
+    "INSTRUMENT_DESCRIPTION": "str",
+    "ISIN": "str",
+    "SEDOL": "str",
+    "TICKER": "str",
+    "ORGANISATION_NAME": "str",
+    "DIVIDENDS_PER_SHARE": "str",
+    "EXDATE": "str",
+    "PAYMENT_DATE": "str",
+    "CUSTODIAN": "str",
+    "BANK_ACCOUNT": "str",
+    "QUOTATION_CURRENCY": "str",
+    "SETTLEMENT_CURRENCY": "str",
+    "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": "str",
+    "NOMINAL_BASIS": "str",
+    "GROSS_AMOUNT_QUOTATION": "str",
+    "NET_AMOUNT_QUOTATION": "str",
+    "NET_AMOUNT_SETTLEMENT": "str",
+    "GROSS_AMOUNT_PORTFOLIO": "str",
+    "NET_AMOUNT_PORTFOLIO": "str",
+    "WTHTAX_COST_QUOTATION": "str",
+    "WTHTAX_COST_PORTFOLIO": "str",
+    "WTHTAX_RATE": "str",
+    "LOCALTAX_COST_QUOTATION": "str",
+    "LOCALTAX_COST_SETTLEMENT": "str",
+    "TOTAL_TAX_RATE": "str",
+    "RESTITUTION_RATE": "str",
+}
+
+CUSTODY_SCHEMA = {
+    "COAC_EVENT_KEY": "Int64",
+    "ISIN": "str",
+    "SEDOL": "str",
+    "CUSTODIAN": "str",
+    "NOMINAL_BASIS": "str",
+    "LOAN_QUANTITY": "str",
+    "HOLDING_QUANTITY": "str",
+    "LENDING_PERCENTAGE": "str",
+    "BANK_ACCOUNTS": "str",
+    "EX_DATE": "str",
+    "PAY_DATE": "str",
+    "CURRENCIES": "str",
+    "DIV_RATE": "str",
+    "TAX_RATE": "str",
+    "GROSS_AMOUNT": "str",
+    "NET_AMOUNT_QC": "str",
+    "TAX": "str",
+    "NET_AMOUNT_SC": "str",
+    "SETTLED_CURRENCY": "str",
+    "IS_CROSS_CURRENCY_REVERSAL": "boolean",
+    "FX_RATE": "str",
+    "POSSIBLE_RESTITUTION_PAYMENT": "str",
+    "POSSIBLE_RESTITUTION_AMOUNT": "str",
+}
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_PARTITIONS = 16
+# Bookings with at most this many rows (both files together) are parsed in one pass in
+# memory. Normalizing and parsing each partition on its own has a fixed cost per partition
+# that only pays off, in bounded memory, on files well beyond this size.
+SINGLE_PASS_MAX_ROWS = 500_000
+
+# ---------------------------
+# Chunked reading
+# ---------------------------
+def read_chunks(path: str, schema: dict, chunksize: int = DEFAULT_CHUNK_SIZE, sep: str = ";"):
+    """
+    Yield raw frames of at most `chunksize` rows from a bookings file.
+
+    Columns are read with the dtypes in `schema`; columns outside it are skipped and schema
+    columns missing from the file are left to the normalizer. The index keeps counting
+    across chunks, so it stays the row's position in the whole file (source_row).
+    """
+    reader = pd.read_csv(path, sep=sep, chunksize=chunksize, usecols=lambda column: column in schema, dtype=schema)
+    with reader:
+        yield from reader
+
+def event_partition(event_keys: pd.Series, partitions: int) -> np.ndarray:
+    """Partition number of each event key. Stable across runs and processes."""
+    hashes = pd.util.hash_array(event_keys.astype(str).to_numpy(dtype=object))
+    return (hashes % np.uint64(partitions)).astype(int)
+
+def _empty_side(source: str) -> pd.DataFrame:
+    if source == "nbim":
+        return normalize_nbim(pd.DataFrame(columns=list(NBIM_SCHEMA)))
+    return normalize_custody(pd.DataFrame(columns=list(CUSTODY_SCHEMA)))
+
+# ---------------------------
+# Per-event partitions
+# ---------------------------
+class PartitionSpill:
+    """
+    Routes raw rows to per-event partition files on disk.
+
+    Every row of an event lands in the same partition, so each partition can be
+    normalized and parsed on its own, in this process or a worker. Frames are appended
+    to the partition file as pickles and read back in the order they were written.
+    """
+
+    def __init__(self, directory: str, partitions: int = DEFAULT_PARTITIONS):
+        self.directory = directory
+        self.partitions = partitions
+        self.rows = [0] * partitions
+
+    def _path(self, source: str, partition: int) -> str:
+        return os.path.join(self.directory, f"{source}-{partition:04d}.pkl")
+
+    def route(self, source: str, frame: pd.DataFrame):
+        frame = frame[frame["COAC_EVENT_KEY"].notna()]
+        for partition, part in frame.groupby(event_partition(frame["COAC_EVENT_KEY"], self.partitions), sort=False):
+            with open(self._path(source, partition), "ab") as file:
+                pickle.dump(part, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.rows[partition] += len(part)
+
+    def load(self, source: str, partition: int) -> list:
+        frames = []
+        path = self._path(source, partition)
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                while True:
+                    try:
+                        frames.append(pickle.load(file))
+                    except EOFError:
+                        break
+        return frames
+
+    def facts(self, partition: int):
+        """Normalized, combined facts of one partition (NBIM rows first, as in parse_data), or None if empty."""
+        return _facts(self.load("nbim", partition), self.load("custody", partition))
+
+def _facts(nbim: list, custody: list):
+    """Normalized, combined facts of raw NBIM and Custody frames, or None if there are none."""
+    if not nbim and not custody:
+        return None
+    # Keep the file index: normalize turns it into source_row.
+    return combine_facts(normalize_nbim(pd.concat(nbim)) if nbim else _empty_side("nbim"),
+                         normalize_custody(pd.concat(custody)) if custody else _empty_side("custody"))
+
+def parse_partition(partition: int, spill: PartitionSpill = None, cached_facts_path: str = None,
+                    facts_cache_path: str = None, tolerances: dict = None):
+    """
+    normalize -> merge -> mismatch for one partition.
+
+    Facts come from `cached_facts_path` when given, otherwise from the spilled raw rows;
+    freshly normalized facts are written to `facts_cache_path` if given.
+
+    Returns:
+        tuple: (EventCollection or None for an empty partition, facts rows, facts written to the cache)
+    """
+    facts = read_arrow(cached_facts_path) if cached_facts_path else spill.facts(partition)
+    if facts is None:
+        return None, 0, False
+    cached = bool(facts_cache_path) and write_arrow(facts, facts_cache_path)
+    return parse_facts(facts, tolerances), len(facts), cached
+
+# ---------------------------
+# Process pool
+# ---------------------------
+COLLECTION_FRAMES = ("accounts", "nbim", "custody", "mismatches")
+
+def _export_collection(collection: EventCollection, prefix: str) -> dict:
+    """
+    A worker's parsed partition as Arrow IPC files ({frame name: path}), so the parent
+    memory-maps the columns instead of unpickling them. Frames Arrow cannot represent are
+    returned as they are.
+    """
+    exported = {}
+    for name in COLLECTION_FRAMES:
+        path = f"{prefix}-{name}.arrow"
+        frame = getattr(collection, name)
+        exported[name] = path if write_arrow(frame, path) else frame
+    return exported
+
+def _as_entries(frame: pd.DataFrame) -> pd.DataFrame:
+    # Python objects with None for missing values, as built by _side_entries.
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None)
+
+def _import_collection(exported: dict) -> EventCollection:
+    frames = {}
+    for name, value in exported.items():
+        if isinstance(value, str):
+            # Read into memory: the workers' result files are deleted with their directory.
+            value = read_arrow(value, memory_map=False)
+            if name in ("nbim", "custody"):
+                value = _as_entries(value)
+        frames[name] = value
+    return EventCollection(*(frames[name] for name in COLLECTION_FRAMES))
+
+def _parse_partition_in_worker(partition: int, spill: PartitionSpill, cached_facts_path: str,
+                               facts_cache_path: str, tolerances: dict, result_dir: str):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        collection, rows, cached = parse_partition(partition, spill, cached_facts_path, facts_cache_path, tolerances)
+        exported = _export_collection(collection, os.path.join(result_dir, f"events-{partition:04d}")) if collection is not None else None
+    return exported, rows, cached, output.getvalue()
+
+def _parse_partitions(tasks: list, spill: PartitionSpill, tolerances: dict, workers: int, result_dir: str):
+    """Yield (partition, EventCollection or None, facts rows, cached) in partition order.
+
+    tasks: (partition, cached facts path or None, facts cache path or None) per partition.
+    """
+    if workers <= 1:
+        for partition, cached_facts_path, facts_cache_path in tasks:
+            yield (partition, *parse_partition(partition, spill, cached_facts_path, facts_cache_path, tolerances))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parse_partition_in_worker, partition, spill, cached_facts_path,
+                                   facts_cache_path, tolerances, result_dir)
+                   for partition, cached_facts_path, facts_cache_path in tasks]
+        for (partition, _, _), future in zip(tasks, futures):
+            exported, rows, cached, output = future.result()
+            # Worker output is printed in partition order rather than interleaved.
+            print(output, end="")
+            yield partition, _import_collection(exported) if exported is not None else None, rows, cached
+
+# ---------------------------
+# Ingestion
+# ---------------------------
+def _parse_single_pass(facts: pd.DataFrame, tolerances: dict, partitions: int, cache_writer=None) -> EventCollection:
+    """parse_facts over all facts at once. The facts cache still gets one file per partition,
+    so the entry can be read back however the next run's bookings are split."""
+    if cache_writer is not None:
+        for partition, part in facts.groupby(event_partition(facts["coac_event_key"], partitions), sort=True):
+            cache_writer.write(int(partition), part)
+    return parse_facts(facts, tolerances)
+
+def ingest_bookings(custody_path: str, nbim_path: str, chunksize: int = DEFAULT_CHUNK_SIZE,
+                    partitions: int = DEFAULT_PARTITIONS, tolerances: dict = None,
+                    facts_cache: FactsCache = None, workers: int = 1,
+                    single_pass_rows: int = SINGLE_PASS_MAX_ROWS) -> EventCollection:
+    """
+    Memory-bounded replacement for reading both files with read_csv and calling parse_data.
+
+    Both files are read `chunksize` rows at a time with the declared schemas. Bookings of
+    at most `single_pass_rows` rows are then normalized, merged and checked for mismatches
+    in one pass, like parse_data. Beyond that, each chunk's rows are routed to their event
+    partition on disk (by hash of coac_event_key) and every partition is parsed on its
+    own, across a pool of `workers` processes when workers > 1 (at most one per CPU). The
+    raw frames, normalized frames and combined facts of such files are never held whole;
+    only the assembled events are.
+
+    Events from partitions come out grouped by partition rather than in file order. The
+    pipeline ranks breaks by priority, so the order does not change its output.
+
+    With a `facts_cache`, the normalized facts of unchanged files are read back from it
+    instead of the CSVs, and freshly normalized facts are written to it.
+    """
+    # More processes than cores only adds process start-up and result transfer.
+    workers = min(workers, os.cpu_count() or 1)
+    cached_paths = facts_cache.partition_paths(custody_path, nbim_path, partitions) if facts_cache is not None else None
+    cache_writer = facts_cache.writer(custody_path, nbim_path, partitions) if facts_cache is not None and cached_paths is None else None
+
+    if cached_paths is not None and facts_cache.rows(custody_path, nbim_path, partitions) <= single_pass_rows:
+        facts = pd.concat([read_arrow(path) for path in cached_paths.values()], ignore_index=True) if cached_paths else None
+        return _parse_single_pass(facts, tolerances, partitions) if facts is not None else _parse_empty(tolerances)
+
+    with tempfile.TemporaryDirectory(prefix="reconciliation-partitions-") as directory:
+        spill = PartitionSpill(directory, partitions)
+        if cached_paths is not None:
+            tasks = [(partition, path, None) for partition, path in cached_paths.items()]
+        else:
+            # Chunks are held in memory until the bookings outgrow single_pass_rows, then
+            # they and every later chunk are spilled to the partitions.
+            held = {"nbim": [], "custody": []}
+            held_rows, spilled = 0, False
+            for source, path, schema in (("nbim", nbim_path, NBIM_SCHEMA), ("custody", custody_path, CUSTODY_SCHEMA)):
+                for chunk in read_chunks(path, schema, chunksize):
+                    if not spilled and held_rows + len(chunk) <= single_pass_rows:
+                        held[source].append(chunk)
+                        held_rows += len(chunk)
+                        continue
+                    if not spilled:
+                        for held_source, frames in held.items():
+                            for frame in frames:
+                                spill.route(held_source, frame)
+                        held, spilled = None, True
+                    spill.route(source, chunk)
+            if not spilled:
+                print(f"---Read {held_rows} rows in chunks of {chunksize}, parsed in one pass---")
+                facts = _facts([frame[frame["COAC_EVENT_KEY"].notna()] for frame in held["nbim"]],
+                               [frame[frame["COAC_EVENT_KEY"].notna()] for frame in held["custody"]])
+                event_data = _parse_single_pass(facts, tolerances, partitions, cache_writer) if facts is not None else None
+                if cache_writer is not None:
+                    cache_writer.commit()
+                return event_data if event_data is not None else _parse_empty(tolerances)
+            print(f"---Read {sum(spill.rows)} rows in chunks of {chunksize} into {partitions} event partitions---")
+            tasks = [(partition, None, cache_writer.path(partition) if cache_writer is not None else None)
+                     for partition in range(partitions) if spill.rows[partition]]
+
+        collections = []
+        for partition, collection, rows, cached in _parse_partitions(tasks, spill, tolerances, workers, directory):
+            if cache_writer is not None and collection is not None:
+                cache_writer.record(partition, rows, cached)
+            if collection is not None:
+                collections.append(collection)
+        event_data = EventCollection.concat(collections) if collections else None
+
+    if cache_writer is not None:
+        cache_writer.commit()
+    return event_data if event_data is not None else _parse_empty(tolerances)
+
+def _parse_empty(tolerances: dict) -> EventCollection:
+    return parse_facts(combine_facts(_empty_side("nbim"), _empty_side("custody")), tolerances)
+
+def load_cached_facts(custody_path: str, nbim_path: str, partitions: int = DEFAULT_PARTITIONS,
+                      cache_dir: str = DEFAULT_FACTS_CACHE_DIR):
+    """All cached facts of the two files as one frame (e.g. for the notebook), or None if not cached."""
+    frames = FactsCache(cache_dir).load(custody_path, nbim_path, partitions)
+    if frames is None:
+        return None
+    return pd.concat(list(frames), ignore_index=True)
@@ -0,0 +1,292 @@
+import asyncio
+import inspect
+import json
+import os
+import statistics
+import time
+
+import anthropic
+
+from response_cache import ResponseCache
+
+# USD per million (input, output) tokens. Batch requests are billed at BATCH_DISCOUNT of these.
+MODEL_PRICING = {
+    "claude-opus-4-1-20250805": (15.0, 75.0),
+    "claude-sonnet-4-20250514": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+}
+BATCH_DISCOUNT = 0.5
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, batch: bool = False):
+    """Estimated USD cost of one call, or None for models missing from MODEL_PRICING."""
+    if model not in MODEL_PRICING:
+        return None
+    input_price, output_price = MODEL_PRICING[model]
+    cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+# ---------------------------
+# Shared LLM gateway
+# ---------------------------
+class LLMGateway:
+    """Single entry point for all agent LLM calls.
+
+    Holds one long-lived sync client and one async client (per event loop), each with an
+    HTTP keep-alive connection pool, so agents reuse connections instead of paying client
+    construction and a TLS handshake on every call. Pass `client` / `async_client` to
+    inject fakes in tests. Responses are served from `cache` (a ResponseCache) when an
+    identical request has been made before. With a `recorder` (llm_transport.TrafficRecorder)
+    every API call is also written to a traffic file that can be replayed offline. With a
+    `scheduler` (llm_scheduler.LLMScheduler) calls wait for their model's rate-limit budget
+    and transient errors are retried there instead of in the SDK.
+
+    Every call is recorded in `call_log` with its model, token usage, wall time, retries
+    and estimated cost, tagged with the calling agent's stage and event key.
+    """
+
+    def __init__(self, api_key: str = None, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0, client=None, async_client=None, cache: ResponseCache = None, recorder=None,
+                 scheduler=None):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.recorder = recorder
+        self.scheduler = scheduler
+        self._client = self._record(client) if client is not None else None
+        self._async_client = self._record(async_client, is_async=True) if async_client is not None else None
+        self._async_client_loop = None
+        self._async_client_injected = async_client is not None
+        self.cache = cache
+        # One record per call: {"model", "stage", "event_key", "input_tokens", "output_tokens",
+        # "latency_seconds", "retries", "cost_usd", "async", "cached", "batch"}
+        self.call_log = []
+
+    def _limits(self):
+        import httpx  # installed with anthropic; only needed when we build the clients ourselves
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _record(self, client, is_async: bool = False):
+        if self.recorder is None:
+            return client
+        return self.recorder.wrap_async(client) if is_async else self.recorder.wrap(client)
+
+    def _api_key(self):
+        return self.api_key or os.getenv("ANTHROPIC_API_KEY")
+
+    def _client_options(self) -> dict:
+        # The scheduler does the retrying, with the rate-limit budget in view.
+        return {"max_retries": 0} if self.scheduler is not None else {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._record(anthropic.Anthropic(
+                api_key=self._api_key(),
+                http_client=anthropic.DefaultHttpxClient(limits=self._limits()),
+                **self._client_options(),
+            ))
+        return self._client
+
+    @property
+    def async_client(self):
+        # An async connection pool is bound to the event loop that created it.
+        loop = asyncio.get_running_loop()
+        if not self._async_client_injected and self._async_client_loop is not loop:
+            self._async_client = self._record(anthropic.AsyncAnthropic(
+                api_key=self._api_key(),
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=self._limits()),
+                **self._client_options(),
+            ), is_async=True)
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _cache_lookup(self, kwargs: dict):
+        if self.cache is None or not self.cache.enabled:
+            return None, None
+        key = ResponseCache.make_key(kwargs)
+        payload = self.cache.get(key)
+        if payload is None:
+            return key, None
+        return key, message_from_payload(payload)
+
+    def _cache_store(self, key: str, response):
+        if key is not None:
+            self.cache.put(key, response.model_dump(mode="json"))
+
+    def _send(self, kwargs: dict):
+        """One messages.create through the sync client. Returns (response, SDK retries)."""
+        raw_api = getattr(self.client.messages, "with_raw_response", None)
+        if raw_api is None:  # injected fake clients
+            return self.client.messages.create(**kwargs), 0
+        raw = raw_api.create(**kwargs)
+        return raw.parse(), raw.retries_taken
+
+    async def _send_async(self, kwargs: dict):
+        raw_api = getattr(self.async_client.messages, "with_raw_response", None)
+        if raw_api is None:
+            return await self.async_client.messages.create(**kwargs), 0
+        raw = await raw_api.create(**kwargs)
+        response = raw.parse()
+        if inspect.isawaitable(response):
+            response = await response
+        return response, raw.retries_taken
+
+    def create_message(self, tags: dict = None, **kwargs):
+        """client.messages.create through the shared client and cache, with the call recorded.
+
+        Args:
+            tags: {"stage", "event_key"} of the calling agent, used to roll up usage
+            **kwargs: Arguments for messages.create
+        """
+        start = time.perf_counter()
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            self.record_call(kwargs.get("model"), tags, time.perf_counter() - start, is_async=False, cached=True)
+            return cached
+        response, retries = None, 0
+        try:
+            if self.scheduler is None:
+                response, retries = self._send(kwargs)
+            else:
+                response, retries = self.scheduler.call(kwargs, tags, self._send)
+        finally:
+            self.record_call(kwargs.get("model"), tags, time.perf_counter() - start, is_async=False,
+                             usage=getattr(response, "usage", None), retries=retries)
+        self._cache_store(key, response)
+        return response
+
+    async def create_message_async(self, tags: dict = None, **kwargs):
+        start = time.perf_counter()
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            self.record_call(kwargs.get("model"), tags, time.perf_counter() - start, is_async=True, cached=True)
+            return cached
+        response, retries = None, 0
+        try:
+            if self.scheduler is None:
+                response, retries = await self._send_async(kwargs)
+            else:
+                response, retries = await self.scheduler.call_async(kwargs, tags, self._send_async)
+        finally:
+            self.record_call(kwargs.get("model"), tags, time.perf_counter() - start, is_async=True,
+                             usage=getattr(response, "usage", None), retries=retries)
+        self._cache_store(key, response)
+        return response
+
+    def record_call(self, model: str, tags: dict, latency_seconds: float, is_async: bool = False, cached: bool = False,
+                    usage=None, retries: int = 0, batch: bool = False):
+        """Add one call to `call_log`. Cache hits are recorded with zero billed tokens.
+        `latency_seconds` is None for batch requests, which have no per-request wall time."""
+        tags = tags or {}
+        input_tokens = output_tokens = 0
+        if usage is not None and not cached:
+            input_tokens, output_tokens = usage.input_tokens or 0, usage.output_tokens or 0
+        self.call_log.append({
+            "model": model,
+            "stage": tags.get("stage"),
+            "event_key": tags.get("event_key"),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "latency_seconds": latency_seconds,
+            "retries": retries,
+            "cost_usd": 0.0 if cached else estimate_cost(model, input_tokens, output_tokens, batch=batch),
+            "async": is_async,
+            "cached": cached,
+            "batch": batch,
+        })
+
+    def latency_summary(self) -> dict:
+        """Per-call latency statistics for API calls (cache hits excluded).
+        The first call includes connection setup, later ones reuse it."""
+        latencies = [record["latency_seconds"] for record in self.call_log
+                     if not record["cached"] and record["latency_seconds"] is not None]
+        cached_calls = sum(1 for record in self.call_log if record["cached"])
+        if not latencies:
+            return {"calls": 0, "cached_calls": cached_calls}
+        return {
+            "calls": len(latencies),
+            "cached_calls": cached_calls,
+            "first_call_seconds": latencies[0],
+            "mean_seconds": statistics.fmean(latencies),
+            "median_seconds": statistics.median(latencies),
+            "max_seconds": max(latencies),
+        }
+
+    def usage_summary(self) -> dict:
+        """Machine-readable run summary: call_log totals overall, per stage, per event and per model."""
+        return {
+            "totals": _rollup(self.call_log),
+            "by_stage": _group_rollup(self.call_log, "stage"),
+            "by_event": _group_rollup(self.call_log, "event_key"),
+            "by_model": _group_rollup(self.call_log, "model"),
+            "latency": self.latency_summary(),
+        }
+
+def _rollup(records: list) -> dict:
+    return {
+        "calls": len(records),
+        "cached_calls": sum(1 for record in records if record["cached"]),
+        "input_tokens": sum(record["input_tokens"] for record in records),
+        "output_tokens": sum(record["output_tokens"] for record in records),
+        "cost_usd": round(sum(record["cost_usd"] or 0.0 for record in records), 6),
+        "unpriced_calls": sum(1 for record in records if record["cost_usd"] is None),
+        "llm_seconds": round(sum(record["latency_seconds"] or 0.0 for record in records), 3),
+        "retries": sum(record["retries"] for record in records),
+    }
+
+def _group_rollup(records: list, field: str) -> dict:
+    groups = {}
+    for record in records:
+        groups.setdefault(str(record[field]), []).append(record)
+    return {name: _rollup(group) for name, group in groups.items()}
+
+def message_from_payload(payload: dict):
+    """Rebuild an anthropic Message from its cached JSON payload."""
+    return anthropic.types.Message.model_validate(payload)
+
+_gateway = None
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway, created on first use."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(cache=ResponseCache(enabled=os.getenv("LLM_CACHE_BYPASS") != "1"))
+    return _gateway
+
+def set_gateway(gateway: LLMGateway):
+    """Replace the process-wide gateway, e.g. with one wrapping a fake client in tests."""
+    global _gateway
+    _gateway = gateway
+
+def print_latency_summary(gateway: LLMGateway = None):
+    gateway = gateway or get_gateway()
+    summary = gateway.latency_summary()
+    if summary["calls"]:
+        print(f"---LLM calls: {summary['calls']}, first {summary['first_call_seconds']:.2f}s, "
+              f"median {summary['median_seconds']:.2f}s, mean {summary['mean_seconds']:.2f}s, "
+              f"max {summary['max_seconds']:.2f}s---")
+    if gateway.cache is not None and gateway.cache.enabled:
+        cache_stats = gateway.cache.stats()
+        print(f"---Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['evictions']} evicted---")
+
+def print_usage_summary(gateway: LLMGateway = None):
+    summary = (gateway or get_gateway()).usage_summary()
+    for stage, stage_totals in summary["by_stage"].items():
+        print(f"---{stage}: {stage_totals['calls']} calls ({stage_totals['cached_calls']} cached), "
+              f"{stage_totals['input_tokens']} in / {stage_totals['output_tokens']} out tokens, "
+              f"${stage_totals['cost_usd']:.4f}, {stage_totals['llm_seconds']:.1f}s---")
+    totals = summary["totals"]
+    print(f"---Total: {totals['calls']} calls, {totals['input_tokens']} in / {totals['output_tokens']} out tokens, "
+          f"${totals['cost_usd']:.4f} estimated, {totals['retries']} retries---")
+
+def write_run_summary(path: str, gateway: LLMGateway = None, extra: dict = None):
+    """Write the gateway's usage summary and full call log as JSON, plus any `extra` sections."""
+    gateway = gateway or get_gateway()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**gateway.usage_summary(), **(extra or {}), "calls": gateway.call_log}, f, indent=2, default=str)
@@ -0,0 +1,304 @@
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+
+import anthropic
+
+from prompt_format import estimate_tokens
+
+# Requests, input tokens and output tokens per minute for each model: the lowest usage tier
+# (tier 1). Higher tiers allow many times more, so set these to the organization's limits
+# (console: Settings > Limits) or pass them to LLMScheduler; the critic's Opus limits are the
+# scarce ones.
+MODEL_RATE_LIMITS = {
+    "claude-opus-4-1-20250805": (50, 30_000, 8_000),
+    "claude-sonnet-4-20250514": (1_000, 450_000, 90_000),
+    "claude-3-5-haiku-20241022": (1_000, 450_000, 90_000),
+}
+# Used for models missing from the limits table.
+DEFAULT_RATE_LIMITS = (50, 30_000, 8_000)
+# Backoff between attempts of one call: full jitter over min(MAX, INITIAL * 2**retry) seconds.
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+def is_retryable(error: Exception) -> bool:
+    """429s, timeouts, connection errors and 5xx/overloaded responses are worth another attempt."""
+    if isinstance(error, (anthropic.RateLimitError, anthropic.APIConnectionError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code >= 500
+
+def _retry_after_seconds(error: Exception):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def request_input_tokens(messages: list, tools: list = None) -> int:
+    """Estimated input tokens of a request (messages and tool schemas), reserved before it is sent."""
+    tokens = sum(estimate_tokens(message["content"] if isinstance(message["content"], str)
+                                 else json.dumps(message["content"], default=str)) for message in messages)
+    return tokens + (estimate_tokens(json.dumps(tools)) if tools else 0)
+
+# ---------------------------
+# Token buckets
+# ---------------------------
+class TokenBucket:
+    """`per_minute` units that refill continuously. Reservations are corrected with adjust()
+    once the real usage is known, so the level can go negative when a call used more than
+    was reserved."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_seconds(self, amount: float, now: float) -> float:
+        """Time until `amount` is available. A request larger than the bucket waits for a full bucket."""
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def adjust(self, amount: float, now: float):
+        """Give back (positive) or charge (negative) `amount`."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+class _Ticket:
+    """A call waiting for its model's budget. Larger priority first, then arrival order."""
+
+    def __init__(self, priority: float, order: int, input_tokens: int, output_tokens: int, wake):
+        self.priority = priority
+        self.order = order
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.wake = wake
+
+    def __lt__(self, other):
+        return (-self.priority, self.order) < (-other.priority, other.order)
+
+class _ModelLane:
+    def __init__(self, limits: tuple):
+        requests, input_tokens, output_tokens = limits
+        self.requests = TokenBucket(requests)
+        self.input_tokens = TokenBucket(input_tokens)
+        self.output_tokens = TokenBucket(output_tokens)
+        self.queue = []  # heap of _Ticket
+        self.paused_until = 0.0
+        self.stats = {"calls": 0, "queued_seconds": 0.0, "max_queued_seconds": 0.0, "rate_limited": 0,
+                      "retries": 0, "failed": 0}
+
+    def wait_seconds(self, ticket: _Ticket, now: float) -> float:
+        return max(self.paused_until - now, self.requests.wait_seconds(1, now),
+                   self.input_tokens.wait_seconds(ticket.input_tokens, now),
+                   self.output_tokens.wait_seconds(ticket.output_tokens, now))
+
+    def take(self, ticket: _Ticket, now: float):
+        self.requests.take(1, now)
+        self.input_tokens.take(ticket.input_tokens, now)
+        self.output_tokens.take(ticket.output_tokens, now)
+
+    def wake_head(self):
+        if self.queue:
+            self.queue[0].wake()
+
+# ---------------------------
+# Scheduler
+# ---------------------------
+class LLMScheduler:
+    """Admits every API call of the gateway against per-model rate limits.
+
+    Each model has token buckets for requests, input tokens and output tokens per minute
+    (MODEL_RATE_LIMITS, or `limits`). A call reserves one request, its estimated input
+    tokens and its max_tokens; the reservation is corrected from the response's usage.
+    Calls that do not fit yet wait in a per-model priority queue ordered by their event's
+    mismatch amount (set_priorities), so the largest breaks get the scarce Opus budget
+    first. Calls without a known event come last.
+
+    Rate limits, timeouts, connection errors and 5xx responses are retried up to
+    `max_retries` times with jittered exponential backoff. A 429 also pauses the model's
+    queue for the retry-after time, so the other queued calls do not run into it too.
+    The SDK's own retries should be off (max_retries=0 on the client, as LLMGateway does
+    when it has a scheduler).
+    """
+
+    def __init__(self, limits: dict = None, max_retries: int = 8, seed: int = None):
+        self.limits = {**MODEL_RATE_LIMITS, **(limits or {})}
+        self.max_retries = max_retries
+        self.priorities = {}
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._rng = random.Random(seed)
+
+    def set_priorities(self, amounts):
+        """{event key: mismatch amount} (a dict or a Series, e.g. materiality["portfolio_delta"])."""
+        self.priorities = {str(key): float(amount) for key, amount in dict(amounts).items()}
+
+    def priority(self, tags: dict) -> float:
+        return self.priorities.get(str((tags or {}).get("event_key")), float("-inf"))
+
+    def _lane(self, model: str) -> _ModelLane:
+        with self._lock:
+            if model not in self._lanes:
+                self._lanes[model] = _ModelLane(self.limits.get(model, DEFAULT_RATE_LIMITS))
+            return self._lanes[model]
+
+    def _ticket(self, kwargs: dict, tags: dict, wake) -> _Ticket:
+        input_tokens = request_input_tokens(kwargs.get("messages") or [], kwargs.get("tools"))
+        return _Ticket(self.priority(tags), next(self._order), input_tokens, kwargs.get("max_tokens") or 0, wake)
+
+    def _enqueue(self, lane: _ModelLane, ticket: _Ticket):
+        with self._lock:
+            heapq.heappush(lane.queue, ticket)
+
+    def _try_admit(self, lane: _ModelLane, ticket: _Ticket):
+        """(admitted, seconds to wait before trying again; None = until woken)."""
+        with self._lock:
+            if lane.queue[0] is not ticket:
+                return False, None
+            now = time.monotonic()
+            wait = lane.wait_seconds(ticket, now)
+            if wait > 0:
+                return False, wait
+            lane.take(ticket, now)
+            heapq.heappop(lane.queue)
+            lane.wake_head()
+            return True, 0.0
+
+    def _withdraw(self, lane: _ModelLane, ticket: _Ticket):
+        with self._lock:
+            if ticket in lane.queue:
+                lane.queue.remove(ticket)
+                heapq.heapify(lane.queue)
+                lane.wake_head()
+
+    def _admitted(self, lane: _ModelLane, queued_seconds: float):
+        with self._lock:
+            lane.stats["calls"] += 1
+            lane.stats["queued_seconds"] += queued_seconds
+            lane.stats["max_queued_seconds"] = max(lane.stats["max_queued_seconds"], queued_seconds)
+
+    def _settle(self, lane: _ModelLane, ticket: _Ticket, usage=None):
+        """Correct the reservation from the real usage (a failed call used nothing but its request)."""
+        input_tokens = output_tokens = 0
+        if usage is not None:
+            input_tokens, output_tokens = usage.input_tokens or 0, usage.output_tokens or 0
+        with self._lock:
+            now = time.monotonic()
+            lane.input_tokens.adjust(ticket.input_tokens - input_tokens, now)
+            lane.output_tokens.adjust(ticket.output_tokens - output_tokens, now)
+            lane.wake_head()
+
+    def _backoff(self, lane: _ModelLane, error: Exception, retry: int) -> float:
+        """Seconds before the next attempt; a 429 pauses the whole model queue as well."""
+        with self._lock:
+            delay = self._rng.uniform(0, min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2 ** retry))
+            retry_after = _retry_after_seconds(error)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            lane.stats["retries"] += 1
+            if isinstance(error, anthropic.RateLimitError):
+                lane.stats["rate_limited"] += 1
+                lane.paused_until = max(lane.paused_until, time.monotonic() + delay)
+            return delay
+
+    def _failed(self, lane: _ModelLane):
+        with self._lock:
+            lane.stats["failed"] += 1
+
+    def call(self, kwargs: dict, tags: dict, send):
+        """Run send(kwargs) -> (response, sdk retries) once admitted, retrying transient errors.
+        Returns (response, retries)."""
+        lane = self._lane(kwargs.get("model"))
+        retries = 0
+        while True:
+            woken = threading.Event()
+            ticket = self._ticket(kwargs, tags, woken.set)
+            start = time.monotonic()
+            self._enqueue(lane, ticket)
+            try:
+                while True:
+                    woken.clear()
+                    admitted, wait = self._try_admit(lane, ticket)
+                    if admitted:
+                        break
+                    woken.wait(wait)
+            except BaseException:
+                self._withdraw(lane, ticket)
+                raise
+            self._admitted(lane, time.monotonic() - start)
+            try:
+                response, sdk_retries = send(kwargs)
+            except Exception as e:
+                self._settle(lane, ticket)
+                if not is_retryable(e) or retries >= self.max_retries:
+                    self._failed(lane)
+                    raise
+                time.sleep(self._backoff(lane, e, retries))
+                retries += 1
+                continue
+            self._settle(lane, ticket, getattr(response, "usage", None))
+            return response, retries + sdk_retries
+
+    async def call_async(self, kwargs: dict, tags: dict, send):
+        """call() for an async send(kwargs)."""
+        lane = self._lane(kwargs.get("model"))
+        loop = asyncio.get_running_loop()
+        retries = 0
+        while True:
+            woken = asyncio.Event()
+            ticket = self._ticket(kwargs, tags, lambda: loop.call_soon_threadsafe(woken.set))
+            start = time.monotonic()
+            self._enqueue(lane, ticket)
+            try:
+                while True:
+                    woken.clear()
+                    admitted, wait = self._try_admit(lane, ticket)
+                    if admitted:
+                        break
+                    try:
+                        await asyncio.wait_for(woken.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._withdraw(lane, ticket)
+                raise
+            self._admitted(lane, time.monotonic() - start)
+            try:
+                response, sdk_retries = await send(kwargs)
+            except Exception as e:
+                self._settle(lane, ticket)
+                if not is_retryable(e) or retries >= self.max_retries:
+                    self._failed(lane)
+                    raise
+                await asyncio.sleep(self._backoff(lane, e, retries))
+                retries += 1
+                continue
+            self._settle(lane, ticket, getattr(response, "usage", None))
+            return response, retries + sdk_retries
+
+    def summary(self) -> dict:
+        """{model: {"calls", "queued_seconds", "max_queued_seconds", "rate_limited", "retries", "failed"}}"""
+        with self._lock:
+            return {model: {**lane.stats, "queued_seconds": round(lane.stats["queued_seconds"], 3),
+                            "max_queued_seconds": round(lane.stats["max_queued_seconds"], 3)}
+                    for model, lane in self._lanes.items()}
+
+def print_scheduler_stats(scheduler: LLMScheduler):
+    for model, stats in scheduler.summary().items():
+        print(f"---{model}: {stats['calls']} calls admitted, {stats['queued_seconds']:.1f}s queued "
+              f"(max {stats['max_queued_seconds']:.1f}s), {stats['rate_limited']} rate limited, "
+              f"{stats['retries']} retries, {stats['failed']} failed---")
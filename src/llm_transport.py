@@ -0,0 +1,332 @@
+import asyncio
+import inspect
+import json
+import random
+import threading
+import time
+
+import anthropic
+
+from llm_gateway import message_from_payload
+from response_cache import ResponseCache
+from simulated_llm import SimulatedLLM, prompt_stage
+
+# Retry behaviour of the anthropic SDK (max_retries=2, exponential backoff between 0.5s and 8s
+# with up to 25% jitter), which replayed rate limits and timeouts go through as well.
+MAX_RETRIES = 2
+INITIAL_RETRY_DELAY_SECONDS = 0.5
+MAX_RETRY_DELAY_SECONDS = 8.0
+# How long an injected 429 takes to come back.
+RATE_LIMIT_RESPONSE_SECONDS = 0.2
+
+def _prompt_text(messages: list) -> str:
+    content = messages[0]["content"]
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+class _RawReply:
+    """The parts of an SDK raw response that LLMGateway reads."""
+
+    def __init__(self, response, retries_taken: int):
+        self._response = response
+        self.retries_taken = retries_taken
+
+    def parse(self):
+        return self._response
+
+class _WithRawResponse:
+    def __init__(self, create):
+        self.create = create
+
+# ---------------------------
+# Recording
+# ---------------------------
+class TrafficRecorder:
+    """Appends every API exchange made through the wrapped clients to a JSONL file.
+
+    One line per call: the request key (as in ResponseCache), agent stage, request
+    arguments, response, token usage, wall time, SDK retries and when the call started
+    relative to the start of the recording. Failed calls are written with the error type
+    and no response. Pass it as LLMGateway(recorder=...); cache hits never reach the
+    clients and are not recorded.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.records = 0
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def wrap(self, client):
+        return _RecordingClient(client, _RecordingMessages(client.messages, self))
+
+    def wrap_async(self, client):
+        return _RecordingClient(client, _RecordingAsyncMessages(client.messages, self))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def record(self, request: dict, response, started_seconds: float, latency_seconds: float, retries: int,
+               error: BaseException = None):
+        usage = getattr(response, "usage", None)
+        line = json.dumps({
+            "key": ResponseCache.make_key(request),
+            "stage": prompt_stage(_prompt_text(request["messages"])),
+            "request": request,
+            "response": response.model_dump(mode="json") if response is not None else None,
+            "input_tokens": usage.input_tokens if usage is not None else None,
+            "output_tokens": usage.output_tokens if usage is not None else None,
+            "started_seconds": round(started_seconds, 6),
+            "latency_seconds": round(latency_seconds, 6),
+            "retries": retries,
+            "error": type(error).__name__ if error is not None else None,
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records += 1
+
+    def close(self):
+        self._file.close()
+
+class _RecordingClient:
+    """The wrapped client with messages.create recorded; everything else (batches,
+    count_tokens, ...) goes straight to the client."""
+
+    def __init__(self, client, messages):
+        self._client = client
+        self.messages = messages
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+class _RecordingMessages:
+    def __init__(self, messages, recorder: TrafficRecorder):
+        self._messages = messages
+        self._recorder = recorder
+        self.with_raw_response = _WithRawResponse(self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        started, start = self._recorder.elapsed(), time.perf_counter()
+        response, retries, error = None, 0, None
+        try:
+            raw_api = getattr(self._messages, "with_raw_response", None)
+            if raw_api is None:
+                response = self._messages.create(**kwargs)
+            else:
+                raw = raw_api.create(**kwargs)
+                response, retries = raw.parse(), raw.retries_taken
+            return _RawReply(response, retries)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._recorder.record(kwargs, response, started, time.perf_counter() - start, retries, error)
+
+    def create(self, **kwargs):
+        return self._create_raw(**kwargs).parse()
+
+    def __getattr__(self, name):
+        return getattr(self._messages, name)
+
+class _RecordingAsyncMessages:
+    def __init__(self, messages, recorder: TrafficRecorder):
+        self._messages = messages
+        self._recorder = recorder
+        self.with_raw_response = _WithRawResponse(self._create_raw)
+
+    async def _create_raw(self, **kwargs):
+        started, start = self._recorder.elapsed(), time.perf_counter()
+        response, retries, error = None, 0, None
+        try:
+            raw_api = getattr(self._messages, "with_raw_response", None)
+            if raw_api is None:
+                response = await self._messages.create(**kwargs)
+            else:
+                raw = await raw_api.create(**kwargs)
+                response, retries = raw.parse(), raw.retries_taken
+                if inspect.isawaitable(response):
+                    response = await response
+            return _RawReply(response, retries)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._recorder.record(kwargs, response, started, time.perf_counter() - start, retries, error)
+
+    async def create(self, **kwargs):
+        return (await self._create_raw(**kwargs)).parse()
+
+    def __getattr__(self, name):
+        return getattr(self._messages, name)
+
+# ---------------------------
+# Replay
+# ---------------------------
+class TrafficRecording:
+    """The successful exchanges of a TrafficRecorder file, indexed by request key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exchanges = {}  # key -> [record], in recorded order
+        self.stage_latencies = {}  # stage -> [seconds]
+        self.failed_calls = 0
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["error"] is not None or record["response"] is None:
+                    self.failed_calls += 1
+                    continue
+                self.exchanges.setdefault(record["key"], []).append(record)
+                self.stage_latencies.setdefault(record["stage"], []).append(record["latency_seconds"])
+
+    def __len__(self):
+        return sum(len(records) for records in self.exchanges.values())
+
+def _injected_error(kind: str):
+    import httpx  # installed with anthropic; only needed to build the SDK's error types
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    if kind == "timeout":
+        return anthropic.APITimeoutError(request=request)
+    response = httpx.Response(429, request=request, json={"type": "error", "error": {"type": "rate_limit_error"}})
+    return anthropic.RateLimitError("Injected rate limit (replay)", response=response, body=None)
+
+class ReplayLLM:
+    """Answers agent requests from a TrafficRecording, with the recorded wall time.
+
+    A request is matched on its key; when the same request was recorded more than once the
+    recordings are served in turn, so a critic that approved only on the second look does
+    so again. Delays are the recorded latency times `latency_scale` (1.0 = original timing,
+    0 = no waiting). Requests that were not recorded (e.g. consequence chunks grouped
+    differently because events finished in another order) are answered by `fallback`, a
+    SimulatedLLM, with a latency drawn from the recorded calls of the same stage; with
+    fallback=None they raise LookupError.
+
+    Each attempt fails with a 429 with probability `rate_limit_rate` and times out after
+    `timeout_seconds` with probability `timeout_rate`. Failed attempts are retried with the
+    SDK's backoff up to `max_retries` times, and the retries are reported to the gateway.
+    """
+
+    def __init__(self, recording: TrafficRecording, latency_scale: float = 1.0, rate_limit_rate: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_seconds: float = 60.0, max_retries: int = MAX_RETRIES,
+                 fallback: SimulatedLLM = None, seed: int = 0):
+        self.recording = recording
+        self.latency_scale = latency_scale
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.fallback = fallback
+        self._rng = random.Random(seed)
+        self._served = {}  # key -> recordings served so far
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "replayed": 0, "not_recorded": 0, "rate_limited": 0, "timed_out": 0, "failed": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _recorded(self, kwargs: dict):
+        """(Message, latency) from the recording, or None."""
+        key = ResponseCache.make_key(kwargs)
+        records = self.recording.exchanges.get(key)
+        if not records:
+            return None
+        with self._lock:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        record = records[served % len(records)]
+        return message_from_payload(record["response"]), record["latency_seconds"]
+
+    def _not_recorded(self, kwargs: dict):
+        stage = prompt_stage(_prompt_text(kwargs["messages"]))
+        if self.fallback is None:
+            raise LookupError(f"No recorded response for this {stage} request in {self.recording.path}")
+        response, delay = self.fallback.respond(**kwargs)
+        latencies = self.recording.stage_latencies.get(stage)
+        if latencies:
+            with self._lock:
+                delay = self._rng.choice(latencies)
+        return response, delay
+
+    def _fault(self):
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.rate_limit_rate:
+            return "rate_limit"
+        if draw < self.rate_limit_rate + self.timeout_rate:
+            return "timeout"
+        return None
+
+    def _backoff(self, retry: int) -> float:
+        with self._lock:
+            jitter = 1 - 0.25 * self._rng.random()
+        return min(INITIAL_RETRY_DELAY_SECONDS * 2 ** retry, MAX_RETRY_DELAY_SECONDS) * jitter
+
+    def plan(self, kwargs: dict):
+        """(Message or error to raise, total seconds to wait first, retries taken) for one call."""
+        self._count("calls")
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            fault = self._fault()
+            if fault is None:
+                replayed = self._recorded(kwargs)
+                self._count("replayed" if replayed is not None else "not_recorded")
+                response, latency = replayed if replayed is not None else self._not_recorded(kwargs)
+                return response, (waited + latency) * self.latency_scale, attempt
+            self._count("rate_limited" if fault == "rate_limit" else "timed_out")
+            waited += RATE_LIMIT_RESPONSE_SECONDS if fault == "rate_limit" else self.timeout_seconds
+            if attempt < self.max_retries:
+                waited += self._backoff(attempt)
+        self._count("failed")
+        return _injected_error(fault), waited * self.latency_scale, self.max_retries
+
+class _ReplayMessages:
+    def __init__(self, llm: ReplayLLM):
+        self.llm = llm
+        self.with_raw_response = _WithRawResponse(self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        outcome, delay, retries = self.llm.plan(kwargs)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _RawReply(outcome, retries)
+
+    def create(self, **kwargs):
+        return self._create_raw(**kwargs).parse()
+
+class _ReplayAsyncMessages:
+    def __init__(self, llm: ReplayLLM):
+        self.llm = llm
+        self.with_raw_response = _WithRawResponse(self._create_raw)
+
+    async def _create_raw(self, **kwargs):
+        outcome, delay, retries = self.llm.plan(kwargs)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _RawReply(outcome, retries)
+
+    async def create(self, **kwargs):
+        return (await self._create_raw(**kwargs)).parse()
+
+class ReplayAnthropic:
+    """Stands in for anthropic.Anthropic in LLMGateway(client=...)."""
+
+    def __init__(self, llm: ReplayLLM):
+        self.messages = _ReplayMessages(llm)
+
+class ReplayAsyncAnthropic:
+    """Stands in for anthropic.AsyncAnthropic in LLMGateway(async_client=...)."""
+
+    def __init__(self, llm: ReplayLLM):
+        self.messages = _ReplayAsyncMessages(llm)
+
+def print_replay_stats(llm: ReplayLLM):
+    stats = llm.stats
+    print(f"---Replayed {stats['replayed']} of {stats['calls']} calls from {llm.recording.path} "
+          f"({stats['not_recorded']} not recorded), injected {stats['rate_limited']} rate limits and "
+          f"{stats['timed_out']} timeouts, {stats['failed']} calls failed after retries---")
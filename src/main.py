@@ -1,130 +1,681 @@
 import pandas as pd
 from evidence_analyst_agent import EvidenceAnalystAgent
 from conclusion_agent import ConclusionAgent
-from prioritization_agent import PrioritizationAgent
+from consequence_agent import (CONSEQUENCE_CHUNK_SIZE, STREAM_CONSEQUENCE_BATCH, STREAM_CONSEQUENCE_WAIT_SECONDS,
+                               ConsequenceAgent)
+from materiality import apply_materiality, compute_materiality, order_by_materiality, rank_breaks
+from break_stream import JsonlBreakSink, PriorityView, print_view_update
 from critic_agent import CriticAgent
+from evidence_reduce_agent import EvidenceReduceAgent
+from account_chunking import DEFAULT_ACCOUNTS_PER_CHUNK, AccountChunking, print_chunking_stats
+from mismatch_clustering import SignatureClustering, print_clustering_report
+from triage_agent import TriageAgent
+from tiered_routing import DEFAULT_CONFIDENCE_THRESHOLD, TieredRouter, print_tiered_report
 from parse_data import parse_data
+from ingest import DEFAULT_CHUNK_SIZE, SINGLE_PASS_MAX_ROWS, ingest_bookings
+from facts_cache import FactsCache
+from pre_classifier import pre_classify_events, print_routing_stats
+from llm_gateway import LLMGateway, get_gateway, print_latency_summary, print_usage_summary, set_gateway, write_run_summary
+from llm_scheduler import LLMScheduler, print_scheduler_stats
+from llm_transport import (MAX_RETRIES, ReplayAnthropic, ReplayAsyncAnthropic, ReplayLLM, TrafficRecorder,
+                           TrafficRecording, print_replay_stats)
+from simulated_llm import SimulatedLLM
+from response_cache import ResponseCache
+from batch_runner import AnthropicBatchBackend, LocalBatchBackend, run_agents_in_batch
+from checkpoint_store import DEFAULT_CHECKPOINT_PATH, CheckpointStore
+from critic_budget import CriticLoopBudget, evidence_signature, feedback_repeats, print_critic_loop_report
+import argparse
+import asyncio
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
-def run_evidence_analysis_with_critic(event: dict, event_key: str, max_iterations: int = 5):
+_CHUNKS_FAILED = {"status": "failed", "error": "evidence analysis failed for every account chunk"}
+
+def _evidence_failed(evidence_analysis: dict, event_key: str) -> bool:
+    if evidence_analysis.get("status") == "failed":
+        print(f"Failed to analyze evidence for event key: {event_key}")
+        print(f"Response: {evidence_analysis}")
+        return True
+    return False
+
+def _critic_verdict(critic_response: dict, iteration: int, event_key: str, previous_feedback: str = ""):
+    """Interpret a critic response.
+
+    Returns:
+        tuple: (stop reason, or None to keep iterating; feedback for the next analyst round)
+    """
+    if critic_response.get("status") == "failed":
+        print(f"Failed to evaluate evidence for event key: {event_key}")
+        print(f"Response: {critic_response}")
+        return "failed", ""  # Break out of iteration loop on failure
+
+    if critic_response.get("approved", False):
+        print(f"Evidence analysis approved by critic agent after {iteration + 1} iterations")
+        return "approved", ""  # Break out of iteration loop on approval
+
+    # Get feedback for next iteration
+    critic_feedback = critic_response.get("feedback_string_to_evidence_analyst_agent", "")
+    if feedback_repeats(previous_feedback, critic_feedback):
+        print(f"Critic repeated its feedback for event {event_key}, proceeding with current analysis")
+        return "feedback_repeated", critic_feedback
+    if critic_feedback:
+        print(f"Critic feedback received ({len(critic_feedback)} chars), iterating...")
+    else:
+        print("No critic feedback, but not approved - continuing...")
+    return None, critic_feedback
+
+def _evidence_unchanged(previous_analysis: dict, evidence_analysis: dict, event_key: str) -> bool:
+    if previous_analysis is None or evidence_signature(previous_analysis) != evidence_signature(evidence_analysis):
+        return False
+    print(f"Evidence unchanged after revision for event {event_key}, skipping further critic rounds")
+    return True
+
+def _start_round(budget: CriticLoopBudget, rounds: int, event_key: str) -> bool:
+    # The first round always runs; revisions draw on the run-wide budget.
+    if not rounds:
+        return True
+    if not budget.run_budget_left():
+        print(f"Run-wide critic loop budget used up, proceeding with current analysis for event {event_key}")
+        return False
+    budget.start_revision()
+    return True
+
+def _review_event(event: dict, chunking: AccountChunking = None) -> dict:
+    """The event as the critic, conclusion and triage see it (see AccountChunking.review_event)."""
+    return chunking.review_event(event) if chunking is not None else event
+
+def _evidence_agent(event: dict, evidence_analysis: dict, critic_feedback: str, chunking: AccountChunking = None,
+                    chunks: list = (), findings: list = None):
+    """The analyst step of a round: EvidenceAnalystAgent on the event (or its only chunk), or for an
+    event split into several chunks EvidenceReduceAgent over their findings. None if every chunk
+    analysis failed."""
+    if len(chunks) == 1:
+        chunk, note = chunks[0]
+        return EvidenceAnalystAgent(chunk, previous_response=evidence_analysis, critic_feedback=critic_feedback,
+                                    chunk_note=note)
+    if not chunks:
+        return EvidenceAnalystAgent(event, previous_response=evidence_analysis, critic_feedback=critic_feedback)
+    if not findings:
+        return None
+    return EvidenceReduceAgent(event, findings, len(chunking.review_event(event)["accounts"]),
+                               previous_response=evidence_analysis, critic_feedback=critic_feedback)
+
+def _critic_agent(event: dict, evidence_analysis: dict, chunking: AccountChunking = None) -> CriticAgent:
+    if chunking is not None and chunking.applies_to(event):
+        return CriticAgent(chunking.review_event(event), evidence_analysis, event_detail="mismatched")
+    return CriticAgent(event, evidence_analysis)
+
+def run_evidence_analysis_with_critic(event: dict, event_key: str, max_iterations: int = 5, budget: CriticLoopBudget = None,
+                                      checkpoint: CheckpointStore = None, chunking: AccountChunking = None):
     """Run evidence analysis with critic evaluation loop.
 
+    The loop stops when the critic approves, when a revision leaves the evidence set
+    unchanged, when the critic repeats its feedback, or when the event's round allowance
+    (scaled by its mismatch count) or the run-wide budget is used up.
+
     Args:
         event: The event data to analyze
         event_key: Event identifier for logging
-        max_iterations: Maximum critic iterations (default 5)
+        max_iterations: Maximum critic iterations (default 5), used when no budget is given
+        budget: Shared CriticLoopBudget for the run; rounds and stop reason are recorded in it
+        checkpoint: If given, a stored analysis is reused and a new one is stored
+        chunking: AccountChunking; an event with more accounts than it allows is analyzed
+            per chunk of accounts (in parallel) and the findings merged by EvidenceReduceAgent.
+            Critic revisions then only redo the merge
 
     Returns:
         dict: Final evidence analysis or None if failed
     """
+    stored = _load_checkpoint(checkpoint, event_key, "evidence")
+    if stored is not None:
+        return stored
+    budget = budget or CriticLoopBudget(max_rounds=max_iterations)
+    allowed_rounds = budget.rounds_for(event)
+    chunks = chunking.split(event) if chunking is not None else []
+    findings = None
     critic_feedback = ""
     evidence_analysis = None
+    rounds = 0
 
-    for iteration in range(max_iterations):
-
-        # Run evidence analysis (with feedback if available)
-        evidence_agent = EvidenceAnalystAgent(event, previous_response=evidence_analysis, critic_feedback=critic_feedback)
-        evidence_analysis = evidence_agent.run()
+    while rounds < allowed_rounds:
+        if not _start_round(budget, rounds, event_key):
+            stop_reason = "run_budget"
+            break
+        rounds += 1
 
-        if evidence_analysis.get("status") == "failed":
-            print(f"Failed to analyze evidence for event key: {event_key}")
-            print(f"Response: {evidence_analysis}")
+        # Run evidence analysis (with feedback if available); a chunked event maps its chunks once
+        if len(chunks) > 1 and findings is None:
+            findings = chunking.analyze_chunks(event, chunks)
+        previous_analysis = evidence_analysis
+        evidence_agent = _evidence_agent(event, evidence_analysis, critic_feedback, chunking, chunks, findings)
+        evidence_analysis = evidence_agent.run() if evidence_agent else dict(_CHUNKS_FAILED)
+        if _evidence_failed(evidence_analysis, event_key):
+            stop_reason = "failed"
             break  # Break out of iteration loop on failure
+        if _evidence_unchanged(previous_analysis, evidence_analysis, event_key):
+            stop_reason = "evidence_unchanged"
+            break
 
         # Run critic evaluation
-        critic_agent = CriticAgent(event, evidence_analysis)
-        critic_response = critic_agent.run()
+        critic_agent = _critic_agent(event, evidence_analysis, chunking)
+        stop_reason, critic_feedback = _critic_verdict(critic_agent.run(), rounds - 1, event_key, critic_feedback)
+        if stop_reason:
+            break
+    else:
+        stop_reason = "round_limit"
+        print(f"Round limit ({allowed_rounds}) reached for event {event_key}, proceeding with final analysis")
 
-        if critic_response.get("status") == "failed":
-            print(f"Failed to evaluate evidence for event key: {event_key}")
-            print(f"Response: {critic_response}")
-            break  # Break out of iteration loop on failure
+    budget.record(event, rounds, stop_reason)
+    _save_checkpoint(checkpoint, event_key, "critic", budget.report[event_key])
+    _save_checkpoint(checkpoint, event_key, "evidence", evidence_analysis)
+    return evidence_analysis
+
+async def run_evidence_analysis_with_critic_async(event: dict, event_key: str, max_iterations: int = 5,
+                                                  budget: CriticLoopBudget = None, checkpoint: CheckpointStore = None,
+                                                  chunking: AccountChunking = None):
+    """Async version of run_evidence_analysis_with_critic. Rounds stay strictly analyst -> critic."""
+    stored = _load_checkpoint(checkpoint, event_key, "evidence")
+    if stored is not None:
+        return stored
+    budget = budget or CriticLoopBudget(max_rounds=max_iterations)
+    allowed_rounds = budget.rounds_for(event)
+    chunks = chunking.split(event) if chunking is not None else []
+    findings = None
+    critic_feedback = ""
+    evidence_analysis = None
+    rounds = 0
 
-        if critic_response.get("approved", False):
-            print(f"Evidence analysis approved by critic agent after {iteration + 1} iterations")
-            break  # Break out of iteration loop on approval
+    while rounds < allowed_rounds:
+        if not _start_round(budget, rounds, event_key):
+            stop_reason = "run_budget"
+            break
+        rounds += 1
 
-        # Get feedback for next iteration
-        critic_feedback = critic_response.get("feedback_string_to_evidence_analyst_agent", "")
-        if critic_feedback:
-            print(f"Critic feedback received ({len(critic_feedback)} chars), iterating...")
-        else:
-            print("No critic feedback, but not approved - continuing...")
+        if len(chunks) > 1 and findings is None:
+            findings = await chunking.analyze_chunks_async(event, chunks)
+        previous_analysis = evidence_analysis
+        evidence_agent = _evidence_agent(event, evidence_analysis, critic_feedback, chunking, chunks, findings)
+        evidence_analysis = await evidence_agent.run_async() if evidence_agent else dict(_CHUNKS_FAILED)
+        if _evidence_failed(evidence_analysis, event_key):
+            stop_reason = "failed"
+            break
+        if _evidence_unchanged(previous_analysis, evidence_analysis, event_key):
+            stop_reason = "evidence_unchanged"
+            break
+
+        critic_agent = _critic_agent(event, evidence_analysis, chunking)
+        stop_reason, critic_feedback = _critic_verdict(await critic_agent.run_async(), rounds - 1, event_key, critic_feedback)
+        if stop_reason:
+            break
     else:
-        print(f"Max iterations ({max_iterations}) reached for event {event_key}, proceeding with final analysis")
+        stop_reason = "round_limit"
+        print(f"Round limit ({allowed_rounds}) reached for event {event_key}, proceeding with final analysis")
 
+    budget.record(event, rounds, stop_reason)
+    _save_checkpoint(checkpoint, event_key, "critic", budget.report[event_key])
+    _save_checkpoint(checkpoint, event_key, "evidence", evidence_analysis)
     return evidence_analysis
 
+def _load_checkpoint(checkpoint: CheckpointStore, event_key, stage: str):
+    if checkpoint is None:
+        return None
+    result = checkpoint.get(event_key, stage)
+    if result is not None:
+        print(f"Resuming event {event_key}: {stage} loaded from checkpoint")
+    return result
 
-def run_reconciliation_pipeline(custody_df: pd.DataFrame, nbim_df: pd.DataFrame):
-    event_data = parse_data(custody_df, nbim_df)
-    print("---Data loaded and parsed---")
+def _save_checkpoint(checkpoint: CheckpointStore, event_key, stage: str, result: dict):
+    if checkpoint is not None:
+        checkpoint.put(event_key, stage, result)
 
-    breaks = []
+def _break_from_conclusion(event: dict, event_key: str, classification_conclusion_dict: dict):
+    """Return the break dict if the conclusion is a reconciliation break, otherwise None."""
+    if classification_conclusion_dict.get("status") == "failed":
+        print(f"Failed to make conclusion for event key: {event_key}")
+        print(f"Response: {classification_conclusion_dict}")
+        return None
 
-    # Classify reconciliation breaks using two-stage analysis
-    for event in event_data:
+    # If the event is a reconciliation break, add it to the list of breaks
+    if classification_conclusion_dict.get("is_break"):
+        classification_conclusion_dict["coac_event_key"] = event_key
+        classification_conclusion_dict["event"] = event
+        print(f"Break detected: {classification_conclusion_dict['classification']}")
+        return classification_conclusion_dict
+    return None
+
+def prioritize_breaks(breaks: list, materiality=None, batch_backend=None, poll_interval: float = 60.0,
+                      chunk_size: int = CONSEQUENCE_CHUNK_SIZE, checkpoint: CheckpointStore = None) -> list:
+    """Attach deterministic materiality and priority to each break, then write consequences.
+
+    Args:
+        breaks: Break dicts from the conclusion stage, in event order
+        materiality: compute_materiality() table for the run; computed from the breaks' events if None
+        batch_backend: If given, the consequence requests are submitted as one batch
+        poll_interval: Seconds between batch status checks
+        chunk_size: Breaks per ConsequenceAgent call
+        checkpoint: If given, stored consequences are reused and new ones are stored
+
+    Returns:
+        list: Breaks sorted by priority, then portfolio delta (see rank_breaks)
+    """
+    if not breaks:
+        return []
+    if materiality is None:
+        materiality = compute_materiality([break_event["event"] for break_event in breaks])
+
+    pending = [break_event for break_event in breaks if not _apply_priority(break_event, materiality, checkpoint)]
+    write_consequences(pending, batch_backend, poll_interval, chunk_size, checkpoint)
+    return rank_breaks(breaks)
+
+def _apply_priority(break_event: dict, materiality, checkpoint: CheckpointStore = None) -> bool:
+    """Attach materiality and priority, and the stored consequence if any. True if there was one."""
+    apply_materiality(break_event, materiality)
+    stored = _load_checkpoint(checkpoint, break_event["coac_event_key"], "consequence")
+    if stored is None:
+        return False
+    break_event["consequence"] = stored["consequence"]
+    return True
+
+def write_consequences(pending: list, batch_backend=None, poll_interval: float = 60.0,
+                       chunk_size: int = CONSEQUENCE_CHUNK_SIZE, checkpoint: CheckpointStore = None):
+    """Set "consequence" on each prioritized break in `pending` (see prioritize_breaks for the arguments)."""
+    # One LLM call writes the consequence text for up to `chunk_size` breaks.
+    chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+    agents = {index: ConsequenceAgent(chunk) for index, chunk in enumerate(chunks)}
+    if batch_backend is not None:
+        responses = run_agents_in_batch(agents, batch_backend, "consequence", poll_interval)
+    else:
+        responses = {index: agent.run() for index, agent in agents.items()}
+
+    for index, chunk in enumerate(chunks):
+        consequences = responses[index]
+        if consequences.get("status") == "failed":
+            print(f"Failed to write consequences: {consequences}")
+            consequences = {}
+        for break_event in chunk:
+            consequence = consequences.get(str(break_event["coac_event_key"]))
+            break_event["consequence"] = consequence or "Unknown"
+            if consequence:
+                _save_checkpoint(checkpoint, break_event["coac_event_key"], "consequence", {"consequence": consequence})
+
+async def _conclude_with_chain_async(event: dict, event_key, budget: CriticLoopBudget = None,
+                                     checkpoint: CheckpointStore = None, chunking: AccountChunking = None):
+    """Async version of _conclude_with_chain."""
+    evidence_analysis = await run_evidence_analysis_with_critic_async(event, event_key, budget=budget, checkpoint=checkpoint,
+                                                                      chunking=chunking)
+    if not evidence_analysis or evidence_analysis.get("status") == "failed":
+        print(f"Skipping event {event_key} due to evidence analysis failure")
+        return None
+
+    conclusion_agent = ConclusionAgent(_review_event(event, chunking), evidence_analysis)
+    return await conclusion_agent.run_async()
+
+async def _conclude_tiered_async(event: dict, event_key, budget: CriticLoopBudget, checkpoint: CheckpointStore,
+                                 router: TieredRouter, chunking: AccountChunking = None):
+    """Async version of _conclude_tiered."""
+    start = time.perf_counter()
+    triage = None
+    reason = router.escalate_before_triage(event_key)
+    if reason is None:
+        triage = await TriageAgent(_review_event(event, chunking)).run_async()
+        reason = router.escalate_after_triage(triage)
+    if reason is None:
+        triage["route"] = "triage"
+        router.record_route(event_key, triage, None, time.perf_counter() - start)
+        if router.should_audit(event_key):
+            chain_start = time.perf_counter()
+            conclusion = await _conclude_with_chain_async(event, event_key, budget, checkpoint, chunking)
+            router.record_comparison(event_key, triage, conclusion, time.perf_counter() - chain_start)
+        return triage
+
+    print(f"Escalating event {event_key} to the full chain: {reason}")
+    chain_start = time.perf_counter()
+    conclusion = await _conclude_with_chain_async(event, event_key, budget, checkpoint, chunking)
+    router.record_route(event_key, triage, reason, time.perf_counter() - start, time.perf_counter() - chain_start)
+    return _escalated_conclusion(router, event_key, triage, conclusion)
+
+async def _process_event_async(event: dict, semaphore: asyncio.Semaphore, budget: CriticLoopBudget = None,
+                               checkpoint: CheckpointStore = None, router: TieredRouter = None,
+                               chunking: AccountChunking = None):
+    """Classify one event. Returns the break dict or None."""
+    async with semaphore:
         event_key = event.get("coac_event_key")
         print(f"---Examining event key: {event_key}---")
-        
-        # Stage 1: Evidence Analysis with Critic Loop
-        evidence_analysis = run_evidence_analysis_with_critic(event, event_key)
 
+        conclusion = _load_checkpoint(checkpoint, event_key, "conclusion")
+        if conclusion is None:
+            if router is None:
+                conclusion = await _conclude_with_chain_async(event, event_key, budget, checkpoint, chunking)
+            else:
+                conclusion = await _conclude_tiered_async(event, event_key, budget, checkpoint, router, chunking)
+            if conclusion is None:
+                return None
+            _save_checkpoint(checkpoint, event_key, "conclusion", conclusion)
+        break_event = _break_from_conclusion(event, event_key, conclusion)
+        print(f"---Finished event key: {event_key}---")
+        return break_event
+
+async def run_events_async(event_data, max_concurrency: int = 8, budget: CriticLoopBudget = None,
+                           checkpoint: CheckpointStore = None, router: TieredRouter = None,
+                           chunking: AccountChunking = None) -> list:
+    """Classify events concurrently, with at most `max_concurrency` events in flight.
+
+    Each event still runs analyst -> critic -> conclusion in order. Breaks are returned
+    in event order, so prioritization gives the same output as the sequential pipeline.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(*(_process_event_async(event, semaphore, budget, checkpoint, router, chunking)
+                                     for event in event_data))
+    return [break_event for break_event in results if break_event is not None]
+
+async def _gather_evidence_async(event_data: list, max_concurrency: int, budget: CriticLoopBudget = None,
+                                 checkpoint: CheckpointStore = None, chunking: AccountChunking = None) -> list:
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def analyze(event):
+        async with semaphore:
+            return await run_evidence_analysis_with_critic_async(event, event.get("coac_event_key"), budget=budget,
+                                                                 checkpoint=checkpoint, chunking=chunking)
+
+    return await asyncio.gather(*(analyze(event) for event in event_data))
+
+def run_batch_stages(event_data, batch_backend, max_concurrency: int = 1, poll_interval: float = 60.0,
+                     budget: CriticLoopBudget = None, checkpoint: CheckpointStore = None,
+                     chunking: AccountChunking = None) -> list:
+    """Offline (nightly) mode: throughput over latency.
+
+    The analyst/critic loop is iterative and still runs call by call. All ConclusionAgent
+    requests are then submitted as one batch and matched back by coac_event_key.
+
+    Returns:
+        list: Breaks in event order, not yet prioritized (see prioritize_breaks)
+    """
+    event_data = list(event_data)
+    conclusions = {}
+    for event in event_data:
+        stored = _load_checkpoint(checkpoint, event.get("coac_event_key"), "conclusion")
+        if stored is not None:
+            conclusions[event.get("coac_event_key")] = stored
+    pending_events = [event for event in event_data if event.get("coac_event_key") not in conclusions]
+
+    # Stage 1: Evidence Analysis with Critic Loop
+    if max_concurrency > 1:
+        analyses = asyncio.run(_gather_evidence_async(pending_events, max_concurrency, budget, checkpoint, chunking))
+    else:
+        analyses = [run_evidence_analysis_with_critic(event, event.get("coac_event_key"), budget=budget, checkpoint=checkpoint,
+                                                      chunking=chunking)
+                    for event in pending_events]
+
+    conclusion_agents = {}
+    for event, evidence_analysis in zip(pending_events, analyses):
+        event_key = event.get("coac_event_key")
         if not evidence_analysis or evidence_analysis.get("status") == "failed":
             print(f"Skipping event {event_key} due to evidence analysis failure")
             continue
-        
-        # Stage 2: Conclusion
-        conclusion_agent = ConclusionAgent(event, evidence_analysis)
-        classification_conclusion_dict = conclusion_agent.run()
+        conclusion_agents[event_key] = ConclusionAgent(_review_event(event, chunking), evidence_analysis)
 
-        if classification_conclusion_dict.get("status") == "failed":
-            print(f"Failed to make conclusion for event key: {event_key}")
-            print(f"Response: {classification_conclusion_dict}")
+    # Stage 2: Conclusion, one batch for all events
+    for event_key, conclusion in run_agents_in_batch(conclusion_agents, batch_backend, "conclusion", poll_interval).items():
+        _save_checkpoint(checkpoint, event_key, "conclusion", conclusion)
+        conclusions[event_key] = conclusion
+    breaks = []
+    for event in event_data:
+        event_key = event.get("coac_event_key")
+        if event_key not in conclusions:
             continue
+        break_event = _break_from_conclusion(event, event_key, conclusions[event_key])
+        if break_event is not None:
+            breaks.append(break_event)
+    return breaks
 
-        # If the event is a reconciliation break, add it to the list of breaks
-        if classification_conclusion_dict.get("is_break"):
-            classification_conclusion_dict["coac_event_key"] = event_key
-            classification_conclusion_dict["event"] = event
-            breaks.append(classification_conclusion_dict)
-            print(f"Break detected: {classification_conclusion_dict['classification']}")
-        
-        print(f"---Finished event key: {event_key}---")
+def run_reconciliation_pipeline(custody_df: pd.DataFrame, nbim_df: pd.DataFrame, fast_path: bool = True, max_concurrency: int = 1,
+                                batch_backend=None, critic_budget: CriticLoopBudget = None, checkpoint: CheckpointStore = None,
+                                event_data=None, router: TieredRouter = None, chunking: AccountChunking = None,
+                                clustering: SignatureClustering = None):
+    """Run the full reconciliation pipeline.
 
-    # Stage 3:Prioritize break events
-    prioritized_breaks = []
-    for break_event in breaks:
-        event_key = break_event.get("coac_event_key")
-        print(f"---Prioritizing event key: {event_key}---")
-        
-        prioritization_agent = PrioritizationAgent(break_event)
-        priority_response = prioritization_agent.run()
-        
-        if priority_response.get("status") == "failed":
-            print(f"Failed to prioritize event key: {event_key}")
-            print(f"Response: {priority_response}")
-            # Continue with default priority if prioritization fails
-            priority_response = {
-                "materiality": "Unknown",
-                "consequence": "Unknown", 
-                "priority": "Medium"
-            }
-        
-        # Add prioritization fields to the break event
-        break_event.update(priority_response)
-        prioritized_breaks.append(break_event)
-        print(f"Priority assigned: {priority_response.get('priority')}")
-        print(f"---Finished prioritizing event key: {event_key}---")
+    Args:
+        custody_df: Raw Custody bookings
+        nbim_df: Raw NBIM bookings
+        fast_path: Auto-clear fully matched events without calling the agents
+        max_concurrency: Events processed concurrently. 1 runs the sequential pipeline,
+            higher values use the async agents
+        batch_backend: If given (AnthropicBatchBackend or LocalBatchBackend), conclusion and
+            consequence requests run as bulk batch submissions (see run_batch_stages)
+        critic_budget: Round/token budget for the analyst/critic loop; collects per-event
+            round counts. A default budget (no run-wide caps) is used if not given
+        checkpoint: CheckpointStore; stage results already in it are reused, new ones are stored
+        event_data: Events already parsed, e.g. by ingest.ingest_bookings. custody_df and
+            nbim_df are ignored then (pass None)
+        router: TieredRouter; if given, a small model triages each event first and only
+            low-confidence or high-materiality events get the full agent chain. Not
+            supported together with batch_backend
+        chunking: AccountChunking; events with many accounts get map-reduce evidence analysis
+            over chunks of accounts (see run_evidence_analysis_with_critic)
+        clustering: SignatureClustering; only one event per mismatch signature goes through
+            the agents, and its break is fanned out to the other events with that signature
+
+    Returns:
+        list: Breaks with priority fields, sorted from high priority to low
+    """
+    event_data, materiality = _prepare_events(custody_df, nbim_df, fast_path, checkpoint, event_data, router, clustering)
+    critic_budget = critic_budget or CriticLoopBudget()
+
+    if batch_backend is not None:
+        breaks = run_batch_stages(event_data, batch_backend, max_concurrency, budget=critic_budget, checkpoint=checkpoint,
+                                  chunking=chunking)
+    elif max_concurrency > 1:
+        breaks = asyncio.run(run_events_async(event_data, max_concurrency, critic_budget, checkpoint, router, chunking))
+    else:
+        breaks = _classify_events(event_data, critic_budget, checkpoint, router, chunking)
+    if clustering is not None:
+        breaks = clustering.fan_out(breaks)
+
+    # Stage 3: Prioritize break events. Materiality and priority are computed, the LLM only
+    # writes the consequence text, many breaks per call.
+    print("---Prioritizing breaks---")
+    return prioritize_breaks(breaks, materiality, batch_backend, checkpoint=checkpoint)
+
+def _prepare_events(custody_df: pd.DataFrame, nbim_df: pd.DataFrame, fast_path: bool, checkpoint: CheckpointStore = None,
+                    event_data=None, router: TieredRouter = None, clustering: SignatureClustering = None):
+    """Parse (unless event_data is given), score materiality for all events, and (with fast_path)
+    drop fully matched events. The remaining events are ordered by mismatch amount, largest
+    first, and the gateway's scheduler (if any) queues their calls in that order.
+    With a checkpoint, stored results of events whose data changed since the last run are dropped.
+    With clustering, only the first (largest) event of each mismatch signature is kept; the
+    materiality is still returned for all events."""
+    if event_data is None:
+        event_data = parse_data(custody_df, nbim_df)
+    print("---Data loaded and parsed---")
+    materiality = compute_materiality(event_data)
+
+    if checkpoint is not None:
+        changes = checkpoint.sync_fingerprints(event_data)
+        print(f"---Since last run: {changes['unchanged_events']} events unchanged (results carried forward), "
+              f"{changes['changed_events']} changed, {changes['new_events']} new, {changes['removed_events']} removed---")
+
+    # Stage 0: Rule-based pre-classification. Fully matched events never reach the agents.
+    if fast_path:
+        event_data, _, routing_stats = pre_classify_events(event_data)
+        print_routing_stats(routing_stats)
+    event_data = order_by_materiality(event_data, materiality)
+    if clustering is not None:
+        events = len(event_data)
+        event_data = clustering.cluster(event_data)
+        print(f"---Mismatch signatures: {len(event_data)} of {events} events go to the agents, one per signature---")
+    scheduler = get_gateway().scheduler
+    if scheduler is not None:
+        scheduler.set_priorities(materiality["portfolio_delta"])
+    if router is not None:
+        router.set_priorities(materiality["priority"])
+    return event_data, materiality
+
+def _conclude_with_chain(event: dict, event_key, critic_budget: CriticLoopBudget, checkpoint: CheckpointStore = None,
+                         chunking: AccountChunking = None):
+    """EvidenceAnalyst/Critic loop, then ConclusionAgent. None when the evidence analysis failed."""
+    # Stage 1: Evidence Analysis with Critic Loop
+    evidence_analysis = run_evidence_analysis_with_critic(event, event_key, budget=critic_budget, checkpoint=checkpoint,
+                                                          chunking=chunking)
+
+    if not evidence_analysis or evidence_analysis.get("status") == "failed":
+        print(f"Skipping event {event_key} due to evidence analysis failure")
+        return None
 
-    # Sort breaks by priority (High -> Medium -> Low)
-    priority_order = {"High": 1, "Medium": 2, "Low": 3}
-    sorted_breaks = sorted(prioritized_breaks, 
-                          key=lambda x: priority_order.get(x.get("priority", "Medium"), 2))
+    # Stage 2: Conclusion
+    conclusion_agent = ConclusionAgent(_review_event(event, chunking), evidence_analysis)
+    return conclusion_agent.run()
 
-    # Return sorted list of breaks with priority field, sorted from high priority to low.
-    return sorted_breaks
+def _escalated_conclusion(router: TieredRouter, event_key, triage: dict, conclusion: dict):
+    if triage is not None:
+        router.record_comparison(event_key, triage, conclusion)
+    if conclusion is not None and conclusion.get("status") != "failed":
+        conclusion["route"] = "full_chain"
+    return conclusion
+
+def _conclude_tiered(event: dict, event_key, critic_budget: CriticLoopBudget, checkpoint: CheckpointStore,
+                     router: TieredRouter, chunking: AccountChunking = None):
+    """Conclusion from the triage model when the router accepts it, otherwise from the full chain.
+    None when an escalated event's evidence analysis failed."""
+    start = time.perf_counter()
+    triage = None
+    reason = router.escalate_before_triage(event_key)
+    if reason is None:
+        triage = TriageAgent(_review_event(event, chunking)).run()
+        reason = router.escalate_after_triage(triage)
+    if reason is None:
+        triage["route"] = "triage"
+        router.record_route(event_key, triage, None, time.perf_counter() - start)
+        if router.should_audit(event_key):
+            # Audited: the full chain also runs, only to measure agreement.
+            chain_start = time.perf_counter()
+            conclusion = _conclude_with_chain(event, event_key, critic_budget, checkpoint, chunking)
+            router.record_comparison(event_key, triage, conclusion, time.perf_counter() - chain_start)
+        return triage
+
+    print(f"Escalating event {event_key} to the full chain: {reason}")
+    chain_start = time.perf_counter()
+    conclusion = _conclude_with_chain(event, event_key, critic_budget, checkpoint, chunking)
+    router.record_route(event_key, triage, reason, time.perf_counter() - start, time.perf_counter() - chain_start)
+    return _escalated_conclusion(router, event_key, triage, conclusion)
+
+def _classify_event(event: dict, critic_budget: CriticLoopBudget, checkpoint: CheckpointStore = None,
+                    router: TieredRouter = None, chunking: AccountChunking = None):
+    """Conclusion for one event (full chain, or tiered with a router). Returns the break dict or None."""
+    event_key = event.get("coac_event_key")
+    print(f"---Examining event key: {event_key}---")
+
+    conclusion = _load_checkpoint(checkpoint, event_key, "conclusion")
+    if conclusion is None:
+        if router is None:
+            conclusion = _conclude_with_chain(event, event_key, critic_budget, checkpoint, chunking)
+        else:
+            conclusion = _conclude_tiered(event, event_key, critic_budget, checkpoint, router, chunking)
+        if conclusion is None:
+            return None
+        _save_checkpoint(checkpoint, event_key, "conclusion", conclusion)
+    break_event = _break_from_conclusion(event, event_key, conclusion)
+    print(f"---Finished event key: {event_key}---")
+    return break_event
+
+def _classify_events(event_data, critic_budget: CriticLoopBudget, checkpoint: CheckpointStore = None,
+                     router: TieredRouter = None, chunking: AccountChunking = None) -> list:
+    """Sequential classification of each event. Returns breaks in event order."""
+    breaks = []
+    for event in event_data:
+        break_event = _classify_event(event, critic_budget, checkpoint, router, chunking)
+        if break_event is not None:
+            breaks.append(break_event)
+    return breaks
+
+def _classify_events_as_completed(event_data, max_concurrency: int, critic_budget: CriticLoopBudget,
+                                  checkpoint: CheckpointStore = None, router: TieredRouter = None,
+                                  chunking: AccountChunking = None):
+    """Yield classification results (break dict or None) in completion order.
+
+    The async agents run on an event loop in a background thread, so the caller can
+    prioritize and emit each break while the remaining events are still being classified.
+    """
+    results = queue.Queue()
+    finished = object()
+
+    async def produce():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        tasks = [asyncio.ensure_future(_process_event_async(event, semaphore, critic_budget, checkpoint, router, chunking))
+                 for event in event_data]
+        for task in asyncio.as_completed(tasks):
+            results.put(await task)
+
+    def worker():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(finished)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    while (item := results.get()) is not finished:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    thread.join()
+
+def stream_reconciliation_pipeline(custody_df: pd.DataFrame, nbim_df: pd.DataFrame, fast_path: bool = True,
+                                   max_concurrency: int = 1, critic_budget: CriticLoopBudget = None,
+                                   sink: JsonlBreakSink = None, view: PriorityView = None, checkpoint: CheckpointStore = None,
+                                   event_data=None, router: TieredRouter = None, chunking: AccountChunking = None,
+                                   clustering: SignatureClustering = None, consequence_batch: int = STREAM_CONSEQUENCE_BATCH,
+                                   consequence_wait: float = STREAM_CONSEQUENCE_WAIT_SECONDS):
+    """Streaming version of run_reconciliation_pipeline.
+
+    A generator that yields each break, with its materiality and priority, as soon as its
+    event has been concluded, instead of after the whole run. Each break is also written to
+    `sink` and inserted into the running priority-ordered `view` if given.
+    The consequence text is not waited for: the yielded break has consequence None, and the
+    ConsequenceAgent writes the consequences of `consequence_batch` breaks per call, or of
+    the breaks that have waited `consequence_wait` seconds (checked as events are concluded),
+    and of the rest at the end. The yielded dicts are then updated in place and `sink` gets a
+    patch line per break. With consequence_batch=1 every break costs one call of its own.
+    With max_concurrency > 1 breaks arrive in completion order. event_data, router, chunking
+    and clustering are as in run_reconciliation_pipeline; with clustering, the breaks fanned
+    out from a representative follow it directly.
+    """
+    event_data, materiality = _prepare_events(custody_df, nbim_df, fast_path, checkpoint, event_data, router, clustering)
+    critic_budget = critic_budget or CriticLoopBudget()
+
+    if max_concurrency > 1:
+        classified = _classify_events_as_completed(event_data, max_concurrency, critic_budget, checkpoint, router, chunking)
+    else:
+        classified = (_classify_event(event, critic_budget, checkpoint, router, chunking) for event in event_data)
+
+    pending, waiting_since = [], None
+    for concluded in classified:
+        concluded_breaks = [] if concluded is None else [concluded]
+        for break_event in (clustering.fan_out(concluded_breaks) if clustering is not None else concluded_breaks):
+            if not _apply_priority(break_event, materiality, checkpoint):
+                break_event["consequence"] = None
+                pending.append(break_event)
+                waiting_since = waiting_since or time.perf_counter()
+            if sink is not None:
+                sink.write(break_event)
+            if view is not None:
+                print_view_update(view, break_event, view.add(break_event))
+            yield break_event
+        if pending and (len(pending) >= consequence_batch or time.perf_counter() - waiting_since >= consequence_wait):
+            _write_streamed_consequences(pending, checkpoint, sink)
+            pending, waiting_since = [], None
+    if pending:
+        _write_streamed_consequences(pending, checkpoint, sink)
+
+def _write_streamed_consequences(pending: list, checkpoint: CheckpointStore, sink: JsonlBreakSink = None):
+    write_consequences(pending, checkpoint=checkpoint)
+    if sink is not None:
+        for break_event in pending:
+            sink.patch(break_event["coac_event_key"], {"consequence": break_event["consequence"]})
 
 def wrap_field(label, text, indent=4, width=100):
     """Print a field with proper wrapping and indentation."""
@@ -166,16 +717,133 @@ def print_final_result(result):
         return
     
     for break_event in result:
-        print(f"Event Key: {break_event.get('coac_event_key', 'Unknown')}")
-        wrap_field("Classification", break_event.get('classification'))
-        wrap_field("Materiality", break_event.get('materiality'))
-        wrap_field("Priority", break_event.get('priority'))
-        wrap_field("Root Cause", break_event.get('brief_summary_of_root_cause'))
-        wrap_field("Consequence", break_event.get('consequence'))
-        wrap_field("Evidence", '; '.join(break_event.get('evidence')))
-        print("---")
+        print_break(break_event)
+
+def print_break(break_event):
+    print(f"Event Key: {break_event.get('coac_event_key', 'Unknown')}")
+    wrap_field("Classification", break_event.get('classification'))
+    wrap_field("Materiality", break_event.get('materiality'))
+    wrap_field("Priority", break_event.get('priority'))
+    wrap_field("Root Cause", break_event.get('brief_summary_of_root_cause'))
+    # None while a streamed break waits for its consequence batch.
+    wrap_field("Consequence", break_event.get('consequence', 'Unknown') or "Pending")
+    wrap_field("Evidence", '; '.join(break_event.get('evidence')))
+    print("---")
+
+def _parse_rate_limits(values: list) -> dict:
+    """["MODEL=RPM,ITPM,OTPM", ...] -> {MODEL: (RPM, ITPM, OTPM)}"""
+    limits = {}
+    for value in values:
+        model, numbers = value.split("=", 1)
+        requests, input_tokens, output_tokens = (int(number) for number in numbers.split(","))
+        limits[model] = (requests, input_tokens, output_tokens)
+    return limits
 
 def main():
+    parser = argparse.ArgumentParser(description="LLM-powered dividend reconciliation")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of events processed concurrently (1 = sequential)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk LLM response cache")
+    parser.add_argument("--batch", action="store_true",
+                        help="Nightly mode: submit conclusion and consequence requests as message batches")
+    parser.add_argument("--batch-local", action="store_true",
+                        help="Batch mode without the Message Batches API: the batched requests are answered one by "
+                             "one by the regular client (with --replay, from the recording, so it runs offline)")
+    parser.add_argument("--stream", metavar="JSONL_PATH", default=None,
+                        help="Print and append each break to JSONL_PATH as soon as its event is concluded")
+    parser.add_argument("--stream-consequence-batch", type=int, default=STREAM_CONSEQUENCE_BATCH,
+                        help="With --stream, breaks are emitted before their consequence text, which is written per "
+                             "this many breaks in one call and appended as a patch line (1 = one call per break)")
+    parser.add_argument("--stream-consequence-wait", type=float, default=STREAM_CONSEQUENCE_WAIT_SECONDS,
+                        help="With --stream, also write the consequences of breaks that have waited this many seconds")
+    parser.add_argument("--run-summary", default="run_summary.json",
+                        help="Where to write the JSON summary of LLM calls, tokens and cost per stage and event")
+    parser.add_argument("--resume", "--incremental", dest="resume", action="store_true",
+                        help="Reuse stage results stored by the previous (or an interrupted) run for events whose "
+                             "data has not changed; only new or changed events go to the agents")
+    parser.add_argument("--no-facts-cache", action="store_true",
+                        help="Re-parse the bookings files even if their normalized facts are cached in .facts_cache/")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes that normalize and parse the event partitions in parallel "
+                             "(bookings above --single-pass-rows only, at most one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows read from each bookings file at a time; bounds memory during ingestion")
+    parser.add_argument("--single-pass-rows", type=int, default=SINGLE_PASS_MAX_ROWS,
+                        help="Bookings with up to this many rows (both files) are parsed in one pass in memory; "
+                             "larger ones are split into event partitions on disk")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH,
+                        help="SQLite file holding the per-event stage results")
+    parser.add_argument("--critic-round-budget", type=int, default=None,
+                        help="Maximum analyst/critic revision rounds for the whole run")
+    parser.add_argument("--critic-token-budget", type=int, default=None,
+                        help="Stop starting analyst/critic revision rounds once they have used this many tokens")
+    parser.add_argument("--record", metavar="JSONL_PATH", default=None,
+                        help="Write every API request and response, with latency and token usage, to JSONL_PATH "
+                             "(combine with --no-cache to capture every call)")
+    parser.add_argument("--replay", metavar="JSONL_PATH", default=None,
+                        help="Answer LLM calls from a --record file instead of the API (no API key needed)")
+    parser.add_argument("--replay-latency-scale", type=float, default=1.0,
+                        help="Recorded latencies are multiplied by this when replaying (1 = original timing, 0 = none)")
+    parser.add_argument("--inject-rate-limits", type=float, default=0.0, metavar="RATE",
+                        help="When replaying, share of attempts answered with a 429 (retried like the SDK does)")
+    parser.add_argument("--inject-timeouts", type=float, default=0.0, metavar="RATE",
+                        help="When replaying, share of attempts that time out (retried like the SDK does)")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="MODEL=RPM,ITPM,OTPM",
+                        help="Requests, input tokens and output tokens per minute for MODEL (repeatable). Turns on "
+                             "the scheduler, which queues and retries calls to stay within the limits; models not "
+                             "given use llm_scheduler.MODEL_RATE_LIMITS, the lowest usage tier. Without it calls are "
+                             "not throttled and the SDK retries them")
+    parser.add_argument("--tiered", action="store_true",
+                        help="A small model triages each event first; only low-confidence or high-materiality "
+                             "events go through the analyst/critic/conclusion agents")
+    parser.add_argument("--triage-confidence", type=float, default=DEFAULT_CONFIDENCE_THRESHOLD,
+                        help="With --tiered, triage answers below this confidence are escalated")
+    parser.add_argument("--triage-audit-rate", type=float, default=0.0,
+                        help="With --tiered, share of accepted triage answers also run through the full chain "
+                             "to measure agreement (1 = all)")
+    parser.add_argument("--account-chunks", action="store_true",
+                        help="Analyze events with many accounts chunk by chunk in parallel and merge the findings "
+                             "before the critic and conclusion")
+    parser.add_argument("--accounts-per-chunk", type=int, default=DEFAULT_ACCOUNTS_PER_CHUNK,
+                        help="With --account-chunks, most accounts per analyst prompt")
+    parser.add_argument("--cluster-signatures", action="store_true",
+                        help="Send one event per mismatch signature (fields that differ, with their relative "
+                             "differences) through the agents and apply its conclusion to the others")
+    args = parser.parse_args()
+    if args.batch and args.batch_local:
+        parser.error("--batch and --batch-local cannot be combined")
+    if args.stream and (args.batch or args.batch_local):
+        parser.error("--stream and --batch cannot be combined")
+    if args.tiered and (args.batch or args.batch_local):
+        parser.error("--tiered and --batch cannot be combined")
+    if (args.record or args.replay) and args.batch:
+        parser.error("--record and --replay do not cover --batch (use --batch-local)")
+    if args.record and args.batch_local:
+        parser.error("--record does not cover --batch-local")
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined")
+    scheduler = None
+    if args.rate_limit:
+        try:
+            scheduler = LLMScheduler(limits=_parse_rate_limits(args.rate_limit))
+        except ValueError:
+            parser.error("--rate-limit expects MODEL=RPM,ITPM,OTPM")
+    recorder, replay = None, None
+    if args.replay:
+        # Every call goes through the replay transport: the response cache is not used. Failed
+        # attempts are retried by the scheduler if there is one, otherwise by the emulated SDK.
+        replay = ReplayLLM(TrafficRecording(args.replay), latency_scale=args.replay_latency_scale,
+                           rate_limit_rate=args.inject_rate_limits, timeout_rate=args.inject_timeouts,
+                           max_retries=0 if scheduler is not None else MAX_RETRIES, fallback=SimulatedLLM())
+        print(f"---Replaying {len(replay.recording)} recorded calls from {args.replay}---")
+        set_gateway(LLMGateway(client=ReplayAnthropic(replay), async_client=ReplayAsyncAnthropic(replay),
+                               scheduler=scheduler))
+    else:
+        if args.record:
+            recorder = TrafficRecorder(args.record)
+        set_gateway(LLMGateway(cache=ResponseCache(enabled=not args.no_cache), recorder=recorder, scheduler=scheduler))
+
     # Load environment variables from .env file in the root directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     root_dir = os.path.join(script_dir, "..")
@@ -188,10 +856,71 @@ def main():
     # Construct path to data folder (one level up from src)
     data_dir = os.path.join(script_dir, "..", "data")
     
-    custody_df = pd.read_csv(os.path.join(data_dir, "CUSTODY_Dividend_bookings 1.csv"), sep=";")
-    nbim_df = pd.read_csv(os.path.join(data_dir, "NBIM_Dividend_bookings 1.csv"), sep=";")
-    result = run_reconciliation_pipeline(custody_df, nbim_df)
+    # Read in chunks with declared dtypes and parsed in one pass or per event partition, or
+    # loaded from the facts cache when the files are unchanged; see ingest.py
+    event_data = ingest_bookings(os.path.join(data_dir, "CUSTODY_Dividend_Bookings 1.csv"),
+                                 os.path.join(data_dir, "NBIM_Dividend_Bookings 1.csv"), chunksize=args.chunk_size, workers=args.workers,
+                                 facts_cache=FactsCache(enabled=not args.no_facts_cache), single_pass_rows=args.single_pass_rows)
+    batch_backend = AnthropicBatchBackend() if args.batch else None
+    if args.batch_local:
+        # Answered on submission, so the first status check finds the batch done.
+        batch_backend = LocalBatchBackend(get_gateway().client, polls_until_done=0)
+    critic_budget = CriticLoopBudget(run_round_budget=args.critic_round_budget, run_token_budget=args.critic_token_budget)
+    router = TieredRouter(args.triage_confidence, audit_rate=args.triage_audit_rate) if args.tiered else None
+    chunking = AccountChunking(args.accounts_per_chunk) if args.account_chunks else None
+    clustering = SignatureClustering() if args.cluster_signatures else None
+    checkpoint = CheckpointStore(args.checkpoint)
+    if args.resume:
+        print(f"---Reusing results from {args.checkpoint}: {checkpoint.completed_count('conclusion')} events concluded so far---")
+    else:
+        checkpoint.clear()
+    try:
+        extra_summary = {}
+        if args.stream:
+            view = PriorityView()
+            with JsonlBreakSink(args.stream) as sink:
+                for break_event in stream_reconciliation_pipeline(None, None, max_concurrency=args.concurrency,
+                                                                  critic_budget=critic_budget, sink=sink, view=view,
+                                                                  checkpoint=checkpoint, event_data=event_data, router=router,
+                                                                  chunking=chunking, clustering=clustering,
+                                                                  consequence_batch=args.stream_consequence_batch,
+                                                                  consequence_wait=args.stream_consequence_wait):
+                    print_break(break_event)
+            result = view.breaks
+            extra_summary["streaming"] = view.summary()
+            if view.first_break_seconds is not None:
+                print(f"---First break after {view.first_break_seconds:.1f}s, {sink.count} breaks written to {args.stream}---")
+        else:
+            result = run_reconciliation_pipeline(None, None, max_concurrency=args.concurrency, batch_backend=batch_backend,
+                                                 critic_budget=critic_budget, checkpoint=checkpoint, event_data=event_data,
+                                                 router=router, chunking=chunking, clustering=clustering)
+    finally:
+        # Flushes pending checkpoints even when the run dies, so --resume can pick up from here.
+        checkpoint.close()
+        if recorder is not None:
+            recorder.close()
     print_final_result(result)
+    if recorder is not None:
+        print(f"---{recorder.records} API calls recorded to {args.record}---")
+    if replay is not None:
+        print_replay_stats(replay)
+    print_latency_summary()
+    print_usage_summary()
+    if scheduler is not None:
+        print_scheduler_stats(scheduler)
+        extra_summary["scheduler"] = scheduler.summary()
+    print_critic_loop_report(critic_budget)
+    if router is not None:
+        print_tiered_report(router)
+        extra_summary["tiered_routing"] = router.summary()
+    if chunking is not None:
+        print_chunking_stats(chunking)
+        extra_summary["account_chunking"] = chunking.summary()
+    if clustering is not None:
+        print_clustering_report(clustering)
+        extra_summary["signature_clustering"] = clustering.summary()
+    write_run_summary(args.run_summary, extra={"critic_loop": critic_budget.summary(), **extra_summary})
+    print(f"---Run summary written to {args.run_summary}---")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
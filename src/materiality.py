@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Deterministic materiality
+# ---------------------------
+# Quotation-currency amounts whose NBIM/Custody difference is money at risk.
+AMOUNT_FIELDS = ("gross_amount", "net_amount", "withholding_tax")
+MATERIALITY_FIELDS = AMOUNT_FIELDS + ("quantity", "dividend_rate", "fx_rate_to_portfolio")
+# Mismatches that change an amount, position, rate or date. Only these (or a missing side)
+# make an account affected: naming differences such as the custodian's are on nearly
+# every account and would turn every multi-account event systemic.
+DELTA_FIELDS = ("gross_amount", "net_amount", "settlement_net_amount", "withholding_tax", "quantity",
+                "dividend_rate", "withholding_rate", "ex_date", "pay_date")
+
+# Largest account-level delta, in portfolio currency, for each priority.
+PRIORITY_THRESHOLDS = {"High": 10_000.0, "Medium": 100.0}
+# Breaks affecting at least this many accounts of an event are treated as systematic (High).
+SYSTEMIC_ACCOUNT_COUNT = 3
+PRIORITY_ORDER = {"High": 1, "Medium": 2, "Low": 3}
+
+def _numeric(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.apply(pd.to_numeric, errors="coerce").astype(float)
+
+def _side_values(entries: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+    """MATERIALITY_FIELDS of `entries` at `rows` as floats, NaN where the side is missing (-1)."""
+    values = _numeric(entries[list(MATERIALITY_FIELDS)])
+    return values.reindex(rows).reset_index(drop=True)
+
+def account_frame(event_data) -> pd.DataFrame:
+    """One row per (event, account) with the NBIM and Custody values materiality needs.
+
+    Uses the columnar frames of an EventCollection directly; a list of event dicts is
+    flattened first.
+    """
+    if hasattr(event_data, "accounts"):
+        accounts = event_data.accounts
+        frame = accounts[["coac_event_key", "account_key", "mismatch_count"]].reset_index(drop=True)
+        frame["delta_mismatch_count"] = event_data.mismatches[list(DELTA_FIELDS)].sum(axis=1).to_numpy()
+        nbim_rows = accounts["nbim_row"].to_numpy()
+        custody_rows = accounts["custody_row"].to_numpy()
+        nbim = _side_values(event_data.nbim, nbim_rows)
+        custody = _side_values(event_data.custody, custody_rows)
+        frame["nbim_present"] = nbim_rows >= 0
+        frame["custody_present"] = custody_rows >= 0
+    else:
+        records, nbim_records, custody_records = [], [], []
+        for event in event_data:
+            for account_key, account_values in event["accounts"].items():
+                nbim_entry = account_values.get("NBIM") or {}
+                custody_entry = account_values.get("Custody") or {}
+                records.append({
+                    "coac_event_key": event["coac_event_key"],
+                    "account_key": account_key,
+                    "mismatch_count": len(account_values.get("mismatches") or []),
+                    "delta_mismatch_count": sum(1 for mismatch in account_values.get("mismatches") or []
+                                                if mismatch["field"] in DELTA_FIELDS),
+                    "nbim_present": bool(nbim_entry),
+                    "custody_present": bool(custody_entry),
+                })
+                nbim_records.append({field: nbim_entry.get(field) for field in MATERIALITY_FIELDS})
+                custody_records.append({field: custody_entry.get(field) for field in MATERIALITY_FIELDS})
+        frame = pd.DataFrame(records, columns=["coac_event_key", "account_key", "mismatch_count", "delta_mismatch_count",
+                                               "nbim_present", "custody_present"])
+        nbim = _numeric(pd.DataFrame(nbim_records, columns=list(MATERIALITY_FIELDS)))
+        custody = _numeric(pd.DataFrame(custody_records, columns=list(MATERIALITY_FIELDS)))
+
+    for field in MATERIALITY_FIELDS:
+        frame[f"nbim_{field}"] = nbim[field].to_numpy()
+        frame[f"custody_{field}"] = custody[field].to_numpy()
+    return frame
+
+def compute_materiality(event_data) -> pd.DataFrame:
+    """Vectorized materiality per event, indexed by coac_event_key.
+
+    For each account the amount at risk is the largest of |NBIM - Custody| over
+    AMOUNT_FIELDS and the quantity difference times the dividend rate; when one side is
+    missing it is the full gross amount of the other side. Amounts are converted to
+    portfolio currency with NBIM's fx_rate_to_portfolio (the event's average rate when an
+    account has none). Events are then scored on the largest account delta and the number
+    of affected accounts: accounts with a missing side or a mismatch in DELTA_FIELDS.
+
+    Columns: portfolio_delta, max_account_delta, affected_accounts, total_accounts,
+    mismatched_fields, missing_fx, priority, materiality.
+    """
+    frame = account_frame(event_data)
+    paired = (frame["nbim_present"] & frame["custody_present"]).to_numpy()
+
+    amount_deltas = [(frame[f"nbim_{field}"] - frame[f"custody_{field}"]).abs() for field in AMOUNT_FIELDS]
+    dividend_rate = frame["nbim_dividend_rate"].fillna(frame["custody_dividend_rate"])
+    amount_deltas.append((frame["nbim_quantity"] - frame["custody_quantity"]).abs() * dividend_rate)
+    paired_delta = pd.concat(amount_deltas, axis=1).max(axis=1, skipna=True).fillna(0.0)
+    missing_side_amount = frame["nbim_gross_amount"].fillna(frame["custody_gross_amount"]).abs().fillna(0.0)
+    quotation_delta = np.where(paired, paired_delta, missing_side_amount)
+
+    fx_rate = frame["nbim_fx_rate_to_portfolio"]
+    fx_rate = fx_rate.fillna(fx_rate.groupby(frame["coac_event_key"], sort=False).transform("mean"))
+    frame["portfolio_delta"] = quotation_delta * fx_rate.fillna(0.0).to_numpy()
+    frame["missing_fx"] = fx_rate.isna() & (quotation_delta > 0)
+    frame["affected"] = (frame["delta_mismatch_count"] > 0) | ~paired
+
+    events = frame.groupby("coac_event_key", sort=False).agg(
+        portfolio_delta=("portfolio_delta", "sum"),
+        max_account_delta=("portfolio_delta", "max"),
+        affected_accounts=("affected", "sum"),
+        total_accounts=("affected", "size"),
+        mismatched_fields=("mismatch_count", "sum"),
+        missing_fx=("missing_fx", "sum"),
+    )
+
+    events["priority"] = np.select(
+        [
+            (events["max_account_delta"] >= PRIORITY_THRESHOLDS["High"]) | (events["affected_accounts"] >= SYSTEMIC_ACCOUNT_COUNT),
+            (events["max_account_delta"] >= PRIORITY_THRESHOLDS["Medium"]) | (events["missing_fx"] > 0),
+        ],
+        ["High", "Medium"],
+        default="Low",
+    )
+    events["materiality"] = (
+        events["portfolio_delta"].map("{:,.0f} portfolio ccy".format)
+        + ", " + events["affected_accounts"].astype(str) + " of " + events["total_accounts"].astype(str) + " accounts"
+        + ", " + events["mismatched_fields"].astype(str) + " mismatched fields"
+    )
+    return events
+
+def order_by_materiality(event_data, materiality: pd.DataFrame) -> list:
+    """Events sorted by portfolio delta, largest first (ties keep their order), so the largest
+    mismatches reach the agents, and the rate-limit budget, first."""
+    deltas = materiality["portfolio_delta"].to_dict()
+    return sorted(event_data, key=lambda event: -deltas.get(event["coac_event_key"], 0.0))
+
+def apply_materiality(break_event: dict, materiality: pd.DataFrame) -> dict:
+    """Copy the event's row of the compute_materiality table onto the break dict."""
+    row = materiality.loc[break_event["coac_event_key"]]
+    break_event["priority"] = row["priority"]
+    break_event["materiality"] = row["materiality"]
+    break_event["materiality_portfolio_amount"] = float(row["portfolio_delta"])
+    break_event["affected_accounts"] = int(row["affected_accounts"])
+    print(f"Priority assigned for event {break_event['coac_event_key']}: {row['priority']} ({row['materiality']})")
+    return break_event
+
+def rank_breaks(breaks: list) -> list:
+    """Deterministic order: priority, then portfolio delta (largest first), then event order."""
+    return sorted(breaks, key=lambda break_event: (PRIORITY_ORDER.get(break_event.get("priority", "Medium"), 2),
+                                                   -break_event.get("materiality_portfolio_amount", 0.0)))
@@ -0,0 +1,187 @@
+import datetime
+
+# ---------------------------
+# Mismatch signatures
+# ---------------------------
+# How a mismatched field enters an account's signature: amounts and positions as the
+# Custody/NBIM ratio, rates as the difference in percentage points, dates as the difference
+# in days, codes as the value pair. Identifiers only as "differs": their values are specific
+# to the security and would keep equal breaks of different events apart.
+RATIO_FIELDS = ("dividend_rate", "gross_amount", "net_amount", "settlement_net_amount", "withholding_tax", "quantity")
+POINT_FIELDS = ("withholding_rate",)
+DATE_FIELDS = ("ex_date", "pay_date")
+PAIR_FIELDS = ("currency", "settlement_currency", "custodian")
+# Decimals kept of ratios and rate differences; closer values fall into the same cluster.
+SIGNATURE_DECIMALS = 3
+# Accounts listed in the evidence of a fanned-out break; the rest are counted.
+MAX_EVIDENCE_ACCOUNTS = 20
+# Fields of a fanned-out break that come from the representative's conclusion as they are.
+INHERITED_FIELDS = ("classification", "brief_summary_of_root_cause")
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _days(nbim_value, custody_value):
+    try:
+        return (datetime.date.fromisoformat(str(custody_value)[:10]) - datetime.date.fromisoformat(str(nbim_value)[:10])).days
+    except ValueError:
+        return None
+
+def field_signature(mismatch: dict) -> tuple:
+    """(field, normalized difference) for one entry of an account's `mismatches` list."""
+    field, nbim_value, custody_value = mismatch["field"], mismatch.get("nbim_value"), mismatch.get("custody_value")
+    nbim_number, custody_number = _number(nbim_value), _number(custody_value)
+    if field in RATIO_FIELDS and nbim_number and custody_number is not None:
+        return (field, "ratio", round(custody_number / nbim_number, SIGNATURE_DECIMALS))
+    if field in POINT_FIELDS and nbim_number is not None and custody_number is not None:
+        return (field, "points", round(custody_number - nbim_number, SIGNATURE_DECIMALS))
+    if field in DATE_FIELDS and _days(nbim_value, custody_value) is not None:
+        return (field, "days", _days(nbim_value, custody_value))
+    if field in PAIR_FIELDS:
+        return (field, "values", " ".join(str(nbim_value).upper().split()), " ".join(str(custody_value).upper().split()))
+    return (field, "differs")
+
+def account_signature(account_values: dict) -> tuple:
+    """Normalized mismatch pattern of one account; () when it matches."""
+    return tuple(sorted(field_signature(mismatch) for mismatch in account_values.get("mismatches") or []))
+
+def event_signature(event: dict) -> tuple:
+    """The distinct account signatures of an event's mismatched accounts, sorted."""
+    signatures = {account_signature(account_values) for account_values in event["accounts"].values()}
+    signatures.discard(())
+    return tuple(sorted(signatures))
+
+def describe_signature(signature: tuple) -> str:
+    parts = []
+    for account in signature:
+        fields = []
+        for field in account:
+            if field[1] == "values":
+                fields.append(f"{field[0]} {field[2]} vs {field[3]}")
+            elif field[0] in ("missing_custody", "missing_nbim"):
+                fields.append(field[0])
+            elif field[1] == "differs":
+                fields.append(f"{field[0]} differs")
+            else:
+                fields.append(f"{field[0]} {field[1]} {field[2]:g}")
+        parts.append(", ".join(fields))
+    return "; ".join(parts) or "no mismatches"
+
+def member_evidence(event: dict) -> list:
+    """Evidence for a fanned-out break, from the event's own mismatch rows: one line per
+    mismatched account, so no figure of the representative's accounts is repeated."""
+    lines = []
+    mismatched = [(account_key, account_values["mismatches"]) for account_key, account_values in event["accounts"].items()
+                  if account_values.get("mismatches")]
+    for account_key, mismatches in mismatched[:MAX_EVIDENCE_ACCOUNTS]:
+        fields = []
+        for mismatch in mismatches:
+            if mismatch["field"] == "missing_custody":
+                fields.append("no Custody booking")
+            elif mismatch["field"] == "missing_nbim":
+                fields.append("no NBIM booking")
+            else:
+                fields.append(f"{mismatch['field']} NBIM {mismatch.get('nbim_value')} vs Custody {mismatch.get('custody_value')}")
+        lines.append(f"Account {account_key}: " + ", ".join(fields))
+    if len(mismatched) > MAX_EVIDENCE_ACCOUNTS:
+        lines.append(f"{len(mismatched) - MAX_EVIDENCE_ACCOUNTS} more accounts with the same mismatch signature")
+    return lines
+
+# ---------------------------
+# Clustering
+# ---------------------------
+class SignatureClustering:
+    """Groups events with the same mismatch signature so only one of them is analyzed.
+
+    Events whose mismatched accounts show the same normalized mismatch patterns (see
+    event_signature; the number of accounts per pattern does not matter) form a cluster.
+    The first event of each cluster in the given order, the largest mismatch when the
+    events are ordered by materiality, is the representative that goes through the agent
+    chain. fan_out() gives every other member a break of its own: the evidence is rebuilt
+    from the member's mismatch rows, the classification and root cause are the
+    representative's (INHERITED_FIELDS, marked with inherited_from), and materiality,
+    priority and consequence are still computed per event.
+    """
+
+    def __init__(self):
+        self.clusters = {}  # representative event key -> {"signature", "members": [event]}
+        self.account_signatures = {}  # account signature -> mismatched accounts with it
+        self.fanned_out = 0
+
+    def cluster(self, event_data) -> list:
+        """Representatives of the clusters of `event_data`, in order."""
+        by_signature = {}
+        for event in event_data:
+            for account_values in event["accounts"].values():
+                signature = account_signature(account_values)
+                if signature:
+                    self.account_signatures[signature] = self.account_signatures.get(signature, 0) + 1
+            signature = event_signature(event)
+            if signature not in by_signature:
+                by_signature[signature] = event["coac_event_key"]
+                self.clusters[str(event["coac_event_key"])] = {"signature": signature, "members": []}
+            self.clusters[str(by_signature[signature])]["members"].append(event)
+        return [cluster["members"][0] for cluster in self.clusters.values()]
+
+    def fan_out(self, breaks: list) -> list:
+        """Each representative's break followed by a copy for every other member of its cluster."""
+        fanned = []
+        for break_event in breaks:
+            cluster = self.clusters.get(str(break_event["coac_event_key"]))
+            if cluster is None:
+                fanned.append(break_event)
+                continue
+            representative_key = break_event["coac_event_key"]
+            size = len(cluster["members"])
+            if size > 1:
+                break_event["cluster_representative"] = representative_key
+                break_event["cluster_size"] = size
+            fanned.append(break_event)
+            for member in cluster["members"][1:]:
+                member_break = {**break_event, "coac_event_key": member["coac_event_key"], "event": member,
+                                "evidence": member_evidence(member),
+                                "brief_summary_of_root_cause": f"As for event {representative_key}, which has the same "
+                                                               f"mismatch signature: {break_event.get('brief_summary_of_root_cause')}",
+                                "inherited_from": representative_key, "inherited_fields": list(INHERITED_FIELDS)}
+                fanned.append(member_break)
+                self.fanned_out += 1
+            if size > 1:
+                print(f"Break of event {representative_key} fanned out to {size - 1} events with the same mismatch signature")
+        return fanned
+
+    def summary(self, top: int = 5) -> dict:
+        sizes = sorted((len(cluster["members"]) for cluster in self.clusters.values()), reverse=True)
+        events = sum(sizes)
+        largest = sorted(self.clusters.items(), key=lambda item: -len(item[1]["members"]))[:top]
+        accounts = sum(self.account_signatures.values())
+        return {
+            "events": events,
+            "clusters": len(sizes),
+            "multi_event_clusters": sum(1 for size in sizes if size > 1),
+            "event_fan_out_ratio": events / len(sizes) if sizes else 0.0,
+            "events_not_analyzed": events - len(sizes),
+            "breaks_fanned_out": self.fanned_out,
+            "cluster_sizes": {str(size): sizes.count(size) for size in sorted(set(sizes), reverse=True)},
+            "largest_clusters": [{"representative": key, "size": len(cluster["members"]),
+                                  "signature": describe_signature(cluster["signature"])} for key, cluster in largest],
+            "mismatched_accounts": accounts,
+            "account_signatures": len(self.account_signatures),
+            "account_fan_out_ratio": accounts / len(self.account_signatures) if self.account_signatures else 0.0,
+        }
+
+def print_clustering_report(clustering: SignatureClustering):
+    summary = clustering.summary()
+    print(f"---Mismatch signatures: {summary['events']} events in {summary['clusters']} clusters "
+          f"({summary['multi_event_clusters']} with several events), fan-out {summary['event_fan_out_ratio']:.2f} events "
+          f"per analyzed event, {summary['events_not_analyzed']} events not sent to the agents, "
+          f"{summary['breaks_fanned_out']} breaks fanned out---")
+    print(f"---Accounts: {summary['mismatched_accounts']} mismatched accounts with {summary['account_signatures']} distinct "
+          f"signatures (fan-out {summary['account_fan_out_ratio']:.2f})---")
+    sizes = ", ".join(f"{count} x {size}" for size, count in summary["cluster_sizes"].items())
+    print(f"---Cluster sizes: {sizes}---")
+    for cluster in summary["largest_clusters"]:
+        if cluster["size"] > 1:
+            print(f"    {cluster['size']:>6} events, e.g. {cluster['representative']}: {cluster['signature']}")
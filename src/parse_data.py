@@ -1,4 +1,6 @@
 import pandas as pd
+import numpy as np
+from collections.abc import Sequence
 from datetime import datetime
 import json
 
@@ -35,6 +37,59 @@ def pick_first_nonnull(values):
             return value
     return None
 
+# ---------------------------
+# Vectorized column coercion
+# ---------------------------
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+
+# Parsed date strings shared across columns and calls (pay/ex dates repeat across holdings).
+_DATE_CACHE = {}
+_DATE_CACHE_MAX_SIZE = 100_000
+
+def to_decimal_series(values: pd.Series) -> pd.Series:
+    """Column-wide to_decimal: strips spaces and thousands separators, unparseable values become NaN."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(float)
+    numbers = pd.to_numeric(values, errors="coerce").astype(float)
+    # Only cells that did not parse directly pay for the separator cleanup.
+    retry = numbers.isna() & values.notna()
+    if retry.any():
+        text = values[retry].astype(str).str.replace(" ", "", regex=False).str.replace(",", "", regex=False)
+        numbers[retry] = pd.to_numeric(text, errors="coerce")
+    return numbers
+
+def _parse_unique_dates(strings: pd.Series) -> pd.Series:
+    """
+    Parse distinct, stripped date strings with DATE_FORMATS tried in order.
+    A column normally uses one format, so the first format that parses everything ends the loop.
+    """
+    parsed = pd.Series(strings.to_numpy(), index=strings.to_numpy(), dtype=object)
+    remaining = strings
+    for fmt in DATE_FORMATS:
+        if remaining.empty:
+            break
+        dates = pd.to_datetime(remaining, format=fmt, errors="coerce")
+        matched = dates.notna().to_numpy()
+        parsed.loc[remaining[matched].to_numpy()] = dates[matched].dt.strftime("%Y-%m-%d").to_numpy()
+        remaining = remaining[~matched]
+    return parsed  # unmatched strings are left as-is
+
+def parse_date_series(values: pd.Series) -> pd.Series:
+    """Column-wide parse_date. Each distinct date string is parsed once and cached."""
+    text = values.astype(str).str.strip().where(values.notna())
+    text = text.where(text != "")
+    codes, uniques = pd.factorize(text)
+
+    unknown = [value for value in uniques if value not in _DATE_CACHE]
+    if unknown:
+        if len(_DATE_CACHE) + len(unknown) > _DATE_CACHE_MAX_SIZE:
+            _DATE_CACHE.clear()
+        _DATE_CACHE.update(_parse_unique_dates(pd.Series(unknown, dtype=object)).to_dict())
+
+    iso_values = np.array([_DATE_CACHE[value] for value in uniques] + [None], dtype=object)
+    # factorize marks missing values with -1, which picks the trailing None.
+    return pd.Series(iso_values[codes], index=values.index, dtype=object)
+
 # ---------------------------
 # Normalizers (straight map)
 # ---------------------------
@@ -53,33 +108,33 @@ def normalize_nbim(df: pd.DataFrame) -> pd.DataFrame:
         "isin": df.get("ISIN"),
         "sedol": df.get("SEDOL"),
         "ticker": df.get("TICKER"),
-        "dividend_rate": df.get("DIVIDENDS_PER_SHARE").apply(to_decimal) if "DIVIDENDS_PER_SHARE" in df.columns else None,
-        "ex_date": df.get("EXDATE").apply(parse_date) if "EXDATE" in df.columns else None,
+        "dividend_rate": to_decimal_series(df.get("DIVIDENDS_PER_SHARE")) if "DIVIDENDS_PER_SHARE" in df.columns else None,
+        "ex_date": parse_date_series(df.get("EXDATE")) if "EXDATE" in df.columns else None,
         # record_date not available in NBIM - excluded from comparison
-        "pay_date": df.get("PAYMENT_DATE").apply(parse_date) if "PAYMENT_DATE" in df.columns else None,
+        "pay_date": parse_date_series(df.get("PAYMENT_DATE")) if "PAYMENT_DATE" in df.columns else None,
         "account_id": df.get("BANK_ACCOUNT"),
         "currency": df.get("QUOTATION_CURRENCY"),
         "settlement_currency": df.get("SETTLEMENT_CURRENCY"),
         "custodian": df.get("CUSTODIAN"),
         "company_name": df.get("ORGANISATION_NAME"),
-        "gross_amount": df.get("GROSS_AMOUNT_QUOTATION").apply(to_decimal) if "GROSS_AMOUNT_QUOTATION" in df.columns else None,
-        "net_amount": df.get("NET_AMOUNT_QUOTATION").apply(to_decimal) if "NET_AMOUNT_QUOTATION" in df.columns else None,
-        "withholding_tax": df.get("WTHTAX_COST_QUOTATION").apply(to_decimal) if "WTHTAX_COST_QUOTATION" in df.columns else None,
-        "withholding_rate": df.get("WTHTAX_RATE").apply(to_decimal) if "WTHTAX_RATE" in df.columns else None,
-        "total_tax_rate": df.get("TOTAL_TAX_RATE").apply(to_decimal) if "TOTAL_TAX_RATE" in df.columns else None,
-        "settlement_net_amount": df.get("NET_AMOUNT_SETTLEMENT").apply(to_decimal) if "NET_AMOUNT_SETTLEMENT" in df.columns else None,
+        "gross_amount": to_decimal_series(df.get("GROSS_AMOUNT_QUOTATION")) if "GROSS_AMOUNT_QUOTATION" in df.columns else None,
+        "net_amount": to_decimal_series(df.get("NET_AMOUNT_QUOTATION")) if "NET_AMOUNT_QUOTATION" in df.columns else None,
+        "withholding_tax": to_decimal_series(df.get("WTHTAX_COST_QUOTATION")) if "WTHTAX_COST_QUOTATION" in df.columns else None,
+        "withholding_rate": to_decimal_series(df.get("WTHTAX_RATE")) if "WTHTAX_RATE" in df.columns else None,
+        "total_tax_rate": to_decimal_series(df.get("TOTAL_TAX_RATE")) if "TOTAL_TAX_RATE" in df.columns else None,
+        "settlement_net_amount": to_decimal_series(df.get("NET_AMOUNT_SETTLEMENT")) if "NET_AMOUNT_SETTLEMENT" in df.columns else None,
         # NBIM-specific fields for comprehensive analysis
-        "local_tax": df.get("LOCALTAX_COST_QUOTATION").apply(to_decimal) if "LOCALTAX_COST_QUOTATION" in df.columns else None,
-        "local_tax_settlement": df.get("LOCALTAX_COST_SETTLEMENT").apply(to_decimal) if "LOCALTAX_COST_SETTLEMENT" in df.columns else None,
-        "portfolio_gross_amount": df.get("GROSS_AMOUNT_PORTFOLIO").apply(to_decimal) if "GROSS_AMOUNT_PORTFOLIO" in df.columns else None,
-        "portfolio_net_amount": df.get("NET_AMOUNT_PORTFOLIO").apply(to_decimal) if "NET_AMOUNT_PORTFOLIO" in df.columns else None,
-        "portfolio_withholding_tax": df.get("WTHTAX_COST_PORTFOLIO").apply(to_decimal) if "WTHTAX_COST_PORTFOLIO" in df.columns else None,
-        "fx_rate_to_portfolio": df.get("AVG_FX_RATE_QUOTATION_TO_PORTFOLIO").apply(to_decimal) if "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO" in df.columns else None,
+        "local_tax": to_decimal_series(df.get("LOCALTAX_COST_QUOTATION")) if "LOCALTAX_COST_QUOTATION" in df.columns else None,
+        "local_tax_settlement": to_decimal_series(df.get("LOCALTAX_COST_SETTLEMENT")) if "LOCALTAX_COST_SETTLEMENT" in df.columns else None,
+        "portfolio_gross_amount": to_decimal_series(df.get("GROSS_AMOUNT_PORTFOLIO")) if "GROSS_AMOUNT_PORTFOLIO" in df.columns else None,
+        "portfolio_net_amount": to_decimal_series(df.get("NET_AMOUNT_PORTFOLIO")) if "NET_AMOUNT_PORTFOLIO" in df.columns else None,
+        "portfolio_withholding_tax": to_decimal_series(df.get("WTHTAX_COST_PORTFOLIO")) if "WTHTAX_COST_PORTFOLIO" in df.columns else None,
+        "fx_rate_to_portfolio": to_decimal_series(df.get("AVG_FX_RATE_QUOTATION_TO_PORTFOLIO")) if "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO" in df.columns else None,
         "instrument_description": df.get("INSTRUMENT_DESCRIPTION"),
         "organisation_name": df.get("ORGANISATION_NAME"),
-        "restitution_rate": df.get("RESTITUTION_RATE").apply(to_decimal) if "RESTITUTION_RATE" in df.columns else None,
+        "restitution_rate": to_decimal_series(df.get("RESTITUTION_RATE")) if "RESTITUTION_RATE" in df.columns else None,
         # Position fields
-        "quantity": df.get("NOMINAL_BASIS").apply(to_decimal) if "NOMINAL_BASIS" in df.columns else None,
+        "quantity": to_decimal_series(df.get("NOMINAL_BASIS")) if "NOMINAL_BASIS" in df.columns else None,
         "holding_quantity": None,  # Not available in NBIM
         "loan_quantity": None,     # Not available in NBIM
         "lending_percentage": None, # Not available in NBIM
@@ -106,20 +161,20 @@ def normalize_custody(df: pd.DataFrame) -> pd.DataFrame:
         "isin": df.get("ISIN"),
         "sedol": df.get("SEDOL"),
         "ticker": None,  # Not available in Custody
-        "dividend_rate": df.get("DIV_RATE").apply(to_decimal) if "DIV_RATE" in df.columns else None,
-        "ex_date": df.get("EX_DATE").apply(parse_date) if "EX_DATE" in df.columns else None,
+        "dividend_rate": to_decimal_series(df.get("DIV_RATE")) if "DIV_RATE" in df.columns else None,
+        "ex_date": parse_date_series(df.get("EX_DATE")) if "EX_DATE" in df.columns else None,
         # record_date not available in NBIM - excluded from comparison
-        "pay_date": df.get("PAY_DATE").apply(parse_date) if "PAY_DATE" in df.columns else None,
+        "pay_date": parse_date_series(df.get("PAY_DATE")) if "PAY_DATE" in df.columns else None,
         "account_id": df.get("BANK_ACCOUNTS"),
         "currency": df.get("CURRENCIES"),
         "settlement_currency": df.get("SETTLED_CURRENCY"),
         "custodian": df.get("CUSTODIAN"),
         "company_name": None,  # Not available in Custody
-        "gross_amount": df.get("GROSS_AMOUNT").apply(to_decimal) if "GROSS_AMOUNT" in df.columns else None,
-        "net_amount": df.get("NET_AMOUNT_QC").apply(to_decimal) if "NET_AMOUNT_QC" in df.columns else None,
-        "settlement_net_amount": df.get("NET_AMOUNT_SC").apply(to_decimal) if "NET_AMOUNT_SC" in df.columns else None,
-        "withholding_tax": df.get("TAX").apply(to_decimal) if "TAX" in df.columns else None,
-        "withholding_rate": df.get("TAX_RATE").apply(to_decimal) if "TAX_RATE" in df.columns else None,
+        "gross_amount": to_decimal_series(df.get("GROSS_AMOUNT")) if "GROSS_AMOUNT" in df.columns else None,
+        "net_amount": to_decimal_series(df.get("NET_AMOUNT_QC")) if "NET_AMOUNT_QC" in df.columns else None,
+        "settlement_net_amount": to_decimal_series(df.get("NET_AMOUNT_SC")) if "NET_AMOUNT_SC" in df.columns else None,
+        "withholding_tax": to_decimal_series(df.get("TAX")) if "TAX" in df.columns else None,
+        "withholding_rate": to_decimal_series(df.get("TAX_RATE")) if "TAX_RATE" in df.columns else None,
         "total_tax_rate": None,  # Not available in Custody
         # Custody-specific fields for comprehensive analysis
         "local_tax": None,  # Not available in Custody
@@ -132,174 +187,377 @@ def normalize_custody(df: pd.DataFrame) -> pd.DataFrame:
         "organisation_name": None,  # Not available in Custody
         "restitution_rate": None,  # Not available in Custody
         # Position fields - CRITICAL FIX: Use NOMINAL_BASIS for primary quantity
-        "quantity": df.get("NOMINAL_BASIS").apply(to_decimal) if "NOMINAL_BASIS" in df.columns else None,
-        "holding_quantity": df.get("HOLDING_QUANTITY").apply(to_decimal) if "HOLDING_QUANTITY" in df.columns else None,
-        "loan_quantity": df.get("LOAN_QUANTITY").apply(to_decimal) if "LOAN_QUANTITY" in df.columns else None,
-        "lending_percentage": df.get("LENDING_PERCENTAGE").apply(to_decimal) if "LENDING_PERCENTAGE" in df.columns else None,
+        "quantity": to_decimal_series(df.get("NOMINAL_BASIS")) if "NOMINAL_BASIS" in df.columns else None,
+        "holding_quantity": to_decimal_series(df.get("HOLDING_QUANTITY")) if "HOLDING_QUANTITY" in df.columns else None,
+        "loan_quantity": to_decimal_series(df.get("LOAN_QUANTITY")) if "LOAN_QUANTITY" in df.columns else None,
+        "lending_percentage": to_decimal_series(df.get("LENDING_PERCENTAGE")) if "LENDING_PERCENTAGE" in df.columns else None,
         # FX and cross-currency fields
-        "fx_rate": df.get("FX_RATE").apply(to_decimal) if "FX_RATE" in df.columns else None,
+        "fx_rate": to_decimal_series(df.get("FX_RATE")) if "FX_RATE" in df.columns else None,
         "is_cross_currency_reversal": df.get("IS_CROSS_CURRENCY_REVERSAL") if "IS_CROSS_CURRENCY_REVERSAL" in df.columns else None,
         # Restitution fields - Critical for Swiss dividend analysis
-        "restitution_payment": df.get("POSSIBLE_RESTITUTION_PAYMENT").apply(to_decimal) if "POSSIBLE_RESTITUTION_PAYMENT" in df.columns else None,
-        "restitution_amount": df.get("POSSIBLE_RESTITUTION_AMOUNT").apply(to_decimal) if "POSSIBLE_RESTITUTION_AMOUNT" in df.columns else None
+        "restitution_payment": to_decimal_series(df.get("POSSIBLE_RESTITUTION_PAYMENT")) if "POSSIBLE_RESTITUTION_PAYMENT" in df.columns else None,
+        "restitution_amount": to_decimal_series(df.get("POSSIBLE_RESTITUTION_AMOUNT")) if "POSSIBLE_RESTITUTION_AMOUNT" in df.columns else None
     })
 
 # ---------------------------
 # Mismatch analysis
 # ---------------------------
-def add_mismatch_analysis(events):
+# Fields to compare between NBIM and Custody entries (fields that should exist in both)
+COMPARABLE_FIELDS = [
+    # Basic identifiers that should match
+    'isin', 'sedol', 'ex_date', 'pay_date', 'currency', 'settlement_currency', 'custodian',
+    # Core dividend fields that should be comparable
+    'dividend_rate', 'gross_amount', 'net_amount', 'settlement_net_amount',
+    'withholding_tax', 'withholding_rate',
+    # Position - using primary quantity field
+    'quantity'
+]
+
+# Per-field numeric tolerances. Two numbers match when
+# |nbim - custody| <= max(abs, rel * max(|nbim|, |custody|)).
+FIELD_TOLERANCES = {
+    # Amounts: ignore sub-cent rounding differences
+    'gross_amount': {"abs": 0.005},
+    'net_amount': {"abs": 0.005},
+    'settlement_net_amount': {"abs": 0.005},
+    'withholding_tax': {"abs": 0.005},
+    # Rates: ignore precision differences between systems
+    'dividend_rate': {"abs": 1e-6},
+    'withholding_rate': {"abs": 1e-4},
+    'quantity': {"abs": 1e-6},
+}
+
+# Relative tolerance applied to every numeric comparison to absorb float noise.
+FLOAT_NOISE_TOLERANCE = 1e-9
+
+def _column_mismatch(nbim_values: pd.Series, custody_values: pd.Series, tolerance: dict) -> np.ndarray:
+    """
+    Compare one field for all account pairs at once.
+    Numbers (including numeric strings) are compared within the tolerance, everything else
+    as stripped strings. Both missing is a match, one missing is a mismatch.
+    """
+    nbim_missing = nbim_values.isna().to_numpy()
+    custody_missing = custody_values.isna().to_numpy()
+
+    nbim_numbers = pd.to_numeric(nbim_values, errors="coerce").to_numpy(dtype=float)
+    custody_numbers = pd.to_numeric(custody_values, errors="coerce").to_numpy(dtype=float)
+    both_numeric = ~np.isnan(nbim_numbers) & ~np.isnan(custody_numbers)
+
+    scale = np.maximum(np.abs(nbim_numbers), np.abs(custody_numbers))
+    limit = np.maximum(tolerance.get("abs", 0.0), max(tolerance.get("rel", 0.0), FLOAT_NOISE_TOLERANCE) * scale)
+    with np.errstate(invalid="ignore"):
+        numbers_differ = np.abs(nbim_numbers - custody_numbers) > limit
+
+    differs = np.where(nbim_missing | custody_missing, nbim_missing != custody_missing, numbers_differ)
+    # Only values that are present on both sides and not both numeric are compared as text.
+    as_text = ~both_numeric & ~nbim_missing & ~custody_missing
+    if as_text.any():
+        nbim_text = nbim_values[as_text].astype(str).str.strip().to_numpy()
+        custody_text = custody_values[as_text].astype(str).str.strip().to_numpy()
+        differs[as_text] = nbim_text != custody_text
+    return differs.astype(bool)
+
+def mismatch_matrix(nbim: pd.DataFrame, custody: pd.DataFrame, tolerances: dict = None) -> pd.DataFrame:
+    """
+    Boolean mismatch matrix for row-aligned NBIM and Custody entries.
+    Rows are account pairs, columns are COMPARABLE_FIELDS, True where the values differ.
+
+    Args:
+        nbim: NBIM entries, one row per account pair
+        custody: Custody entries, aligned row by row with `nbim`
+        tolerances: Per-field overrides of FIELD_TOLERANCES, e.g. {"gross_amount": {"abs": 1.0}}
+    """
+    tolerances = {**FIELD_TOLERANCES, **(tolerances or {})}
+    nbim = nbim.reset_index(drop=True)
+    custody = custody.reset_index(drop=True)
+    return pd.DataFrame(
+        {field: _column_mismatch(nbim[field], custody[field], tolerances.get(field, {})) for field in COMPARABLE_FIELDS},
+        columns=COMPARABLE_FIELDS,
+    )
+
+def mismatch_entries(nbim_entry, custody_entry, flags) -> list:
+    """Turn one account's row of the mismatch matrix into the `mismatches` list the agents see."""
+    if nbim_entry and custody_entry:
+        return [
+            {
+                "field": field,
+                "nbim_value": nbim_entry.get(field),
+                "custody_value": custody_entry.get(field)
+            }
+            for field, differs in zip(COMPARABLE_FIELDS, flags) if differs
+        ]
+    elif nbim_entry and not custody_entry:
+        return [{"field": "missing_custody", "nbim_value": "present", "custody_value": "missing"}]
+    elif custody_entry and not nbim_entry:
+        return [{"field": "missing_nbim", "nbim_value": "missing", "custody_value": "present"}]
+    return []
+
+def add_mismatch_analysis(events, tolerances: dict = None):
     """
     Add mismatch analysis to identify comparable fields that differ between NBIM and Custody entries.
     Modifies the events dictionary in-place by adding 'mismatches' field to each account.
     Only checks fields that should be comparable between systems.
+
+    All account pairs are compared in one mismatch_matrix call; see FIELD_TOLERANCES.
     """
-    # Fields to compare between NBIM and Custody entries (fields that should exist in both)
-    comparable_fields = [
-        # Basic identifiers that should match
-        'isin', 'sedol', 'ex_date', 'pay_date', 'currency', 'settlement_currency', 'custodian',
-        # Core dividend fields that should be comparable
-        'dividend_rate', 'gross_amount', 'net_amount', 'settlement_net_amount', 
-        'withholding_tax', 'withholding_rate',
-        # Position - using primary quantity field
-        'quantity'
-    ]
-    
-    def values_are_different(val1, val2):
-        """Check if two values are meaningfully different, handling None/null cases."""
-        # Both None/null - not different
-        if val1 is None and val2 is None:
-            return False
-        # One is None, other is not - different
-        if val1 is None or val2 is None:
-            return True
-        # Both have values - compare as strings to handle type differences
-        return str(val1).strip() != str(val2).strip()
-    
-    for event in events.values():
-        for account_key, account_data in event["accounts"].items():
-            nbim_entry = account_data["NBIM"]
-            custody_entry = account_data["Custody"]
-            
-            if nbim_entry and custody_entry:
-                mismatched_fields = []
-                for field in comparable_fields:
-                    nbim_val = nbim_entry.get(field)
-                    custody_val = custody_entry.get(field)
-                    
-                    if values_are_different(nbim_val, custody_val):
-                        mismatched_fields.append({
-                            "field": field,
-                            "nbim_value": nbim_val,
-                            "custody_value": custody_val
-                        })
-                
-                account_data["mismatches"] = mismatched_fields
-            elif nbim_entry and not custody_entry:
-                account_data["mismatches"] = [{"field": "missing_custody", "nbim_value": "present", "custody_value": "missing"}]
-            elif custody_entry and not nbim_entry:
-                account_data["mismatches"] = [{"field": "missing_nbim", "nbim_value": "missing", "custody_value": "present"}]
-            else:
-                account_data["mismatches"] = []
+    accounts = [account_data for event in events.values() for account_data in event["accounts"].values()]
+    paired = [account_data for account_data in accounts if account_data["NBIM"] and account_data["Custody"]]
+
+    flags = mismatch_matrix(
+        pd.DataFrame([account_data["NBIM"] for account_data in paired], columns=COMPARABLE_FIELDS),
+        pd.DataFrame([account_data["Custody"] for account_data in paired], columns=COMPARABLE_FIELDS),
+        tolerances,
+    ).to_numpy()
+    paired_flags = {id(account_data): row for account_data, row in zip(paired, flags)}
+
+    for account_data in accounts:
+        account_data["mismatches"] = mismatch_entries(
+            account_data["NBIM"], account_data["Custody"], paired_flags.get(id(account_data), ())
+        )
 
 # ---------------------------
-# Main parser
+# Columnar event assembly
 # ---------------------------
-def parse_data(custody_raw: pd.DataFrame, nbim_raw: pd.DataFrame):
-    """
-    Main parser function.
-    - Normalizes data from both sources
-    - Adds mismatch analysis for comparable fields only
-    - Returns structured event data with full entry details for analysis
+# Per-side entry fields, in the order they appear in each account's NBIM/Custody dict.
+ENTRY_FIELDS = [
+    "row_id",
+    # Basic identifiers
+    "isin", "sedol", "ticker", "ex_date", "pay_date", "currency", "settlement_currency",
+    "custodian", "company_name", "instrument_description", "organisation_name",
+    # Dividend and amounts
+    "dividend_rate", "gross_amount", "net_amount", "settlement_net_amount",
+    "withholding_tax", "withholding_rate", "total_tax_rate",
+    # Position fields - Critical for reconciliation
+    "quantity", "holding_quantity", "loan_quantity", "lending_percentage",
+    # FX and cross-currency fields
+    "fx_rate", "fx_rate_to_portfolio", "is_cross_currency_reversal",
+    # Tax fields - Critical for complex tax analysis
+    "local_tax", "local_tax_settlement",
+    # Restitution fields - Critical for Swiss dividend analysis
+    "restitution_payment", "restitution_amount", "restitution_rate",
+    # Portfolio fields - For comprehensive analysis
+    "portfolio_gross_amount", "portfolio_net_amount", "portfolio_withholding_tax",
+]
+
+NO_ACCOUNT_KEY = "_NO_ACCOUNT_"
+# Position in the delivered file, not content: left out of fingerprints.
+FINGERPRINT_EXCLUDED_FIELDS = ("row_id",)
+
+class EventCollection(Sequence):
     """
-    nbim = normalize_nbim(nbim_raw)
-    custody = normalize_custody(custody_raw)
-    facts = pd.concat([nbim, custody], ignore_index=True)
+    Read-only sequence of coac events backed by columnar frames.
 
-    # normalize account ids
-    facts["account_id"] = facts["account_id"].astype(str).str.strip()
-    facts.loc[facts["account_id"].isin(["", "nan", "none", "None"]), "account_id"] = None
+    `accounts` holds one row per (coac_event_key, account_key) pair, ordered by first
+    appearance, with the positions of the matching rows in `nbim` and `custody`
+    (-1 when that side is missing) and the number of mismatches on the account.
+    `mismatches` is the boolean mismatch matrix aligned with `accounts`.
+    `accounts` also carries a content fingerprint per side (None when the side is missing).
+    Event dicts in the same shape as the old row-by-row parser are only built when
+    an event is accessed.
+    """
 
-    events = {}
+    def __init__(self, accounts: pd.DataFrame, nbim: pd.DataFrame, custody: pd.DataFrame, mismatches: pd.DataFrame):
+        self.accounts = accounts.reset_index(drop=True)
+        self.nbim = nbim
+        self.custody = custody
+        self.mismatches = mismatches.reset_index(drop=True)
+        event_codes = self.accounts["event_code"].to_numpy()
+        # Start offset of every event group in `accounts` (rows are sorted by event).
+        self._starts = np.flatnonzero(np.r_[True, event_codes[1:] != event_codes[:-1]]) if len(event_codes) else np.array([], dtype=int)
+        self._ends = np.r_[self._starts[1:], len(event_codes)].astype(int)
+        self.event_keys = self.accounts["coac_event_key"].to_numpy()[self._starts].tolist()
+        # Mismatched fields (and missing sides) summed over each event's accounts.
+        self.event_mismatch_counts = np.add.reduceat(self.accounts["mismatch_count"].to_numpy(), self._starts) if len(self._starts) else np.array([], dtype=int)
+        # Plain arrays for building dicts without per-event pandas indexing.
+        self._account_keys = self.accounts["account_key"].tolist()
+        self._nbim_rows = self.accounts["nbim_row"].tolist()
+        self._custody_rows = self.accounts["custody_row"].tolist()
+        self._nbim_values = nbim.to_numpy(dtype=object)
+        self._custody_values = custody.to_numpy(dtype=object)
+        self._mismatch_flags = self.mismatches.to_numpy(dtype=bool)
 
-    for _, event_row in facts.iterrows():
-        event_key = event_row["coac_event_key"]
-        if pd.isna(event_key):
-            continue  # skip lines with no event key
+    def __len__(self):
+        return len(self._starts)
 
-        account_id = event_row["account_id"]
-        account_key = "_NO_ACCOUNT_" if account_id is None else str(account_id)
-        side = event_row["source"]
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        return self._build_event(index)
 
-        if event_key not in events:
-            events[event_key] = {
-                "coac_event_key": event_key,
-                "accounts": {}
+    def _build_event(self, index: int) -> dict:
+        event = {"coac_event_key": self.event_keys[index], "accounts": {}}
+        for row in range(self._starts[index], self._ends[index]):
+            nbim_entry = _entry(self._nbim_values, self._nbim_rows[row])
+            custody_entry = _entry(self._custody_values, self._custody_rows[row])
+            event["accounts"][self._account_keys[row]] = {
+                "NBIM": nbim_entry,
+                "Custody": custody_entry,
+                "mismatches": mismatch_entries(nbim_entry, custody_entry, self._mismatch_flags[row]),
             }
-        event = events[event_key]
+        return event
 
-        if account_key not in event["accounts"]:
-            event["accounts"][account_key] = {
-                "NBIM": None,
-                "Custody": None,
-            }
+    def fingerprints(self) -> pd.DataFrame:
+        """One row per (coac_event_key, account_key, side) present in the data, with its fingerprint."""
+        sides = []
+        for side, column in (("NBIM", "nbim_fingerprint"), ("Custody", "custody_fingerprint")):
+            frame = self.accounts[["coac_event_key", "account_key", column]].rename(columns={column: "fingerprint"})
+            frame = frame[frame["fingerprint"].notna()]
+            sides.append(frame.assign(side=side))
+        return pd.concat(sides, ignore_index=True)[["coac_event_key", "account_key", "side", "fingerprint"]]
 
-        entry = {
-            "row_id": int(event_row.get("source_row")) if event_row.get("source_row") is not None and pd.notna(event_row.get("source_row")) else None,
-            # Basic identifiers
-            "isin": event_row.get("isin"),
-            "sedol": event_row.get("sedol"),
-            "ticker": event_row.get("ticker"),
-            "ex_date": event_row.get("ex_date"),
-            "pay_date": event_row.get("pay_date"),
-            "currency": event_row.get("currency"),
-            "settlement_currency": event_row.get("settlement_currency"),
-            "custodian": event_row.get("custodian"),
-            "company_name": event_row.get("company_name"),
-            "instrument_description": event_row.get("instrument_description"),
-            "organisation_name": event_row.get("organisation_name"),
-            # Dividend and amounts
-            "dividend_rate": event_row.get("dividend_rate"),
-            "gross_amount": event_row.get("gross_amount"),
-            "net_amount": event_row.get("net_amount"),
-            "settlement_net_amount": event_row.get("settlement_net_amount"),
-            "withholding_tax": event_row.get("withholding_tax"),
-            "withholding_rate": event_row.get("withholding_rate"),
-            "total_tax_rate": event_row.get("total_tax_rate"),
-            # Position fields - Critical for reconciliation
-            "quantity": event_row.get("quantity"),
-            "holding_quantity": event_row.get("holding_quantity"),
-            "loan_quantity": event_row.get("loan_quantity"),
-            "lending_percentage": event_row.get("lending_percentage"),
-            # FX and cross-currency fields
-            "fx_rate": event_row.get("fx_rate"),
-            "fx_rate_to_portfolio": event_row.get("fx_rate_to_portfolio"),
-            "is_cross_currency_reversal": event_row.get("is_cross_currency_reversal"),
-            # Tax fields - Critical for complex tax analysis
-            "local_tax": event_row.get("local_tax"),
-            "local_tax_settlement": event_row.get("local_tax_settlement"),
-            # Restitution fields - Critical for Swiss dividend analysis
-            "restitution_payment": event_row.get("restitution_payment"),
-            "restitution_amount": event_row.get("restitution_amount"),
-            "restitution_rate": event_row.get("restitution_rate"),
-            # Portfolio fields - For comprehensive analysis
-            "portfolio_gross_amount": event_row.get("portfolio_gross_amount"),
-            "portfolio_net_amount": event_row.get("portfolio_net_amount"),
-            "portfolio_withholding_tax": event_row.get("portfolio_withholding_tax"),
-        }
-
-        event["accounts"][account_key][side] = entry
-
-    # Add mismatch analysis
-    add_mismatch_analysis(events)
-    
-    event_data = list(events.values())
-    for event in event_data:
+    @classmethod
+    def concat(cls, collections: list) -> "EventCollection":
+        """
+        One collection holding the events of `collections`, in the given order.
+        Each event must be in only one of them (e.g. events parsed per partition).
+        """
+        if len(collections) == 1:
+            return collections[0]
+        accounts, mismatches = [], []
+        event_offset = account_offset = nbim_offset = custody_offset = 0
+        for collection in collections:
+            part = collection.accounts.copy()
+            part["event_code"] += event_offset
+            part["account_code"] += account_offset
+            part["nbim_row"] = np.where(part["nbim_row"] >= 0, part["nbim_row"] + nbim_offset, -1)
+            part["custody_row"] = np.where(part["custody_row"] >= 0, part["custody_row"] + custody_offset, -1)
+            accounts.append(part)
+            mismatches.append(collection.mismatches)
+            event_offset += len(collection)
+            account_offset += len(part)
+            nbim_offset += len(collection.nbim)
+            custody_offset += len(collection.custody)
+        return cls(
+            pd.concat(accounts, ignore_index=True),
+            pd.concat([collection.nbim for collection in collections], ignore_index=True),
+            pd.concat([collection.custody for collection in collections], ignore_index=True),
+            pd.concat(mismatches, ignore_index=True),
+        )
+
+def _entry(values: np.ndarray, position: int):
+    """Entry dict for one row of a side's value array, None when the side is missing."""
+    if position < 0:
+        return None
+    return dict(zip(ENTRY_FIELDS, values[position].tolist()))
+
+def side_fingerprints(entries: pd.DataFrame) -> np.ndarray:
+    """
+    Stable content hash of each entry row, as 16-char hex strings.
+    The same values give the same fingerprint in every run (fixed hash key), so
+    fingerprints can be compared against those stored by a previous run.
+    """
+    content = entries.drop(columns=list(FINGERPRINT_EXCLUDED_FIELDS))
+    hashes = pd.util.hash_pandas_object(content, index=False).to_numpy()
+    return np.array([f"{value:016x}" for value in hashes.tolist()], dtype=object)
+
+def _fingerprints_at(fingerprints: np.ndarray, rows: pd.Series) -> np.ndarray:
+    positions = rows.to_numpy()
+    result = np.full(len(positions), None, dtype=object)
+    present = positions >= 0
+    result[present] = fingerprints[positions[present]]
+    return result
+
+def _side_entries(facts: pd.DataFrame, source: str):
+    """
+    Key frame and entry frame for one source, one row per (event, account).
+    Later duplicates win, as in the old row-by-row parser.
+    """
+    side = facts[facts["source"] == source]
+    side = side.drop_duplicates(["coac_event_key", "account_key"], keep="last")
+    keys = side[["coac_event_key", "account_key"]].reset_index(drop=True)
+
+    entries = side.rename(columns={"source_row": "row_id"}).reindex(columns=ENTRY_FIELDS)
+    entries["row_id"] = entries["row_id"].astype("Int64")
+    # Python objects with None for missing values, matching the dicts the agents see.
+    entries = entries.astype(object)
+    entries = entries.where(entries.notna(), None).reset_index(drop=True)
+    return keys, entries
+
+def build_events(facts: pd.DataFrame, tolerances: dict = None) -> EventCollection:
+    """
+    Assemble the normalized facts into a columnar event/account table.
+
+    NBIM and Custody entries are joined on (coac_event_key, account_key) in a single
+    outer merge; events and accounts keep their first-appearance order. The mismatch
+    matrix is computed for all paired accounts at once (see mismatch_matrix).
+    """
+    facts = facts[facts["coac_event_key"].notna()].copy()
+    facts["account_key"] = facts["account_id"].fillna(NO_ACCOUNT_KEY).astype(str)
+    facts["event_code"] = facts.groupby("coac_event_key", sort=False).ngroup()
+    facts["account_code"] = facts.groupby(["coac_event_key", "account_key"], sort=False).ngroup()
+
+    order = facts[["coac_event_key", "account_key", "event_code", "account_code"]].drop_duplicates(["coac_event_key", "account_key"])
+
+    nbim_keys, nbim_entries = _side_entries(facts, "NBIM")
+    custody_keys, custody_entries = _side_entries(facts, "Custody")
+    nbim_keys["nbim_row"] = np.arange(len(nbim_keys))
+    custody_keys["custody_row"] = np.arange(len(custody_keys))
+
+    accounts = nbim_keys.merge(custody_keys, on=["coac_event_key", "account_key"], how="outer", sort=False)
+    accounts = accounts.merge(order, on=["coac_event_key", "account_key"], how="left")
+    accounts["nbim_row"] = accounts["nbim_row"].fillna(-1).astype(int)
+    accounts["custody_row"] = accounts["custody_row"].fillna(-1).astype(int)
+    accounts = accounts.sort_values(["event_code", "account_code"], kind="stable").reset_index(drop=True)
+
+    paired = ((accounts["nbim_row"] >= 0) & (accounts["custody_row"] >= 0)).to_numpy()
+    mismatches = pd.DataFrame(False, index=accounts.index, columns=COMPARABLE_FIELDS)
+    mismatches.loc[paired] = mismatch_matrix(
+        nbim_entries.iloc[accounts.loc[paired, "nbim_row"]],
+        custody_entries.iloc[accounts.loc[paired, "custody_row"]],
+        tolerances,
+    ).to_numpy()
+    # A missing side counts as one mismatch, like the missing_nbim/missing_custody entries.
+    accounts["mismatch_count"] = mismatches.sum(axis=1).to_numpy() + (~paired)
+    accounts["nbim_fingerprint"] = _fingerprints_at(side_fingerprints(nbim_entries), accounts["nbim_row"])
+    accounts["custody_fingerprint"] = _fingerprints_at(side_fingerprints(custody_entries), accounts["custody_row"])
+
+    return EventCollection(accounts, nbim_entries, custody_entries, mismatches)
+
+# ---------------------------
+# Main parser
+# ---------------------------
+def combine_facts(nbim: pd.DataFrame, custody: pd.DataFrame) -> pd.DataFrame:
+    """Stack normalized NBIM and Custody rows into one facts frame with normalized account ids."""
+    facts = pd.concat([nbim, custody], ignore_index=True)
+
+    # normalize account ids
+    facts["account_id"] = facts["account_id"].astype(str).str.strip()
+    facts.loc[facts["account_id"].isin(["", "nan", "none", "None"]), "account_id"] = None
+    return facts
+
+def parse_facts(facts: pd.DataFrame, tolerances: dict = None) -> EventCollection:
+    """Build the events from combined facts and print the field mismatches found."""
+    event_data = build_events(facts, tolerances)
+
+    for index in np.flatnonzero(event_data.event_mismatch_counts):
+        event = event_data[index]
         for account_key, account_values in event['accounts'].items():
             if account_values.get('mismatches'):
                 print(f"Field mismatches for event {event['coac_event_key']}, account {account_key}:")
                 for mismatch in account_values['mismatches']:
                     print(f"  {mismatch['field']}: {mismatch['nbim_value']} ≠ {mismatch['custody_value']}")
-            
-    # Return Python objects (easy to work with, and can be converted to JSON for LLM later)
     return event_data
 
+def parse_data(custody_raw: pd.DataFrame, nbim_raw: pd.DataFrame, tolerances: dict = None):
+    """
+    Main parser function.
+    - Normalizes data from both sources
+    - Adds mismatch analysis for comparable fields only
+    - Returns structured event data with full entry details for analysis
+
+    The returned EventCollection behaves like the list of event dicts the pipeline
+    iterates over; each event dict is built when it is accessed. `tolerances` overrides
+    FIELD_TOLERANCES per field.
+    """
+    nbim = normalize_nbim(nbim_raw)
+    custody = normalize_custody(custody_raw)
+    facts = combine_facts(nbim, custody)
+
+    event_data = parse_facts(facts, tolerances)
+
+    # Return Python objects (easy to work with, and can be converted to JSON for LLM later)
+    return event_data
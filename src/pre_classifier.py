@@ -0,0 +1,52 @@
+import numpy as np
+
+def event_mismatch_count(event: dict) -> int:
+    return sum(len(account_values.get("mismatches") or []) for account_values in event["accounts"].values())
+
+def pre_classify_events(event_data):
+    """Rule-based stage that runs before the LLM agents.
+
+    Events where no account has a mismatch (including a missing NBIM or Custody side)
+    are cleared without any agent call. Only events with mismatches are routed to the
+    EvidenceAnalystAgent -> CriticAgent -> ConclusionAgent chain.
+
+    Args:
+        event_data: EventCollection from parse_data, or a list of event dicts
+
+    Returns:
+        tuple: (events routed to the agents, keys of auto-cleared events, routing stats dict)
+    """
+    if hasattr(event_data, "event_mismatch_counts"):
+        # Columnar path: decide from the mismatch counts, build dicts for routed events only.
+        event_counts = event_data.event_mismatch_counts
+        routed_indices = np.flatnonzero(event_counts)
+        routed_events = [event_data[index] for index in routed_indices]
+        cleared_keys = [event_data.event_keys[index] for index in np.flatnonzero(event_counts == 0)]
+        account_counts = event_data.accounts["mismatch_count"].to_numpy()
+        total_accounts = len(account_counts)
+        clean_accounts = int((account_counts == 0).sum())
+    else:
+        routed_events, cleared_keys = [], []
+        total_accounts = clean_accounts = 0
+        for event in event_data:
+            if event_mismatch_count(event):
+                routed_events.append(event)
+            else:
+                cleared_keys.append(event["coac_event_key"])
+            total_accounts += len(event["accounts"])
+            clean_accounts += sum(1 for account_values in event["accounts"].values() if not account_values.get("mismatches"))
+
+    stats = {
+        "total_events": len(routed_events) + len(cleared_keys),
+        "auto_cleared_events": len(cleared_keys),
+        "agent_events": len(routed_events),
+        "total_accounts": total_accounts,
+        "clean_accounts": clean_accounts,
+    }
+    return routed_events, cleared_keys, stats
+
+def print_routing_stats(stats: dict):
+    print(f"---Pre-classification: {stats['total_events']} events, "
+          f"{stats['auto_cleared_events']} auto-cleared (no mismatches), "
+          f"{stats['agent_events']} routed to agents---")
+    print(f"---Accounts: {stats['clean_accounts']} of {stats['total_accounts']} fully matched---")
@@ -0,0 +1,102 @@
+from parse_data import COMPARABLE_FIELDS, ENTRY_FIELDS
+
+# ---------------------------
+# Prompt rendering helpers
+# ---------------------------
+# Entry fields that identify where a row sat in the delivered file. They carry no meaning
+# for the agents and change between deliveries, so they are left out of prompts to keep
+# identical events rendering to identical prompts (and hitting the response cache).
+VOLATILE_ENTRY_FIELDS = ("row_id",)
+
+# "full": every non-null field of both sides. "mismatched": only fields that differ.
+EVENT_DETAIL_LEVELS = ("full", "mismatched")
+
+def _format_value(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _account_rows(account_values: dict, detail: str) -> list:
+    """(field, nbim, custody, mismatched) rows for one account, nulls on both sides dropped."""
+    nbim_entry = account_values.get("NBIM") or {}
+    custody_entry = account_values.get("Custody") or {}
+    mismatched = {mismatch["field"] for mismatch in account_values.get("mismatches") or []}
+    fields = ENTRY_FIELDS if detail == "full" or not (nbim_entry and custody_entry) else COMPARABLE_FIELDS
+
+    rows = []
+    for field in fields:
+        if field in VOLATILE_ENTRY_FIELDS:
+            continue
+        is_mismatch = field in mismatched
+        if detail == "mismatched" and nbim_entry and custody_entry and not is_mismatch:
+            continue
+        nbim_value, custody_value = nbim_entry.get(field), custody_entry.get(field)
+        if nbim_value is None and custody_value is None:
+            continue
+        rows.append((field, _format_value(nbim_value), _format_value(custody_value), is_mismatch))
+    return rows
+
+def _format_rows(rows: list) -> list:
+    return [f"{'*' if is_mismatch else ' '} {field} | {nbim} | {custody}" for field, nbim, custody, is_mismatch in rows]
+
+def serialize_event(event: dict, detail: str = "full") -> str:
+    """Compact, token-efficient text rendering of an event for prompts.
+
+    Null fields are dropped and each account becomes a side-by-side field table; rows that are
+    identical on every account are listed once under "All accounts". Mismatched fields are
+    marked with "*", so the separate `mismatches` lists are not repeated.
+
+    Args:
+        event: Event dict from parse_data
+        detail: "full" for all non-null fields, "mismatched" for only the fields that differ
+    """
+    if detail not in EVENT_DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of {EVENT_DETAIL_LEVELS}, got {detail!r}")
+
+    accounts = event.get("accounts", {})
+    rows_by_account = {account_key: _account_rows(account_values, detail) for account_key, account_values in accounts.items()}
+
+    shared_rows = []
+    if len(rows_by_account) > 1:
+        account_row_sets = [set(rows) for rows in rows_by_account.values()]
+        first_rows = next(iter(rows_by_account.values()))
+        shared_rows = [row for row in first_rows if all(row in row_set for row_set in account_row_sets)]
+
+    lines = [f"coac_event_key: {event.get('coac_event_key')}",
+             "Columns: field | NBIM | Custody  (* = mismatch, - = missing)"]
+    if shared_rows:
+        lines.append(f"All accounts ({len(rows_by_account)}):")
+        lines.extend(_format_rows(shared_rows))
+
+    for account_key, account_values in accounts.items():
+        header = f"Account {account_key}:"
+        if not account_values.get("NBIM"):
+            header = f"Account {account_key}: MISSING IN NBIM"
+        elif not account_values.get("Custody"):
+            header = f"Account {account_key}: MISSING IN CUSTODY"
+        elif not account_values.get("mismatches"):
+            header = f"Account {account_key}: all comparable fields match"
+        lines.append(header)
+        lines.extend(_format_rows([row for row in rows_by_account[account_key] if row not in shared_rows]))
+    return "\n".join(lines)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), good enough to compare prompt sizes offline."""
+    return max(1, len(text) // 4)
+
+def count_prompt_tokens(text: str, model: str = "claude-sonnet-4-20250514") -> int:
+    """Exact input token count from the token counting endpoint (needs API access)."""
+    from llm_gateway import get_gateway
+    result = get_gateway().client.messages.count_tokens(model=model, messages=[{"role": "user", "content": text}])
+    return result.input_tokens
+
+def prompt_size_report(event: dict) -> dict:
+    """Estimated tokens for the raw event repr versus the compact renderings."""
+    return {
+        "coac_event_key": event.get("coac_event_key"),
+        "raw_repr_tokens": estimate_tokens(str(event)),
+        "full_tokens": estimate_tokens(serialize_event(event, "full")),
+        "mismatched_tokens": estimate_tokens(serialize_event(event, "mismatched")),
+    }
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".llm_cache")
+# messages.create arguments that only shape the HTTP exchange, not the response; all others are part of the key.
+TRANSPORT_ARGS = ("timeout", "extra_headers", "extra_query")
+
+# ---------------------------
+# Persistent response cache
+# ---------------------------
+class ResponseCache:
+    """Content-addressed on-disk cache of LLM responses.
+
+    Entries are keyed by a hash of every request argument but TRANSPORT_ARGS (model, max_tokens, fully
+    rendered messages, system, tools, tool_choice, temperature, ...) and stored
+    as one JSON file each. Entries older than `max_age_seconds` are ignored and removed;
+    when the cache grows past `max_bytes` the least recently used entries are evicted.
+    With `enabled=False` the cache is bypassed: nothing is read or written.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 500 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sizes = None  # path -> size in bytes, loaded on first use
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        """Key of the messages.create arguments `request`."""
+        request = {name: value for name, value in request.items() if name not in TRANSPORT_ARGS and value is not None}
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _index(self) -> dict:
+        if self._sizes is None:
+            self._sizes = {}
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        path = os.path.join(root, name)
+                        self._sizes[path] = os.path.getsize(path)
+        return self._sizes
+
+    def get(self, key: str):
+        """Cached response payload for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.max_age_seconds:
+                self._remove(path)
+                self.misses += 1
+                return None
+            with open(path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used for eviction
+        self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: dict):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # atomic, so readers never see partial entries
+        self._index()[path] = os.path.getsize(path)
+        if sum(self._sizes.values()) > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in list(self._index()):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                self._sizes.pop(path, None)
+                continue
+            if now - mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((mtime, path))
+
+        total = sum(self._sizes.values())
+        for _, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes.get(path, 0)
+            self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if self._sizes is not None:
+            self._sizes.pop(path, None)
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -1,10 +1,15 @@
 import pandas as pd
-import anthropic
-import os
 import json
+from llm_gateway import get_gateway
+from prompt_format import serialize_event
 
 # BACKUP: Original single-agent implementation kept for reference
 class SimpleClassifierAgent:
+    model = "claude-sonnet-4-20250514"
+    max_tokens = 2000
+    event_detail = "full"
+    stage = "simple_classifier"
+
     def __init__(self, event: dict):
         self.event = event
         self.return_format = """
@@ -35,17 +40,21 @@ class SimpleClassifierAgent:
         {return_format}
 
         The coac event you are reconciling is:
-        {event}
+        {serialize_event(event, self.event_detail)}
         """
         return prompt
 
 
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
     def run(self):
         try:
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
+            response = get_gateway().create_message(
+                tags=self.call_tags(),
+                model=self.model,
+                max_tokens=self.max_tokens,
                 messages=[
                     {"role": "user", "content": self.system_prompt},  # System input.
                     {"role": "assistant", "content": "{"}  # Prefill first token of JSON format.
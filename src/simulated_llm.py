@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+
+import anthropic
+
+from llm_gateway import LLMGateway
+from prompt_format import estimate_tokens
+from structured_output import CONTINUATION_MARKER
+
+# Mean wall time per call by stage, roughly what the live API takes for these prompts.
+STAGE_LATENCY_SECONDS = {
+    "evidence": 9.0,
+    "evidence_reduce": 8.0,
+    "critic": 5.0,
+    "conclusion": 6.0,
+    "consequence": 12.0,
+    "simple_classifier": 6.0,
+    "triage": 2.0,
+}
+# Phrases that identify each agent's prompt, checked in order: an analyst revision prompt
+# quotes the critic, so the analyst is matched first.
+STAGE_MARKERS = (
+    ("evidence", "evidence-gathering phase"),
+    ("evidence_reduce", "merging the findings"),
+    ("critic", "evaluator critic agent"),
+    ("conclusion", "conclusion phase"),
+    ("consequence", "have already been calculated"),
+    ("simple_classifier", "identifying issues in reconciliation"),
+    ("triage", "first-pass triage"),
+)
+# (field named in the prompt, classification), first match wins.
+CLASSIFICATIONS = (
+    ("MISSING IN", "Missing booking"),
+    ("withholding_rate", "Withholding tax rate difference"),
+    ("gross_amount", "Position or securities lending difference"),
+    ("pay_date", "Payment date difference"),
+    ("settlement_net_amount", "FX rate difference"),
+)
+
+def prompt_stage(prompt: str) -> str:
+    """The agent stage a prompt belongs to, recognized from STAGE_MARKERS."""
+    for stage, marker in STAGE_MARKERS:
+        if marker in prompt:
+            return stage
+    return "unknown"
+
+# ---------------------------
+# Simulated model
+# ---------------------------
+class SimulatedLLM:
+    """Answers agent prompts with well-formed replies after a simulated delay, no API involved.
+
+    The stage is recognized from the prompt (STAGE_MARKERS). Delays are log-normal around
+    STAGE_LATENCY_SECONDS times `latency_scale`. Replies are deterministic per prompt and
+    `seed`: the critic approves about `approval_rate` of analyses, and the conclusion
+    classifies from the fields the prompt names. Triage reports a uniform confidence in
+    [0.5, 1] and gets the classification wrong with probability 1 - confidence. Token usage
+    is estimated from the text.
+
+    A request that forces a tool (tool_choice) is answered with a tool_use block holding the
+    reply. With probability `truncation_rate` a reply stops at max_tokens: a tool call then
+    loses its last field and the end of the one before it, a text reply is cut mid-way.
+    Continuation requests (structured_output.py) are never truncated.
+    """
+
+    def __init__(self, latency_scale: float = 1.0, latency_sigma: float = 0.4, approval_rate: float = 0.6, seed: int = 0,
+                 truncation_rate: float = 0.0):
+        self.latency_scale = latency_scale
+        self.latency_sigma = latency_sigma
+        self.approval_rate = approval_rate
+        self.seed = seed
+        self.truncation_rate = truncation_rate
+
+    def _random(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big") ^ self.seed)
+
+    def latency(self, stage: str, rng: random.Random) -> float:
+        mean = STAGE_LATENCY_SECONDS.get(stage, 5.0) * self.latency_scale
+        return mean * math.exp(self.latency_sigma * rng.gauss(0.0, 1.0) - self.latency_sigma ** 2 / 2)
+
+    def _body(self, stage: str, prompt: str, rng: random.Random) -> dict:
+        event_keys = re.findall(r"Event Key: (\d+)", prompt)
+        if stage in ("evidence", "evidence_reduce"):
+            return {"evidence": ["NBIM and Custody differ on the flagged fields"],
+                    "hypothesis": "The difference comes from one side's booking parameters"}
+        if stage == "critic":
+            return {"feedback_string_to_evidence_analyst_agent": "Quantify the difference per account.",
+                    "approved": rng.random() < self.approval_rate}
+        if stage == "consequence":
+            return {"consequences": [{"coac_event_key": key, "consequence": "Cash difference until corrected."}
+                                     for key in event_keys]}
+        classification = next((label for field, label in CLASSIFICATIONS if field in prompt), "Other difference")
+        body = {"evidence": ["NBIM and Custody differ on the flagged fields"], "is_break": True,
+                "classification": classification, "brief_summary_of_root_cause": classification}
+        if stage == "triage":
+            body["confidence"] = round(rng.uniform(0.5, 1.0), 2)
+            if rng.random() > body["confidence"]:
+                body["classification"] = "Other difference"
+        return body
+
+    @staticmethod
+    def _truncated(body: dict) -> dict:
+        """The fields a tool call cut off at max_tokens streamed in full: all but the last,
+        with the one before it cut short when it is a string or a list."""
+        fields = list(body.items())[:-1]
+        if fields:
+            name, value = fields[-1]
+            if isinstance(value, (str, list)):
+                fields[-1] = (name, value[:len(value) // 2])
+        return dict(fields)
+
+    def respond(self, model: str, messages: list, tools: list = None, tool_choice: dict = None, **kwargs):
+        """Returns (Message, delay in seconds) for one messages.create call."""
+        prompt = messages[0]["content"]
+        rng = self._random(prompt)
+        stage = prompt_stage(prompt)
+        body = self._body(stage, prompt, rng)
+        truncated = self.truncation_rate > 0 and CONTINUATION_MARKER not in prompt and rng.random() < self.truncation_rate
+        if tool_choice and tool_choice.get("type") == "tool":
+            properties = next((tool["input_schema"].get("properties", {}) for tool in tools or []
+                               if tool["name"] == tool_choice["name"]), {})
+            body = {name: value for name, value in body.items() if name in properties}
+            if truncated:
+                body = self._truncated(body)
+            content = [{"type": "tool_use", "id": "toolu_simulated", "name": tool_choice["name"], "input": body}]
+            text = json.dumps(body)
+        else:
+            text = json.dumps(body)
+            # The agents prefill "{" as the assistant turn, so the reply continues after it.
+            if messages[-1]["role"] == "assistant":
+                text = text[len(messages[-1]["content"]):]
+            if truncated:
+                text = text[:len(text) * 2 // 3]
+            content = [{"type": "text", "text": text}]
+        response = anthropic.types.Message(
+            id="msg_simulated", type="message", role="assistant", model=model, content=content,
+            stop_reason="max_tokens" if truncated else ("tool_use" if tool_choice else "end_turn"), stop_sequence=None,
+            usage={"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)},
+        )
+        return response, self.latency(stage, rng)
+
+class _SimulatedMessages:
+    def __init__(self, llm: SimulatedLLM):
+        self.llm = llm
+
+    def create(self, **kwargs):
+        response, delay = self.llm.respond(**kwargs)
+        time.sleep(delay)
+        return response
+
+class _SimulatedAsyncMessages:
+    def __init__(self, llm: SimulatedLLM):
+        self.llm = llm
+
+    async def create(self, **kwargs):
+        response, delay = self.llm.respond(**kwargs)
+        await asyncio.sleep(delay)
+        return response
+
+class SimulatedAnthropic:
+    """Stands in for anthropic.Anthropic in LLMGateway(client=...)."""
+
+    def __init__(self, llm: SimulatedLLM):
+        self.messages = _SimulatedMessages(llm)
+
+class SimulatedAsyncAnthropic:
+    """Stands in for anthropic.AsyncAnthropic in LLMGateway(async_client=...)."""
+
+    def __init__(self, llm: SimulatedLLM):
+        self.messages = _SimulatedAsyncMessages(llm)
+
+def simulated_gateway(**kwargs) -> LLMGateway:
+    """LLMGateway whose sync and async clients are a SimulatedLLM(**kwargs). No response cache."""
+    llm = SimulatedLLM(**kwargs)
+    return LLMGateway(client=SimulatedAnthropic(llm), async_client=SimulatedAsyncAnthropic(llm))
@@ -0,0 +1,231 @@
+import json
+
+from llm_gateway import get_gateway
+
+# Follow-up requests for fields a reply was missing, per agent call.
+MAX_CONTINUATIONS = 2
+# Starts the note appended to the prompt of a continuation request.
+CONTINUATION_MARKER = "Your previous answer was cut off or incomplete."
+CONTINUATION_NOTE = CONTINUATION_MARKER + """
+        These fields were received and are kept: {received}
+        Provide only the missing fields: {fields}
+        """
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool, "number": (int, float), "integer": int}
+
+class StructuredOutputError(ValueError):
+    """A reply that, even after continuation requests, lacks required fields."""
+
+def output_tool(name: str, schema: dict) -> dict:
+    """messages.create arguments that make the model answer by calling tool `name`, whose
+    input must match `schema`. The reply is then a tool_use block with the parsed input."""
+    return {
+        "tools": [{"name": name, "description": "Record your answer in this structure.", "input_schema": schema}],
+        "tool_choice": {"type": "tool", "name": name},
+    }
+
+# ---------------------------
+# Partial JSON
+# ---------------------------
+def _closers(stack: tuple) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+class StreamingJSONParser:
+    """Incremental parser for a JSON object that may be cut off or slightly malformed.
+
+    feed() text as it arrives; anything before the first "{" (prose, a code fence) and
+    after the object closes is ignored. value() returns the object if it is complete and
+    valid, otherwise the largest prefix that can be closed into valid JSON: an open string
+    is closed, a dangling key or half-written literal is dropped, open arrays and objects
+    are closed. truncated_keys() names the top-level field that was still being written.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # (index, open containers): the text can be cut at index and closed with those containers
+        self._cuts = []
+        self._salvaged = None  # (value, cut depth) of the last value() call
+
+    def feed(self, chunk: str):
+        if self.done:
+            return
+        if not self.text:
+            start = chunk.find("{")
+            if start < 0:
+                return
+            chunk = chunk[start:]
+        base = len(self.text)
+        self.text += chunk
+        self._salvaged = None
+        for offset, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            index = base + offset
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+                self._cuts.append((index + 1, tuple(self._stack)))
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._cuts.append((index + 1, tuple(self._stack)))
+                if not self._stack:
+                    self.done = True
+                    self.text = self.text[:index + 1]
+                    return
+            elif char == ",":
+                self._cuts.append((index, tuple(self._stack)))
+
+    def _candidates(self):
+        """(text, depth of the cut; None = nothing dropped), most complete first."""
+        tail = '"' if self._in_string and not self.done else ""
+        yield self.text + tail + _closers(tuple(self._stack)), None
+        for index, stack in reversed(self._cuts):
+            yield self.text[:index] + _closers(stack), len(stack)
+
+    def _salvage(self):
+        if self._salvaged is None:
+            self._salvaged = (None, 0)
+            for candidate, depth in self._candidates():
+                try:
+                    value = json.loads(candidate)
+                except ValueError:
+                    continue
+                if isinstance(value, dict):
+                    self._salvaged = (value, depth)
+                    break
+        return self._salvaged
+
+    def value(self):
+        """The object parsed so far (best effort), or None when nothing is salvageable."""
+        return self._salvage()[0]
+
+    def truncated_keys(self) -> list:
+        """[top-level key whose value was cut off], or [] when the object was complete."""
+        value, depth = self._salvage()
+        if self.done or not value:
+            return []
+        # Cut inside the last field's value (or nothing dropped at all): that field is incomplete.
+        if depth is None or depth > 1:
+            return [list(value)[-1]]
+        return []
+
+# ---------------------------
+# Replies
+# ---------------------------
+def missing_fields(value: dict, schema: dict) -> list:
+    """Required top-level fields of `schema` that are absent or of the wrong type."""
+    properties = schema.get("properties", {})
+    missing = []
+    for name in schema.get("required", []):
+        expected = _JSON_TYPES.get(properties.get(name, {}).get("type"))
+        present = name in value
+        if present and expected is not None:
+            present = isinstance(value[name], expected) and not (expected is not bool and isinstance(value[name], bool))
+        if not present:
+            missing.append(name)
+    return missing
+
+def structured_value(message, schema: dict):
+    """(fields found, required fields missing or cut off) of a reply.
+
+    Takes the input of a tool_use block, or salvages a JSON object from the reply text.
+    When the reply hit max_tokens, the last field of a tool call counts as cut off too.
+    """
+    truncated = getattr(message, "stop_reason", None) == "max_tokens"
+    value, cut_off = None, []
+    for block in message.content:
+        if block.type == "tool_use":
+            value = dict(block.input) if isinstance(block.input, dict) else {}
+            cut_off = [list(value)[-1]] if truncated and value else []
+            break
+    else:
+        parser = StreamingJSONParser()
+        parser.feed("".join(block.text for block in message.content if block.type == "text"))
+        value, cut_off = parser.value() or {}, parser.truncated_keys()
+    missing = missing_fields(value, schema)
+    missing += [name for name in cut_off if name in schema.get("properties", {}) and name not in missing]
+    return value, missing
+
+def continuation_params(params: dict, schema: dict, value: dict, missing: list) -> dict:
+    """A follow-up to `params` that asks only for the `missing` fields, with the received ones quoted."""
+    sub_schema = {
+        "type": "object",
+        "properties": {name: schema["properties"][name] for name in missing},
+        "required": list(missing),
+    }
+    received = {name: field for name, field in value.items() if name not in missing}
+    prompt = params["messages"][0]["content"] + CONTINUATION_NOTE.format(
+        received=json.dumps(received, ensure_ascii=False, default=str), fields=", ".join(missing))
+    return {**params, "messages": [{"role": "user", "content": prompt}],
+            **output_tool(params["tool_choice"]["name"], sub_schema)}
+
+def _merge(value: dict, missing: list, message, params: dict) -> list:
+    """Add the fields a continuation reply provides to `value`; returns the fields still missing."""
+    sub_schema = params["tools"][0]["input_schema"]
+    found, still_missing = structured_value(message, sub_schema)
+    for name in missing:
+        if name in found and name not in still_missing:
+            value[name] = found[name]
+    return [name for name in missing if name not in found or name in still_missing]
+
+def _continuation_tags(agent) -> dict:
+    return {**agent.call_tags(), "stage": f"{agent.stage}_continuation"}
+
+def complete_structured(agent, message) -> dict:
+    """The agent's fields from reply `message`, validated against agent.output_schema.
+
+    Fields that are missing or were cut off at max_tokens are asked for in up to
+    MAX_CONTINUATIONS follow-up calls through the gateway (tagged "<stage>_continuation"
+    in the call log), each requesting only those fields instead of repeating the whole
+    request. Raises StructuredOutputError if they are still missing after that.
+    """
+    gateway = get_gateway()
+    params = agent.request_params()
+    value, missing = structured_value(message, agent.output_schema)
+    for _ in range(MAX_CONTINUATIONS):
+        if not missing:
+            break
+        print(f"Incomplete {agent.stage} reply, asking for the missing fields only: {', '.join(missing)}")
+        follow_up = continuation_params(params, agent.output_schema, value, missing)
+        missing = _merge(value, missing, gateway.create_message(tags=_continuation_tags(agent), **follow_up), follow_up)
+    if missing:
+        raise StructuredOutputError(f"Reply is missing or cut off in: {', '.join(missing)}")
+    return value
+
+async def complete_structured_async(agent, message) -> dict:
+    """Async version of complete_structured."""
+    gateway = get_gateway()
+    params = agent.request_params()
+    value, missing = structured_value(message, agent.output_schema)
+    for _ in range(MAX_CONTINUATIONS):
+        if not missing:
+            break
+        print(f"Incomplete {agent.stage} reply, asking for the missing fields only: {', '.join(missing)}")
+        follow_up = continuation_params(params, agent.output_schema, value, missing)
+        response = await gateway.create_message_async(tags=_continuation_tags(agent), **follow_up)
+        missing = _merge(value, missing, response, follow_up)
+    if missing:
+        raise StructuredOutputError(f"Reply is missing or cut off in: {', '.join(missing)}")
+    return value
+
+def request_structured(agent) -> dict:
+    """Call the agent's request_params() and return its validated fields (see complete_structured)."""
+    response = get_gateway().create_message(tags=agent.call_tags(), **agent.request_params())
+    return complete_structured(agent, response)
+
+async def request_structured_async(agent) -> dict:
+    """Async version of request_structured."""
+    response = await get_gateway().create_message_async(tags=agent.call_tags(), **agent.request_params())
+    return await complete_structured_async(agent, response)
@@ -0,0 +1,223 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Reference data
+# ---------------------------
+# (description, ISIN prefix, ticker suffix, quotation currency, settlement currency, portfolio FX rate,
+#  settlement FX rate (quotation per settlement unit), withholding tax %, custodian)
+MARKETS = [
+    ("INC", "US", "US", "USD", "USD", 11.2345, 1.0, 15, "JPMORGAN_CHASE"),
+    ("CO LTD", "KR", "KS", "KRW", "USD", 0.008234, 1307.25, 22, "HSBC_KOREA"),
+    ("SA", "CH", "SW", "CHF", "CHF", 12.4567, 1.0, 35, "UBS_SWITZERLAND"),
+    ("PLC", "GB", "LN", "GBP", "GBP", 13.6421, 1.0, 0, "CITI_LONDON"),
+    ("AG", "DE", "GY", "EUR", "EUR", 11.7832, 1.0, 26, "DEUTSCHE_BANK"),
+    ("KK", "JP", "JT", "JPY", "USD", 0.0742, 151.4, 15, "MUFG_JAPAN"),
+]
+NBIM_COLUMNS = [
+    "COAC_EVENT_KEY", "INSTRUMENT_DESCRIPTION", "ISIN", "SEDOL", "TICKER", "ORGANISATION_NAME",
+    "DIVIDENDS_PER_SHARE", "EXDATE", "PAYMENT_DATE", "CUSTODIAN", "BANK_ACCOUNT", "QUOTATION_CURRENCY",
+    "SETTLEMENT_CURRENCY", "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO", "NOMINAL_BASIS", "GROSS_AMOUNT_QUOTATION",
+    "NET_AMOUNT_QUOTATION", "NET_AMOUNT_SETTLEMENT", "GROSS_AMOUNT_PORTFOLIO", "NET_AMOUNT_PORTFOLIO",
+    "WTHTAX_COST_QUOTATION", "WTHTAX_COST_SETTLEMENT", "WTHTAX_COST_PORTFOLIO", "WTHTAX_RATE",
+    "LOCALTAX_COST_QUOTATION", "LOCALTAX_COST_SETTLEMENT", "TOTAL_TAX_RATE", "EXRESPRDIV_COST_QUOTATION",
+    "EXRESPRDIV_COST_SETTLEMENT", "RESTITUTION_RATE",
+]
+CUSTODY_COLUMNS = [
+    "COAC_EVENT_KEY", "ISIN", "EVENT_EX_DATE", "EVENT_PAYMENT_DATE", "CUSTODY", "SEDOL", "CUSTODIAN",
+    "EVENT_TYPE", "NOMINAL_BASIS", "LOAN_QUANTITY", "HOLDING_QUANTITY", "LENDING_PERCENTAGE", "BANK_ACCOUNTS",
+    "EX_DATE", "RECORD_DATE", "PAY_DATE", "CURRENCIES", "DIV_RATE", "TAX_RATE", "GROSS_AMOUNT", "NET_AMOUNT_QC",
+    "TAX", "NET_AMOUNT_SC", "SETTLED_CURRENCY", "IS_CROSS_CURRENCY_REVERSAL", "FX_RATE",
+    "POSSIBLE_RESTITUTION_PAYMENT", "POSSIBLE_RESTITUTION_AMOUNT", "ADR_FEE", "ADR_FEE_RATE",
+]
+# Break types that can be injected into an event's Custody rows.
+BREAK_TYPES = ("tax_rate", "fx", "quantity_lending", "missing_side", "date")
+CUSTODY_FILE_NAME = "CUSTODY_Dividend_Bookings 1.csv"
+NBIM_FILE_NAME = "NBIM_Dividend_Bookings 1.csv"
+
+# ---------------------------
+# Generator
+# ---------------------------
+def _dates(days: np.ndarray) -> np.ndarray:
+    """dd.mm.yyyy strings for day offsets from 2025-01-02; each distinct day is formatted once."""
+    labels = pd.date_range("2025-01-02", periods=int(days.max(initial=0)) + 1, freq="D").strftime("%d.%m.%Y").to_numpy()
+    return labels[days]
+
+def generate_bookings(events: int = 1000, accounts_per_event: tuple = (1, 4), break_rate: float = 0.3,
+                      break_types: tuple = BREAK_TYPES, seed: int = 0):
+    """
+    Synthetic NBIM and Custody bookings with the same columns as the delivered files.
+    Events without an injected break match on every comparable field.
+
+    Each event gets between accounts_per_event[0] and accounts_per_event[1] accounts. A
+    `break_rate` share of events gets one break, of a type drawn from `break_types`, on
+    all of its accounts:
+    - tax_rate: Custody applies a different withholding rate
+    - fx: Custody settles a cross-currency event at a different FX rate
+    - quantity_lending: part of the position is on loan, Custody pays on the holding
+    - missing_side: the event is only booked on one side
+    - date: Custody has a later payment date
+
+    Returns:
+        tuple: (custody_df, nbim_df, injected breaks as a frame of coac_event_key, break_type)
+    """
+    rng = np.random.default_rng(seed)
+    unknown = set(break_types) - set(BREAK_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown break types: {sorted(unknown)}")
+
+    # One row per event
+    event_keys = 900_000_000 + np.arange(events) * 7
+    market = rng.integers(0, len(MARKETS), events)
+    account_counts = rng.integers(accounts_per_event[0], accounts_per_event[1] + 1, events)
+    ex_day = rng.integers(0, 330, events)
+    pay_day = ex_day + rng.integers(3, 45, events)
+    dividend_rate = np.round(rng.uniform(0.05, 5.0, events), 4)
+    broken = (rng.random(events) < break_rate) & bool(break_types)
+    break_type = np.where(broken, rng.choice(np.array(break_types or ("",), dtype=object), events), None)
+
+    # One row per account, repeating the event columns
+    rows = np.repeat(np.arange(events), account_counts)
+    reference = pd.DataFrame(MARKETS, columns=["suffix", "country", "exchange", "currency", "settlement_currency",
+                                               "portfolio_fx", "settlement_fx", "tax_rate", "custodian"])
+    ref = reference.iloc[market[rows]].reset_index(drop=True)
+    key = event_keys[rows]
+    kind = break_type[rows]
+    rate = dividend_rate[rows]
+    quantity = rng.integers(1, 200, len(rows)) * 1000
+    account = 500_000_000 + rng.choice(400_000_000, len(rows), replace=False) if len(rows) else np.array([], dtype=int)
+    sedol = 1_000_000 + key % 8_999_999
+    isin = ref["country"] + pd.Series(key).astype(str).str.zfill(10).to_numpy()
+    name = "COMPANY " + pd.Series(key).astype(str).to_numpy() + " " + ref["suffix"]
+
+    tax = ref["tax_rate"].to_numpy(dtype=float)
+    gross = np.round(quantity * rate, 2)
+    wht = np.round(gross * tax / 100, 2)
+    net = gross - wht
+    fx = ref["settlement_fx"].to_numpy(dtype=float)
+    portfolio_fx = ref["portfolio_fx"].to_numpy(dtype=float)
+
+    nbim = pd.DataFrame({
+        "COAC_EVENT_KEY": key,
+        "INSTRUMENT_DESCRIPTION": name.str.upper(),
+        "ISIN": isin,
+        "SEDOL": sedol,
+        "TICKER": "T" + pd.Series(key % 100_000).astype(str).to_numpy() + " " + ref["exchange"],
+        "ORGANISATION_NAME": name,
+        "DIVIDENDS_PER_SHARE": rate,
+        "EXDATE": _dates(ex_day[rows]),
+        "PAYMENT_DATE": _dates(pay_day[rows]),
+        "CUSTODIAN": ref["custodian"],
+        "BANK_ACCOUNT": account,
+        "QUOTATION_CURRENCY": ref["currency"],
+        "SETTLEMENT_CURRENCY": ref["settlement_currency"],
+        "AVG_FX_RATE_QUOTATION_TO_PORTFOLIO": portfolio_fx,
+        "NOMINAL_BASIS": quantity,
+        "GROSS_AMOUNT_QUOTATION": gross,
+        "NET_AMOUNT_QUOTATION": net,
+        "NET_AMOUNT_SETTLEMENT": np.round(net / fx, 2),
+        "GROSS_AMOUNT_PORTFOLIO": np.round(gross * portfolio_fx, 2),
+        "NET_AMOUNT_PORTFOLIO": np.round(net * portfolio_fx, 2),
+        "WTHTAX_COST_QUOTATION": wht,
+        "WTHTAX_COST_SETTLEMENT": np.round(wht / fx, 2),
+        "WTHTAX_COST_PORTFOLIO": np.round(wht * portfolio_fx, 2),
+        "WTHTAX_RATE": tax,
+        "LOCALTAX_COST_QUOTATION": 0,
+        "LOCALTAX_COST_SETTLEMENT": 0,
+        "TOTAL_TAX_RATE": tax,
+        "EXRESPRDIV_COST_QUOTATION": 0,
+        "EXRESPRDIV_COST_SETTLEMENT": 0,
+        "RESTITUTION_RATE": 0,
+    }, columns=NBIM_COLUMNS)
+
+    # Custody starts as the matching booking, then the injected breaks are applied.
+    custody_tax = np.where(kind == "tax_rate", np.where(tax >= 5, tax - 5, tax + 10), tax)
+    custody_fx = np.where(kind == "fx", np.round(fx * rng.uniform(1.002, 1.02, len(rows)), 6), fx)
+    cross_currency = (ref["currency"] != ref["settlement_currency"]).to_numpy()
+    loan = np.where(kind == "quantity_lending", (quantity * rng.uniform(0.02, 0.15, len(rows))).round(-2), 0)
+    holding = quantity - loan
+    custody_gross = np.round(holding * rate, 2)
+    custody_wht = np.round(custody_gross * custody_tax / 100, 2)
+    custody_net = custody_gross - custody_wht
+    ex_dates = _dates(ex_day[rows])
+    pay_dates = _dates(pay_day[rows] + np.where(kind == "date", rng.integers(1, 10, len(rows)), 0))
+
+    custody = pd.DataFrame({
+        "COAC_EVENT_KEY": key,
+        "ISIN": isin,
+        "EVENT_EX_DATE": ex_dates,
+        "EVENT_PAYMENT_DATE": _dates(pay_day[rows]),
+        "CUSTODY": account,
+        "SEDOL": sedol,
+        "CUSTODIAN": ref["custodian"],
+        "EVENT_TYPE": "DVCA",
+        "NOMINAL_BASIS": quantity,
+        "LOAN_QUANTITY": loan,
+        "HOLDING_QUANTITY": holding,
+        "LENDING_PERCENTAGE": np.round(loan / quantity * 100).astype(int),
+        "BANK_ACCOUNTS": account,
+        "EX_DATE": ex_dates,
+        "RECORD_DATE": _dates(ex_day[rows] + 1),
+        "PAY_DATE": pay_dates,
+        "CURRENCIES": ref["currency"],
+        "DIV_RATE": rate,
+        "TAX_RATE": custody_tax,
+        "GROSS_AMOUNT": custody_gross,
+        "NET_AMOUNT_QC": custody_net,
+        "TAX": custody_wht,
+        "NET_AMOUNT_SC": np.round(custody_net / custody_fx, 2),
+        "SETTLED_CURRENCY": ref["settlement_currency"],
+        "IS_CROSS_CURRENCY_REVERSAL": np.where(cross_currency, "TRUE", "FALSE"),
+        "FX_RATE": custody_fx,
+        "POSSIBLE_RESTITUTION_PAYMENT": 0,
+        "POSSIBLE_RESTITUTION_AMOUNT": 0,
+        "ADR_FEE": 0,
+        "ADR_FEE_RATE": 0,
+    }, columns=CUSTODY_COLUMNS)
+
+    # missing_side: drop the event from NBIM or Custody, alternating
+    missing = kind == "missing_side"
+    drop_nbim = missing & (key % 2 == 0)
+    drop_custody = missing & ~drop_nbim
+    nbim = nbim[~drop_nbim].reset_index(drop=True)
+    custody = custody[~drop_custody].reset_index(drop=True)
+
+    injected = pd.DataFrame({"coac_event_key": event_keys[broken], "break_type": break_type[broken]})
+    return custody, nbim, injected
+
+def write_bookings(out_dir: str, **kwargs) -> tuple:
+    """Generate bookings (see generate_bookings) and write them like the delivered files.
+
+    Returns:
+        tuple: (custody path, NBIM path, injected breaks frame)
+    """
+    custody, nbim, injected = generate_bookings(**kwargs)
+    os.makedirs(out_dir, exist_ok=True)
+    custody_path = os.path.join(out_dir, CUSTODY_FILE_NAME)
+    nbim_path = os.path.join(out_dir, NBIM_FILE_NAME)
+    custody.to_csv(custody_path, sep=";", index=False, encoding="utf-8-sig")
+    nbim.to_csv(nbim_path, sep=";", index=False, encoding="utf-8-sig")
+    injected.to_csv(os.path.join(out_dir, "injected_breaks.csv"), sep=";", index=False)
+    return custody_path, nbim_path, injected
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic NBIM/Custody dividend bookings.")
+    parser.add_argument("out_dir", help="Directory for the two bookings files and injected_breaks.csv")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--min-accounts", type=int, default=1)
+    parser.add_argument("--max-accounts", type=int, default=4)
+    parser.add_argument("--break-rate", type=float, default=0.3, help="Share of events with an injected break")
+    parser.add_argument("--break-types", nargs="+", default=list(BREAK_TYPES), choices=BREAK_TYPES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    custody_path, nbim_path, injected = write_bookings(
+        args.out_dir, events=args.events, accounts_per_event=(args.min_accounts, args.max_accounts),
+        break_rate=args.break_rate, break_types=tuple(args.break_types), seed=args.seed,
+    )
+    print(f"Wrote {custody_path} and {nbim_path} ({args.events} events, {len(injected)} with injected breaks)")
+
+if __name__ == "__main__":
+    main()
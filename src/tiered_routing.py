@@ -0,0 +1,140 @@
+import hashlib
+import statistics
+
+# Triage answers below this confidence go to the full agent chain.
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+# Materiality priorities (see materiality.py) that always get the full chain.
+DEFAULT_ESCALATE_PRIORITIES = ("High",)
+
+# ---------------------------
+# Tiered routing
+# ---------------------------
+def _normalized(classification) -> str:
+    return " ".join(str(classification or "").lower().split())
+
+class TieredRouter:
+    """Decides which events the triage model may conclude on its own.
+
+    Events whose materiality priority is in `escalate_priorities` go straight to the full
+    EvidenceAnalyst -> Critic -> Conclusion chain. Every other event is triaged first
+    (TriageAgent) and escalated when the triage call failed or its confidence is below
+    `confidence_threshold`.
+
+    Agreement with the full chain is measured on escalated events that were triaged (both
+    answers exist anyway) and on a deterministic `audit_rate` share of the accepted events,
+    which are also run through the full chain. The triage answer is still what the run uses
+    for those; audit_rate=1.0 compares the two tiers on all of the data.
+    """
+
+    def __init__(self, confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
+                 escalate_priorities: tuple = DEFAULT_ESCALATE_PRIORITIES, audit_rate: float = 0.0):
+        self.confidence_threshold = confidence_threshold
+        self.escalate_priorities = escalate_priorities
+        self.audit_rate = audit_rate
+        self.priorities = {}
+        # event key -> {"route", "reason", "triaged", "confidence", "seconds", "chain_seconds"}
+        self.routes = {}
+        # event key -> {"route", "break_agrees", "classification_agrees"}
+        self.comparisons = {}
+
+    def set_priorities(self, priorities):
+        """{event key: "High"/"Medium"/"Low"} (a dict or a Series, e.g. materiality["priority"])."""
+        self.priorities = {str(key): priority for key, priority in dict(priorities).items()}
+
+    def escalate_before_triage(self, event_key):
+        """Reason to skip triage and run the full chain, or None."""
+        if self.priorities.get(str(event_key)) in self.escalate_priorities:
+            return "high_materiality"
+        return None
+
+    def escalate_after_triage(self, triage: dict):
+        """Reason to run the full chain after triage, or None to accept the triage answer."""
+        if triage.get("status") == "failed":
+            return "triage_failed"
+        if triage.get("confidence", 0.0) < self.confidence_threshold:
+            return "low_confidence"
+        return None
+
+    def should_audit(self, event_key) -> bool:
+        digest = hashlib.sha256(str(event_key).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64 < self.audit_rate
+
+    def record_route(self, event_key, triage: dict, reason, seconds: float, chain_seconds: float = None):
+        """One routed event: reason None means the triage answer was accepted."""
+        self.routes[str(event_key)] = {
+            "route": "triage" if reason is None else "full_chain",
+            "reason": reason,
+            "triaged": triage is not None,
+            "confidence": triage.get("confidence") if triage else None,
+            "seconds": seconds,
+            "chain_seconds": chain_seconds,
+        }
+
+    def record_comparison(self, event_key, triage: dict, conclusion: dict, chain_seconds: float = None):
+        """Triage answer vs the full chain's conclusion for the same event."""
+        if triage.get("status") == "failed" or not conclusion or conclusion.get("status") == "failed":
+            return
+        route = self.routes.get(str(event_key), {})
+        if chain_seconds is not None and route.get("chain_seconds") is None:
+            route["chain_seconds"] = chain_seconds
+        self.comparisons[str(event_key)] = {
+            "route": route.get("route", "full_chain"),
+            "break_agrees": bool(triage.get("is_break")) == bool(conclusion.get("is_break")),
+            "classification_agrees": _normalized(triage.get("classification")) == _normalized(conclusion.get("classification")),
+        }
+
+    def summary(self) -> dict:
+        routes = list(self.routes.values())
+        reasons = {}
+        for route in routes:
+            if route["reason"] is not None:
+                reasons[route["reason"]] = reasons.get(route["reason"], 0) + 1
+
+        def median(values):
+            values = [value for value in values if value is not None]
+            return statistics.median(values) if values else None
+
+        def agreement(comparisons):
+            if not comparisons:
+                return {"compared": 0}
+            return {
+                "compared": len(comparisons),
+                "is_break_agreement": sum(c["break_agrees"] for c in comparisons) / len(comparisons),
+                "classification_agreement": sum(c["classification_agrees"] for c in comparisons) / len(comparisons),
+            }
+
+        comparisons = list(self.comparisons.values())
+        return {
+            "events": len(routes),
+            "triaged": sum(1 for route in routes if route["triaged"]),
+            "accepted": sum(1 for route in routes if route["route"] == "triage"),
+            "escalated": sum(1 for route in routes if route["route"] == "full_chain"),
+            "escalation_reasons": reasons,
+            "median_event_seconds": median(route["seconds"] for route in routes),
+            "median_accepted_seconds": median(route["seconds"] for route in routes if route["route"] == "triage"),
+            "median_escalated_seconds": median(route["seconds"] for route in routes if route["route"] == "full_chain"),
+            "median_full_chain_seconds": median(route["chain_seconds"] for route in routes),
+            "agreement": agreement(comparisons),
+            "agreement_accepted": agreement([c for c in comparisons if c["route"] == "triage"]),
+            "agreement_escalated": agreement([c for c in comparisons if c["route"] == "full_chain"]),
+        }
+
+def _seconds(value) -> str:
+    return f"{value:.1f}s" if value is not None else "n/a"
+
+def _agreement(entry: dict) -> str:
+    if not entry["compared"]:
+        return "no comparisons"
+    return (f"is_break {entry['is_break_agreement']:.0%}, classification {entry['classification_agreement']:.0%} "
+            f"over {entry['compared']} events")
+
+def print_tiered_report(router: TieredRouter):
+    summary = router.summary()
+    reasons = ", ".join(f"{count} {reason}" for reason, count in summary["escalation_reasons"].items()) or "none"
+    print(f"---Tiered routing: {summary['events']} events, {summary['triaged']} triaged, {summary['accepted']} concluded "
+          f"by triage, {summary['escalated']} escalated to the full chain ({reasons})---")
+    print(f"---Median per-event time: {_seconds(summary['median_event_seconds'])} overall, "
+          f"{_seconds(summary['median_accepted_seconds'])} triage only, {_seconds(summary['median_escalated_seconds'])} "
+          f"escalated, {_seconds(summary['median_full_chain_seconds'])} for the full chain alone---")
+    print(f"---Triage vs full chain, accepted (audited): {_agreement(summary['agreement_accepted'])}; "
+          f"escalated: {_agreement(summary['agreement_escalated'])}---")
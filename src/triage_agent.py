@@ -0,0 +1,109 @@
+from structured_output import complete_structured, output_tool, request_structured, request_structured_async
+from prompt_format import serialize_event
+
+class TriageAgent:
+    """First-pass classification by a small, fast model, with a confidence score.
+
+    Returns the same fields as ConclusionAgent plus "confidence" (0-1), so a confident
+    answer can stand in for the EvidenceAnalyst -> Critic -> Conclusion chain (see
+    tiered_routing.py).
+    """
+    model = "claude-3-5-haiku-20241022"  # Small, fast model.
+    max_tokens = 1000
+    event_detail = "mismatched"
+    stage = "triage"
+    output_schema = {
+        "type": "object",
+        "properties": {
+            "evidence": {"type": "array", "items": {"type": "string"}},
+            "is_break": {"type": "boolean"},
+            "classification": {"type": "string"},
+            "brief_summary_of_root_cause": {"type": "string"},
+            "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        },
+        "required": ["evidence", "is_break", "classification", "brief_summary_of_root_cause", "confidence"],
+    }
+
+    def __init__(self, event: dict):
+        self.event = event
+        self.return_format = """
+        {
+            "evidence": ["string"],
+            "is_break": true,
+            "classification": "string",
+            "brief_summary_of_root_cause": "string",
+            "confidence": 0.0
+        }
+        """
+        self.system_prompt = self._get_system_prompt(self.event, self.return_format)
+
+    def _get_system_prompt(self, event: dict, return_format: str):
+        prompt = f"""
+        You are a reconciliation analyst for dividend events, doing a first-pass triage. Decide whether the differences between NBIM and Custody in this coac event are a genuine reconciliation break.
+
+        - is_break: true if this represents a genuine reconciliation break, false if not
+        - classification: brief category of the issue (e.g., "Tax Discrepancy", "Data Quality", "Timing Difference")
+        - brief_summary_of_root_cause: concise explanation of what caused the issue
+        - evidence: the mismatching fields, each point very simple
+        - confidence: how sure you are of is_break and classification, from 0 to 1
+
+        If data is consistent in actual meaning but naming conventions differ (e.g. custodian "CUST/JPMORGANUS" vs "JPMORGAN_CHASE"), this is NOT a break.
+        Give a high confidence only when the data leaves no real doubt. When several fields differ, amounts do not reconcile, or the cause is unclear, give a low confidence: the event is then examined in depth by other agents.
+
+        Output strictly valid JSON matching the provided schema. Do not restate inputs.
+
+        The return format of your output should be JSON matching this pattern:
+        {return_format}
+
+        The coac event you are triaging is:
+        {serialize_event(event, self.event_detail)}
+        """
+        return prompt
+
+    def call_tags(self) -> dict:
+        """Labels for the gateway's usage records."""
+        return {"stage": self.stage, "event_key": self.event['coac_event_key']}
+
+    def request_params(self) -> dict:
+        """Arguments for messages.create."""
+        return {"model": self.model, "max_tokens": self.max_tokens, "messages": self._messages(),
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+    def _messages(self) -> list:
+        return [
+            {"role": "user", "content": self.system_prompt}
+        ]
+
+    def parse_response(self, response) -> dict:
+        return self.handle_output(complete_structured(self, response))
+
+    def handle_output(self, response_dict: dict) -> dict:
+        try:
+            confidence = float(response_dict.get("confidence", 0.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        response_dict["confidence"] = min(max(confidence, 0.0), 1.0)
+        print(f"Triage for event {self.event['coac_event_key']}: {response_dict.get('is_break', 'Unknown')} - "
+              f"{response_dict.get('classification', 'Unknown')} (confidence {response_dict['confidence']:.2f})")
+        return response_dict
+
+    def run(self):
+        try:
+            response_dict = self.handle_output(request_structured(self))
+
+        except Exception as e:
+            print(f"Error triaging event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        return response_dict
+
+    async def run_async(self):
+        """Same as run(), using the async client so many events can be processed concurrently."""
+        try:
+            response_dict = self.handle_output(await request_structured_async(self))
+
+        except Exception as e:
+            print(f"Error triaging event {self.event['coac_event_key']}: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        return response_dict
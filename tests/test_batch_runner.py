@@ -0,0 +1,30 @@
+import contextlib
+import io
+
+from batch_runner import LocalBatchBackend
+from ingest import ingest_bookings
+from llm_gateway import set_gateway
+from main import run_reconciliation_pipeline
+from simulated_llm import simulated_gateway
+from synthetic_data import BREAK_TYPES, write_bookings
+
+def _run(event_data, batch: bool) -> list:
+    gateway = simulated_gateway(latency_scale=0.0)
+    set_gateway(gateway)
+    batch_backend = LocalBatchBackend(gateway.client, polls_until_done=0) if batch else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        breaks = run_reconciliation_pipeline(None, None, max_concurrency=4, event_data=event_data,
+                                             batch_backend=batch_backend)
+    return [{key: value for key, value in break_event.items() if key != "event"} for break_event in breaks]
+
+def test_batch_stages_match_concurrent_pipeline(tmp_path):
+    custody_path, nbim_path, injected = write_bookings(str(tmp_path), events=120, break_rate=0.4,
+                                                       break_types=BREAK_TYPES, seed=7)
+    with contextlib.redirect_stdout(io.StringIO()):
+        event_data = ingest_bookings(custody_path, nbim_path)
+
+    concurrent = _run(event_data, batch=False)
+    batched = _run(event_data, batch=True)
+
+    assert concurrent
+    assert batched == concurrent
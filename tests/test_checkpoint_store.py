@@ -0,0 +1,48 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+
+from checkpoint_store import CheckpointStore
+from parse_data import parse_data
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+NBIM_FILE = "NBIM_Dividend_Bookings 1.csv"
+CUSTODY_FILE = "CUSTODY_Dividend_Bookings 1.csv"
+EVENT_KEYS = ("950123456", "960789012", "970456789")
+
+def _parse(custody: pd.DataFrame, nbim: pd.DataFrame):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_data(custody, nbim)
+
+def test_changed_account_invalidates_only_its_event(tmp_path):
+    nbim = pd.read_csv(os.path.join(DATA_DIR, NBIM_FILE), sep=";")
+    custody = pd.read_csv(os.path.join(DATA_DIR, CUSTODY_FILE), sep=";")
+
+    with CheckpointStore(str(tmp_path / "checkpoint.sqlite")) as checkpoint:
+        assert checkpoint.sync_fingerprints(_parse(custody, nbim))["new_events"] == len(EVENT_KEYS)
+        for event_key in EVENT_KEYS:
+            checkpoint.put(event_key, "conclusion", {"is_break": True, "classification": f"Break of {event_key}"})
+            checkpoint.put(event_key, "consequence", {"consequence": f"Consequence of {event_key}"})
+
+        # Next delivery: one of event 970456789's three accounts is rebooked, event 960789012 is gone.
+        changed_row = (custody["COAC_EVENT_KEY"] == 970456789) & (custody["CUSTODY"] == 823456790)
+        assert changed_row.sum() == 1
+        custody.loc[changed_row, "GROSS_AMOUNT"] += 100
+        custody = custody[custody["COAC_EVENT_KEY"] != 960789012]
+        nbim = nbim[nbim["COAC_EVENT_KEY"] != 960789012]
+        changes = checkpoint.sync_fingerprints(_parse(custody, nbim))
+
+        assert changes == {"unchanged_events": 1, "changed_events": 1, "new_events": 0, "removed_events": 1}
+        assert checkpoint.get("970456789", "conclusion") is None
+        assert checkpoint.get("970456789", "consequence") is None
+        assert checkpoint.get("950123456", "conclusion") == {"is_break": True, "classification": "Break of 950123456"}
+        assert checkpoint.get("950123456", "consequence") == {"consequence": "Consequence of 950123456"}
+        assert checkpoint.get("960789012", "conclusion") is None
+        assert checkpoint.completed_count("conclusion") == 1
+
+        # Unchanged data the day after: everything stored carries forward.
+        assert checkpoint.sync_fingerprints(_parse(custody, nbim)) == \
+               {"unchanged_events": 2, "changed_events": 0, "new_events": 0, "removed_events": 0}
+        assert checkpoint.get("950123456", "conclusion") is not None
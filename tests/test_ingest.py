@@ -0,0 +1,36 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+
+from ingest import ingest_bookings
+from parse_data import parse_data
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+NBIM_FILE = "NBIM_Dividend_Bookings 1.csv"
+CUSTODY_FILE = "CUSTODY_Dividend_Bookings 1.csv"
+
+def _events_by_key(event_data) -> dict:
+    return {str(event["coac_event_key"]): event for event in event_data}
+
+def test_spaced_thousands_amounts_are_parsed(tmp_path):
+    # The delivered NBIM file with Apple's position and gross amount written with spaced thousands.
+    with open(os.path.join(DATA_DIR, NBIM_FILE), encoding="utf-8-sig") as file:
+        text = file.read()
+    assert ";1500000;375000;" in text
+    nbim_path = tmp_path / NBIM_FILE
+    nbim_path.write_text(text.replace(";1500000;375000;", ";1 500 000;375 000;", 1), encoding="utf-8")
+    custody_path = os.path.join(DATA_DIR, CUSTODY_FILE)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingested = _events_by_key(ingest_bookings(custody_path, str(nbim_path)))
+        parsed = _events_by_key(parse_data(pd.read_csv(custody_path, sep=";"), pd.read_csv(nbim_path, sep=";")))
+
+    nbim_entry = ingested["950123456"]["accounts"]["501234567"]["NBIM"]
+    assert nbim_entry["quantity"] == 1_500_000.0
+    assert nbim_entry["gross_amount"] == 375_000.0
+    assert ingested.keys() == parsed.keys()
+    for key, event in ingested.items():
+        assert {account: values["mismatches"] for account, values in event["accounts"].items()} == \
+               {account: values["mismatches"] for account, values in parsed[key]["accounts"].items()}
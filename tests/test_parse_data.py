@@ -0,0 +1,54 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+
+from parse_data import COMPARABLE_FIELDS, FIELD_TOLERANCES, mismatch_matrix, parse_data, parse_date, parse_date_series
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+NBIM_FILE = "NBIM_Dividend_Bookings 1.csv"
+CUSTODY_FILE = "CUSTODY_Dividend_Bookings 1.csv"
+
+def _entries(**values) -> pd.DataFrame:
+    """Entries with every comparable field missing except `values` (one list per field, a row per account pair)."""
+    rows = len(next(iter(values.values())))
+    return pd.DataFrame({field: values.get(field, [None] * rows) for field in COMPARABLE_FIELDS}, dtype=object)
+
+def test_float_and_thousands_separated_amount_match():
+    nbim = pd.read_csv(os.path.join(DATA_DIR, NBIM_FILE), sep=";")
+    custody = pd.read_csv(os.path.join(DATA_DIR, CUSTODY_FILE), sep=";")
+    nbim["NET_AMOUNT_QUOTATION"] = nbim["NET_AMOUNT_QUOTATION"].astype(float)
+    custody["NET_AMOUNT_QC"] = custody["NET_AMOUNT_QC"].astype(object)
+    assert nbim.loc[0, "NET_AMOUNT_QUOTATION"] == 318750.0
+    custody.loc[0, "NET_AMOUNT_QC"] = "318,750"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        event = next(event for event in parse_data(custody, nbim) if str(event["coac_event_key"]) == "950123456")
+
+    fields = [mismatch["field"] for mismatch in event["accounts"]["501234567"]["mismatches"]]
+    assert "net_amount" not in fields
+    assert "custodian" in fields  # still compared: JPMORGAN_CHASE vs CUST/JPMORGANUS
+
+def test_difference_just_above_tolerance_is_flagged():
+    for field, tolerance in FIELD_TOLERANCES.items():
+        limit = tolerance["abs"]
+        nbim = _entries(**{field: [1.0, 1.0, 1.0]})
+        custody = _entries(**{field: [1.0, 1.0 + limit * 0.9, 1.0 + limit * 1.1]})
+        assert mismatch_matrix(nbim, custody)[field].tolist() == [False, False, True], field
+
+def test_value_on_one_side_only_is_flagged():
+    nbim = _entries(gross_amount=[375000.0, None, None], custodian=["JPMORGAN_CHASE", None, None])
+    custody = _entries(gross_amount=[None, 375000.0, None], custodian=[None, "CUST/JPMORGANUS", None])
+    matrix = mismatch_matrix(nbim, custody)
+    assert matrix["gross_amount"].tolist() == [True, True, False]
+    assert matrix["custodian"].tolist() == [True, True, False]
+
+def test_unparseable_dates_pass_through():
+    values = pd.Series(["31.03.2025", "Q1 2025", " TBA ", None], dtype=object)
+    assert parse_date_series(values).tolist() == ["2025-03-31", "Q1 2025", "TBA", None]
+    assert parse_date("Q1 2025") == "Q1 2025"
+
+    nbim = _entries(ex_date=["Q1 2025", "Q1 2025"])
+    custody = _entries(ex_date=["Q1 2025", "2025-03-31"])
+    assert mismatch_matrix(nbim, custody)["ex_date"].tolist() == [False, True]
@@ -0,0 +1,106 @@
+import contextlib
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from llm_gateway import LLMGateway, message_from_payload, set_gateway
+from structured_output import (MAX_CONTINUATIONS, StreamingJSONParser, StructuredOutputError, complete_structured,
+                               output_tool)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "evidence": {"type": "array", "items": {"type": "string"}},
+        "is_break": {"type": "boolean"},
+        "classification": {"type": "string"},
+        "brief_summary_of_root_cause": {"type": "string"},
+    },
+    "required": ["evidence", "is_break", "classification", "brief_summary_of_root_cause"],
+}
+
+def _parse(*chunks) -> StreamingJSONParser:
+    parser = StreamingJSONParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser
+
+def _tool_reply(fields: dict, stop_reason: str = "tool_use"):
+    return message_from_payload({
+        "id": "msg_test", "type": "message", "role": "assistant", "model": "claude-sonnet-4-20250514",
+        "content": [{"type": "tool_use", "id": "toolu_test", "name": "record_conclusion", "input": fields}],
+        "stop_reason": stop_reason, "stop_sequence": None, "usage": {"input_tokens": 10, "output_tokens": 10},
+    })
+
+class _Agent:
+    stage = "conclusion"
+    output_schema = SCHEMA
+
+    def call_tags(self) -> dict:
+        return {"stage": self.stage, "event_key": "950123456"}
+
+    def request_params(self) -> dict:
+        return {"model": "claude-sonnet-4-20250514", "max_tokens": 100,
+                "messages": [{"role": "user", "content": "Conclude."}],
+                **output_tool(f"record_{self.stage}", self.output_schema)}
+
+def _complete(first_reply, follow_ups: list):
+    """complete_structured on `first_reply`, with the gateway answering continuations from `follow_ups`."""
+    requests = []
+    def create(**kwargs):
+        requests.append(kwargs)
+        return follow_ups.pop(0)
+    gateway = LLMGateway(client=SimpleNamespace(messages=SimpleNamespace(create=create)))
+    set_gateway(gateway)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return complete_structured(_Agent(), first_reply), requests, gateway
+
+def test_string_cut_off_mid_value_is_closed():
+    parser = _parse('{"evidence": ["gross_amount differs"], "hypothesis": "The custodian applied a 20')
+    assert not parser.done
+    assert parser.value() == {"evidence": ["gross_amount differs"], "hypothesis": "The custodian applied a 20"}
+    assert parser.truncated_keys() == ["hypothesis"]
+
+def test_dangling_key_and_half_written_literal_are_dropped():
+    assert _parse('{"is_break": true, "classification"').value() == {"is_break": True}
+    assert _parse('{"is_break": true, "classification": ').value() == {"is_break": True}
+    assert _parse('{"classification": "Tax", "is_break": tr').value() == {"classification": "Tax"}
+    # Nothing of the dropped field was kept, so it is missing rather than cut off.
+    assert _parse('{"is_break": true, "classification"').truncated_keys() == []
+
+def test_prose_and_code_fence_prefix_are_skipped():
+    parser = _parse("Here is my conclusion:\n```json\n", '{"is_break": fa', 'lse, "classification": "Timing"}\n```\nDone.')
+    assert parser.done
+    assert parser.text == '{"is_break": false, "classification": "Timing"}'
+    assert parser.value() == {"is_break": False, "classification": "Timing"}
+    assert parser.truncated_keys() == []
+    assert _parse("No JSON here").value() is None
+
+def test_truncated_keys_names_the_top_level_field_cut_off():
+    # Cut inside an array or a nested object: the top-level field holding it is incomplete.
+    assert _parse('{"is_break": true, "evidence": ["a", "b').truncated_keys() == ["evidence"]
+    nested = _parse('{"is_break": true, "accounts": {"501": {"gross": 1}, "502": {"gro')
+    assert nested.value() == {"is_break": True, "accounts": {"501": {"gross": 1}, "502": {}}}
+    assert nested.truncated_keys() == ["accounts"]
+    # Cut between top-level fields: every field received is complete.
+    assert _parse('{"is_break": true, "evidence": ["a"], "clas').truncated_keys() == []
+
+def test_continuation_fills_missing_fields_and_keeps_received_ones():
+    first = _tool_reply({"evidence": ["tax differs"], "is_break": True, "classification": "Ta"}, stop_reason="max_tokens")
+    follow_ups = [
+        _tool_reply({"classification": "Tax Discrepancy"}),
+        _tool_reply({"brief_summary_of_root_cause": "Different withholding rate", "evidence": ["something else"]}),
+    ]
+    value, requests, gateway = _complete(first, follow_ups)
+
+    assert value == {"evidence": ["tax differs"], "is_break": True, "classification": "Tax Discrepancy",
+                     "brief_summary_of_root_cause": "Different withholding rate"}
+    asked = [request["tools"][0]["input_schema"]["required"] for request in requests]
+    assert asked == [["brief_summary_of_root_cause", "classification"], ["brief_summary_of_root_cause"]]
+    assert [call["stage"] for call in gateway.call_log] == ["conclusion_continuation"] * 2
+
+def test_fields_still_missing_after_continuations_raise():
+    first = _tool_reply({"evidence": [], "is_break": True})
+    follow_ups = [_tool_reply({"classification": "Other"}) for _ in range(MAX_CONTINUATIONS)]
+    with pytest.raises(StructuredOutputError, match="brief_summary_of_root_cause"):
+        _complete(first, follow_ups)